@@ -0,0 +1,137 @@
+# fixtures.py
+#
+# Conjunto de velas usado pelos benchmarks. Cada (símbolo, intervalo) fica em um arquivo
+# {symbol}_{interval}.klines no mesmo formato binário do cache (data_control/cache.py),
+# então um diretório de fixtures também serve como diretório de cache.
+#
+# As velas podem ser sintéticas (passeio aleatório com semente fixa) ou gravadas da
+# Binance com record_fixtures. Ao carregar, as velas são deslocadas para que a última
+# termine no candle atual; assim o pipeline enxerga o fixture como dados recentes.
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from binance_client.binance_client import INTERVAL_MS
+from data_control import cache
+
+SCAN_INTERVALS = ["15m", "1h", "4h", "1d"]
+DEFAULT_CANDLES = 1000
+
+def synthetic_symbols(n_symbols):
+    return [f"SYN{i:04d}USDT" for i in range(n_symbols)]
+
+def fixture_path(fixture_dir, symbol, interval):
+    return os.path.join(fixture_dir, f"{symbol}_{interval}.klines")
+
+def _current_open_ms(interval, now_ms=None):
+    if now_ms is None:
+        now_ms = int(pd.Timestamp.now(tz="UTC").timestamp() * 1000)
+    step = INTERVAL_MS[interval]
+    offset = 4 * INTERVAL_MS["1d"] if interval == "1w" else 0
+    return (now_ms - offset) // step * step + offset
+
+def synthetic_records(interval, candles, seed, end_ms=None):
+    """
+    Velas sintéticas de um passeio aleatório log-normal, terminando na vela aberta em
+    `end_ms` (padrão: agora). A mesma semente gera sempre os mesmos preços.
+    """
+    rng = np.random.default_rng(seed)
+    step = INTERVAL_MS[interval]
+    end_ms = _current_open_ms(interval) if end_ms is None else end_ms
+    records = np.empty(candles, dtype=cache.KLINE_DTYPE)
+    records["Time"] = end_ms - step * np.arange(candles - 1, -1, -1, dtype=np.int64)
+
+    start_price = 10 ** rng.uniform(-3, 4)
+    volatility = 0.002 * np.sqrt(step / INTERVAL_MS["15m"])
+    closes = start_price * np.exp(np.cumsum(rng.normal(0, volatility, candles)))
+    opens = np.concatenate(([start_price], closes[:-1]))
+    spread = np.abs(rng.normal(0, volatility, (2, candles))) * closes
+    records["Open"] = opens
+    records["Close"] = closes
+    records["High"] = np.maximum(opens, closes) + spread[0]
+    records["Low"] = np.maximum(np.minimum(opens, closes) - spread[1], closes * 1e-3)
+    records["Volume"] = rng.lognormal(10, 1, candles)
+    return records
+
+def write_fixture(path, records):
+    cache._write_records(path, records)
+
+def read_fixture(path):
+    state, _, records = cache._open_records(path)
+    if state != "ok":
+        raise ValueError(f"Fixture inválida ou de versão desconhecida: {path}")
+    return np.array(records)
+
+def generate_fixtures(fixture_dir, n_symbols=300, intervals=None, candles=DEFAULT_CANDLES, seed=0):
+    """Gera velas sintéticas para `n_symbols` símbolos. Retorna a lista de símbolos."""
+    intervals = intervals or SCAN_INTERVALS
+    os.makedirs(fixture_dir, exist_ok=True)
+    symbols = synthetic_symbols(n_symbols)
+    for i, symbol in enumerate(symbols):
+        for j, interval in enumerate(intervals):
+            records = synthetic_records(interval, candles, seed=(seed, i, j))
+            write_fixture(fixture_path(fixture_dir, symbol, interval), records)
+    return symbols
+
+def record_fixtures(fixture_dir, symbols, intervals=None, candles=DEFAULT_CANDLES):
+    """Grava velas reais da Binance (precisa de credenciais e rede) no diretório de fixtures."""
+    from binance_client.binance_client import get_futures_klines_range
+
+    intervals = intervals or SCAN_INTERVALS
+    os.makedirs(fixture_dir, exist_ok=True)
+    recorded = []
+    for symbol in symbols:
+        for interval in intervals:
+            start_ms = _current_open_ms(interval) - INTERVAL_MS[interval] * (candles - 1)
+            df = get_futures_klines_range(symbol, interval, start_ms)
+            if df.empty:
+                continue
+            write_fixture(fixture_path(fixture_dir, symbol, interval), cache._frame_to_records(df))
+        recorded.append(symbol)
+    return recorded
+
+def fixture_symbols(fixture_dir, interval=SCAN_INTERVALS[0]):
+    suffix = f"_{interval}.klines"
+    return sorted(name[:-len(suffix)] for name in os.listdir(fixture_dir) if name.endswith(suffix))
+
+class FixtureSet:
+    """
+    Velas de um diretório de fixtures em memória, por (símbolo, intervalo), já alinhadas
+    para que a última vela seja a vela aberta no momento do carregamento.
+    """
+
+    def __init__(self, fixture_dir, intervals=None):
+        self.fixture_dir = fixture_dir
+        self.intervals = intervals or SCAN_INTERVALS
+        self.symbols = fixture_symbols(fixture_dir, self.intervals[0])
+        self.records = {}
+        for symbol in self.symbols:
+            for interval in self.intervals:
+                path = fixture_path(fixture_dir, symbol, interval)
+                if not os.path.exists(path):
+                    continue
+                records = read_fixture(path)
+                shift = _current_open_ms(interval) - records["Time"][-1]
+                records["Time"] += shift
+                self.records[(symbol, interval)] = records
+
+    def frame(self, symbol, interval):
+        return cache._records_to_frame(self.records[(symbol, interval)])
+
+    def frames(self, interval):
+        return {symbol: self.frame(symbol, interval) for symbol in self.symbols
+                if (symbol, interval) in self.records}
+
+    def write_cache(self, cache_dir, drop_last=0):
+        """
+        Grava as velas no formato do cache em `cache_dir`, sem as últimas `drop_last`
+        velas de cada série (o scan precisa buscá-las no cliente).
+        """
+        os.makedirs(cache_dir, exist_ok=True)
+        for (symbol, interval), records in self.records.items():
+            kept = records[:len(records) - drop_last] if drop_last else records
+            write_fixture(os.path.join(cache_dir, f"{symbol}_{interval}.klines"), kept)
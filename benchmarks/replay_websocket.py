@@ -0,0 +1,326 @@
+# replay_websocket.py
+#
+# Reprodução acelerada de eventos de websocket para testar a carga do caminho em tempo
+# real (process_kline_message / process_user_message) sem a Binance. Os eventos vêm de
+# uma gravação JSONL ou são sintéticos, e podem ser entregues:
+#  - direto nos handlers (padrão), no ritmo do horário de cada evento dividido por --speedup;
+#  - por um servidor websocket local (--transport websocket, requer o pacote websockets),
+#    que envia as mensagens como texto JSON para um cliente que chama os handlers.
+#
+# Mede vazão, latência por mensagem (do horário previsto até o fim do handler), tempo
+# de processamento e crescimento de memória (tracemalloc).
+#
+#   python benchmarks/replay_websocket.py --symbols 400 --candles 10 --pattern burst --speedup 60
+#   python benchmarks/replay_websocket.py --input gravacao.jsonl --speedup 0
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import json
+import logging
+import threading
+import time
+import tracemalloc
+
+import numpy as np
+
+from binance_client import binance_client
+from binance_client.binance_client import INTERVAL_MS
+
+PATTERNS = ["burst", "steady"]
+MEMORY_SAMPLES = 20
+
+# --- Eventos sintéticos ---
+
+def _kline_message(symbol, interval, open_ms, event_ms, price, closed):
+    step = INTERVAL_MS[interval]
+    return {
+        "stream": f"{symbol.lower()}@kline_{interval}",
+        "data": {
+            "e": "kline", "E": event_ms, "s": symbol,
+            "k": {
+                "t": open_ms, "T": open_ms + step - 1, "s": symbol, "i": interval,
+                "o": f"{price:.6f}", "c": f"{price * 1.001:.6f}",
+                "h": f"{price * 1.002:.6f}", "l": f"{price * 0.999:.6f}",
+                "v": "1234.5", "n": 100, "x": closed, "q": "1000.0",
+            },
+        },
+    }
+
+def synthetic_kline_events(n_symbols, interval="1m", candles=5, pattern="burst", open_updates=0,
+                           start_ms=0, seed=0):
+    """
+    Eventos de kline de `n_symbols` símbolos durante `candles` velas.
+    burst:  todos os símbolos fecham a vela no mesmo milissegundo (como na virada do minuto);
+    steady: os fechamentos são espalhados uniformemente ao longo da vela.
+    `open_updates` acrescenta atualizações de vela em aberto (x=False) por símbolo e vela.
+    Retorna lista de (horário do evento em ms, "kline", mensagem), ordenada por horário.
+    """
+    rng = np.random.default_rng(seed)
+    step = INTERVAL_MS[interval]
+    symbols = [f"SYN{i:04d}USDT" for i in range(n_symbols)]
+    prices = 10 ** rng.uniform(-3, 4, n_symbols)
+    events = []
+    for c in range(candles):
+        open_ms = start_ms + c * step
+        for i, symbol in enumerate(symbols):
+            for u in range(open_updates):
+                update_ms = open_ms + (u + 1) * step // (open_updates + 1) + int(rng.integers(0, 250))
+                events.append((update_ms, "kline",
+                               _kline_message(symbol, interval, open_ms, update_ms, prices[i], False)))
+            if pattern == "burst":
+                close_ms = open_ms + step
+            else:
+                close_ms = open_ms + step + i * step // n_symbols
+            events.append((close_ms, "kline", _kline_message(symbol, interval, open_ms, close_ms, prices[i], True)))
+            prices[i] *= 1 + rng.normal(0, 0.001)
+    events.sort(key=lambda e: e[0])
+    return events
+
+def synthetic_user_events(count, duration_ms, start_ms=0, seed=0):
+    """ACCOUNT_UPDATE e ORDER_TRADE_UPDATE alternados, espalhados em `duration_ms`."""
+    rng = np.random.default_rng(seed)
+    events = []
+    for n, event_ms in enumerate(np.sort(rng.integers(start_ms, start_ms + duration_ms, count))):
+        event_ms = int(event_ms)
+        if n % 2:
+            msg = {"e": "ORDER_TRADE_UPDATE", "E": event_ms, "T": event_ms,
+                   "o": {"s": "BTCUSDT", "c": f"bench{n}", "S": "BUY", "o": "LIMIT", "X": "NEW",
+                         "q": "0.001", "p": "50000", "i": n}}
+        else:
+            msg = {"e": "ACCOUNT_UPDATE", "E": event_ms, "T": event_ms,
+                   "a": {"m": "ORDER", "B": [{"a": "USDT", "wb": "1000", "cw": "1000"}],
+                         "P": [{"s": "BTCUSDT", "pa": "0.001", "ep": "50000", "up": "0.1", "mt": "cross"}]}}
+        events.append((event_ms, "user", msg))
+    return events
+
+# --- Gravação e leitura ---
+
+def load_recording(path):
+    """
+    Lê uma gravação JSONL. Cada linha é {"t": ms, "kind": "kline"|"user", "msg": {...}}
+    ou apenas a mensagem recebida (o horário vem do campo "E").
+    """
+    events = []
+    with open(path, "r") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            if "msg" in entry:
+                msg = entry["msg"]
+                kind = entry.get("kind")
+                event_ms = entry.get("t")
+            else:
+                msg, kind, event_ms = entry, None, None
+            data = msg.get("data", msg)
+            kind = kind or ("kline" if data.get("e") == "kline" else "user")
+            events.append((int(event_ms if event_ms is not None else data.get("E", 0)), kind, msg))
+    events.sort(key=lambda e: e[0])
+    return events
+
+def record_streams(path, symbols, intervals, duration, user=False):
+    """Grava as mensagens reais da Binance em JSONL por `duration` segundos (requer credenciais)."""
+    lock = threading.Lock()
+    with open(path, "w") as f:
+        def writer(kind):
+            def callback(msg):
+                line = json.dumps({"t": int(time.time() * 1000), "kind": kind, "msg": msg})
+                with lock:
+                    f.write(line + "\n")
+            return callback
+
+        twm = binance_client._get_socket_manager()
+        streams = [f"{s.lower()}@kline_{i}" for s in symbols for i in intervals]
+        for n in range(0, len(streams), binance_client.STREAMS_PER_CONNECTION):
+            twm.start_futures_multiplex_socket(writer("kline"),
+                                               streams=streams[n:n + binance_client.STREAMS_PER_CONNECTION])
+        if user:
+            twm.start_futures_user_socket(callback=writer("user"))
+        time.sleep(duration)
+        twm.stop()
+
+# --- Reprodução ---
+
+HANDLERS = {
+    "kline": lambda msg: binance_client.process_kline_message(msg),
+    "user": lambda msg: binance_client.process_user_message(msg),
+}
+
+class ReplayStats:
+    def __init__(self, total, trace_memory):
+        self.latencies = np.empty(total)
+        self.service = np.empty(total)
+        self.count = 0
+        self.trace_memory = trace_memory
+        self.sample_every = max(1, total // MEMORY_SAMPLES)
+        self.memory = []
+        self.started = None
+        self.finished = None
+
+    def record(self, latency, service):
+        self.latencies[self.count] = latency
+        self.service[self.count] = service
+        self.count += 1
+        if self.trace_memory and self.count % self.sample_every == 0:
+            self.memory.append((self.count, tracemalloc.get_traced_memory()[0]))
+
+    def summary(self):
+        latencies = self.latencies[:self.count] * 1e6
+        service = self.service[:self.count] * 1e6
+        elapsed = self.finished - self.started
+
+        def percentiles(values):
+            if not len(values):
+                return {}
+            p50, p95, p99 = np.percentile(values, [50, 95, 99])
+            return {"p50_us": p50, "p95_us": p95, "p99_us": p99, "max_us": float(values.max()),
+                    "mean_us": float(values.mean())}
+
+        return {
+            "messages": self.count,
+            "elapsed_s": elapsed,
+            "throughput_msg_s": self.count / elapsed if elapsed > 0 else None,
+            "max_handler_throughput_msg_s": self.count / (service.sum() / 1e6) if service.sum() else None,
+            "latency": percentiles(latencies),
+            "handler_time": percentiles(service),
+            "memory_samples": [{"messages": n, "traced_bytes": b} for n, b in self.memory],
+        }
+
+def _due_times(events, speedup, start):
+    if not events:
+        return []
+    first = events[0][0]
+    if speedup <= 0:
+        return [None] * len(events)
+    return [start + (event_ms - first) / 1000.0 / speedup for event_ms, _, _ in events]
+
+def replay_direct(events, speedup, stats):
+    """Chama os handlers na thread atual, esperando o horário previsto de cada evento."""
+    stats.started = time.perf_counter()
+    due_times = _due_times(events, speedup, stats.started + 0.01)
+    for (_, kind, msg), due in zip(events, due_times):
+        if due is not None:
+            wait = due - time.perf_counter()
+            if wait > 0:
+                time.sleep(wait)
+        begin = time.perf_counter()
+        HANDLERS[kind](msg)
+        end = time.perf_counter()
+        stats.record(end - (due if due is not None and due < begin else begin), end - begin)
+    stats.finished = time.perf_counter()
+
+def replay_websocket(events, speedup, stats, host="127.0.0.1", port=0):
+    """
+    Servidor websocket local que envia os eventos no horário previsto e um cliente que
+    os recebe e chama os handlers. A latência inclui a serialização e o transporte.
+    """
+    import asyncio
+    try:
+        import websockets
+    except ImportError:
+        raise SystemExit("O modo --transport websocket requer o pacote websockets")
+
+    async def run():
+        due_times = {}
+        done = asyncio.Event()
+
+        async def serve(ws):
+            start = time.perf_counter() + 0.05
+            for n, ((_, kind, msg), due) in enumerate(zip(events, _due_times(events, speedup, start))):
+                if due is not None:
+                    wait = due - time.perf_counter()
+                    if wait > 0:
+                        await asyncio.sleep(wait)
+                due_times[n] = due if due is not None else time.perf_counter()
+                await ws.send(json.dumps({"n": n, "kind": kind, "msg": msg}))
+            await ws.send(json.dumps({"end": True}))
+            await done.wait()
+
+        async with websockets.serve(serve, host, port) as server:
+            bound_port = next(iter(server.sockets)).getsockname()[1]
+            async with websockets.connect(f"ws://{host}:{bound_port}", max_size=None) as ws:
+                stats.started = time.perf_counter()
+                async for text in ws:
+                    entry = json.loads(text)
+                    if entry.get("end"):
+                        break
+                    begin = time.perf_counter()
+                    HANDLERS[entry["kind"]](entry["msg"])
+                    end = time.perf_counter()
+                    stats.record(end - min(due_times[entry["n"]], begin), end - begin)
+                stats.finished = time.perf_counter()
+                done.set()
+
+    asyncio.run(run())
+
+def run_replay(events, speedup=1.0, transport="direct", trace_memory=True):
+    """Reproduz `events` e retorna o resumo de vazão, latência e memória."""
+    binance_client.realtime_data.clear()
+    binance_client.realtime_account_data.clear()
+    stats = ReplayStats(len(events), trace_memory)
+    if trace_memory:
+        tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0] if trace_memory else None
+    try:
+        if transport == "websocket":
+            replay_websocket(events, speedup, stats)
+        else:
+            replay_direct(events, speedup, stats)
+        if trace_memory:
+            current, peak = tracemalloc.get_traced_memory()
+    finally:
+        if trace_memory:
+            tracemalloc.stop()
+    summary = stats.summary()
+    summary["realtime_buffers"] = len(binance_client.realtime_data.keys())
+    summary["realtime_buffer_bytes"] = binance_client.realtime_data.memory_bytes()
+    summary["account_orders_retained"] = len(binance_client.realtime_account_data.get("orders", []))
+    if trace_memory:
+        summary["memory_growth_bytes"] = current - before
+        summary["memory_peak_bytes"] = peak
+    return summary
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay acelerado de eventos de websocket da Binance")
+    parser.add_argument("--input", help="Gravação JSONL (padrão: eventos sintéticos)")
+    parser.add_argument("--symbols", type=int, default=400, help="Símbolos sintéticos")
+    parser.add_argument("--interval", default="1m")
+    parser.add_argument("--candles", type=int, default=5, help="Velas sintéticas por símbolo")
+    parser.add_argument("--pattern", choices=PATTERNS, default="burst")
+    parser.add_argument("--open-updates", type=int, default=0,
+                        help="Atualizações de vela em aberto por símbolo e vela")
+    parser.add_argument("--user-events", type=int, default=0, help="Eventos sintéticos de conta")
+    parser.add_argument("--speedup", type=float, default=60.0,
+                        help="Fator de aceleração do relógio dos eventos (0 = o mais rápido possível)")
+    parser.add_argument("--transport", choices=["direct", "websocket"], default="direct")
+    parser.add_argument("--no-tracemalloc", action="store_true", help="Não medir memória (menos overhead)")
+    parser.add_argument("--log-level", default="WARNING", help="Nível de log durante o replay")
+    parser.add_argument("--output", help="Arquivo JSON de saída (padrão: stdout)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=getattr(logging, args.log_level.upper(), logging.WARNING))
+
+    if args.input:
+        events = load_recording(args.input)
+    else:
+        events = synthetic_kline_events(args.symbols, args.interval, args.candles, args.pattern, args.open_updates)
+        if args.user_events:
+            duration_ms = args.candles * INTERVAL_MS[args.interval]
+            events += synthetic_user_events(args.user_events, duration_ms)
+            events.sort(key=lambda e: e[0])
+
+    summary = run_replay(events, args.speedup, args.transport, not args.no_tracemalloc)
+    summary["params"] = {k: v for k, v in vars(args).items() if k != "output"}
+
+    output = json.dumps(summary, indent=2, default=float)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,295 @@
+# run_benchmarks.py
+#
+# Benchmarks offline do pipeline do scan. Cada etapa é cronometrada separadamente sobre
+# um conjunto de fixtures (sintético ou gravado, ver fixtures.py), com o cliente da
+# Binance substituído por StubClient. O resultado sai em JSON para comparar execuções:
+#
+#   python benchmarks/run_benchmarks.py --symbols 300 --output base.json
+#   python benchmarks/run_benchmarks.py --symbols 300 --compare base.json --max-regression 1.2
+import os
+import sys
+
+# O StubClient responde na hora; o orçamento de peso da API só atrasaria o scan
+os.environ.setdefault("BINANCE_WEIGHT_LIMIT", str(10 ** 9))
+
+import argparse
+import gc
+import json
+import platform
+import shutil
+import statistics
+import subprocess
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+import pandas as pd
+
+from fixtures import SCAN_INTERVALS, DEFAULT_CANDLES, FixtureSet, generate_fixtures
+from stub_client import StubClient, install
+from data_control import cache, filters
+from data_control.snapshot import _freeze_frame
+
+STAGES = ["cache_save", "cache_load", "apply_technicals", "calc_stoch", "calc_macd_zero_lag",
+          "scan_pairs", "dashboard_filter"]
+
+# Combinações de filtros exercitadas no caminho de filtro/ordenação do dashboard
+DASHBOARD_CASES = [
+    {"timeframes": ["1h", "4h"], "above": 70, "sort_tf": "1h"},
+    {"timeframes": ["15m", "1h", "4h", "1d"], "below": 30, "sort_tf": "4h"},
+    {"timeframes": ["1h", "4h", "1d"], "extremos": (20, 80), "sort_tf": "1d"},
+    {"timeframes": ["15m", "1h"], "intervalo": (40, 60), "sort_tf": "15m"},
+    {"timeframes": [], "sort_tf": "1h"},
+]
+
+def _summary(runs, items):
+    return {
+        "runs": [round(r, 6) for r in runs],
+        "min": min(runs),
+        "median": statistics.median(runs),
+        "mean": statistics.fmean(runs),
+        "items": items,
+        "per_item_us": statistics.median(runs) / items * 1e6 if items else None,
+    }
+
+def time_stage(fn, repeat, items, setup=None):
+    """Executa `fn(setup())` `repeat` vezes; o tempo do setup fica fora da medição."""
+    runs = []
+    for _ in range(repeat):
+        arg = setup() if setup else None
+        gc.collect()
+        started = time.perf_counter()
+        fn(arg)
+        runs.append(time.perf_counter() - started)
+    return _summary(runs, items)
+
+def _versions():
+    versions = {"python": platform.python_version(), "numpy": np.__version__, "pandas": pd.__version__}
+    try:
+        import pandas_ta
+        versions["pandas_ta"] = getattr(pandas_ta, "version", getattr(pandas_ta, "__version__", "?"))
+    except ImportError:
+        versions["pandas_ta"] = None
+    return versions
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+def run_benchmarks(fixture_dir, work_dir, stages, repeat=3, workers=8, stale_candles=2, client_latency=0.0):
+    from indicators_set.indicators import apply_technicals, calc_macd_zero_lag, _calc_stoch
+    from data_control import sql_store, update_data
+    from data_control.update_data import scan_pairs, _timeframe_memo
+    from metrics import metrics
+
+    fixtures = FixtureSet(fixture_dir)
+    symbols = fixtures.symbols
+    frames = {interval: fixtures.frames(interval) for interval in fixtures.intervals}
+    n_series = sum(len(f) for f in frames.values())
+    results = {}
+    counter = iter(range(10 ** 9))
+
+    def fresh_dir(name):
+        path = os.path.join(work_dir, f"{name}_{next(counter)}")
+        os.makedirs(path)
+        return path
+
+    def copies(_=None):
+        return [(interval, df.copy()) for interval, by_symbol in frames.items() for df in by_symbol.values()]
+
+    if "cache_save" in stages or "cache_load" in stages:
+        saved_dir = fresh_dir("cache")
+
+        def save_all(target):
+            cache.CACHE_DIR = target
+            for interval, by_symbol in frames.items():
+                for symbol, df in by_symbol.items():
+                    cache.save_cached_data(symbol, interval, df)
+
+        if "cache_save" in stages:
+            results["cache_save"] = time_stage(save_all, repeat, n_series, setup=lambda: fresh_dir("cache"))
+        save_all(saved_dir)
+
+        def load_all(_):
+            cache.CACHE_DIR = saved_dir
+            for interval, by_symbol in frames.items():
+                for symbol in by_symbol:
+                    cache.load_cached_data(symbol, interval)
+
+        if "cache_load" in stages:
+            results["cache_load"] = time_stage(load_all, repeat, n_series)
+
+    if "apply_technicals" in stages:
+        def technicals(dfs):
+            for interval, df in dfs:
+                apply_technicals(df, timeframe=interval)
+        results["apply_technicals"] = time_stage(technicals, repeat, n_series, setup=copies)
+
+    if "calc_stoch" in stages:
+        def stoch(dfs):
+            for interval, df in dfs:
+                _calc_stoch(df, 5, 3, 3, f"{interval}_5")
+                _calc_stoch(df, 14, 3, 3, f"{interval}_14")
+        results["calc_stoch"] = time_stage(stoch, repeat, n_series, setup=copies)
+
+    if "calc_macd_zero_lag" in stages:
+        closes = [df["Close"] for by_symbol in frames.values() for df in by_symbol.values()]
+
+        def macd(_):
+            for close in closes:
+                calc_macd_zero_lag(close)
+        results["calc_macd_zero_lag"] = time_stage(macd, repeat, n_series)
+
+    df_valid = None
+    if "scan_pairs" in stages or "dashboard_filter" in stages:
+        stub = install(StubClient(fixtures, latency=client_latency))
+
+        # O scan não pode tocar nos arquivos de produção (métricas lidas pelo node_exporter,
+        # banco SQL, memo e estados incrementais): tudo vai para work_dir, e o memo e os
+        # estados não são persistidos, senão as repetições mediriam acertos do memo
+        metrics.METRICS_FILE = os.path.join(work_dir, "metrics.prom")
+        sql_store.SQL_STORE_PATH = os.path.join(work_dir, "crypto_data.sqlite")
+        update_data.SCAN_MEMO_FILE = ""
+        update_data.INDICATOR_STATE_FILE = ""
+
+        def prepare_scan():
+            target = fresh_dir("scan")
+            fixtures.write_cache(target, drop_last=stale_candles)
+            cache.CACHE_DIR = target
+            # Cada repetição mede o scan completo, sem resultados do scan anterior
+            _timeframe_memo.clear()
+            update_data._indicator_states = None
+            return target
+
+        scan_output = {}
+
+        def scan(target):
+            df, failed = scan_pairs(max_workers=workers, pairs=symbols,
+                                    json_path=os.path.join(target, "crypto_data.json"))
+            scan_output["df"], scan_output["failed"] = df, failed
+
+        if "scan_pairs" in stages:
+            calls_before = stub.calls
+            results["scan_pairs"] = time_stage(scan, repeat, len(symbols), setup=prepare_scan)
+            results["scan_pairs"]["client_calls_per_run"] = (stub.calls - calls_before) / repeat
+            results["scan_pairs"]["failed"] = len(scan_output["failed"])
+        else:
+            scan(prepare_scan())
+        df_valid = _freeze_frame(scan_output["df"].to_dict("records"))
+
+    if "dashboard_filter" in stages:
+        cases = []
+        for case in DASHBOARD_CASES:
+            params = {k: v for k, v in case.items() if k not in ("timeframes", "sort_tf")}
+            cases.append((filters.stoch_columns(df_valid.columns, case["timeframes"]), params, case["sort_tf"]))
+
+        def dashboard(_):
+            for columns, params, sort_tf in cases:
+                filters._filter_and_sort(df_valid, columns, params.get("above"), params.get("below"),
+                                         params.get("extremos"), params.get("intervalo"), sort_tf)
+        results["dashboard_filter"] = time_stage(dashboard, repeat, len(cases))
+
+        version = ("bench", time.time())
+        for columns, params, sort_tf in cases:
+            filters.filter_and_sort(df_valid, version, columns, sort_tf=sort_tf, **params)
+
+        def dashboard_memo(_):
+            for columns, params, sort_tf in cases:
+                filters.filter_and_sort(df_valid, version, columns, sort_tf=sort_tf, **params)
+        results["dashboard_filter_memo"] = time_stage(dashboard_memo, repeat, len(cases))
+
+    return results
+
+def compare(results, baseline):
+    """Razão mediana atual / mediana do baseline por etapa (> 1 = mais lento)."""
+    ratios = {}
+    for stage, current in results["stages"].items():
+        base = baseline.get("stages", {}).get(stage)
+        if base and base.get("median"):
+            ratios[stage] = current["median"] / base["median"]
+    return ratios
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks offline do pipeline do scan")
+    parser.add_argument("--fixtures", help="Diretório de fixtures (padrão: gera fixtures sintéticas temporárias)")
+    parser.add_argument("--symbols", type=int, default=300, help="Símbolos sintéticos gerados")
+    parser.add_argument("--candles", type=int, default=DEFAULT_CANDLES, help="Velas por (símbolo, intervalo)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=8, help="max_workers do scan_pairs")
+    parser.add_argument("--stale-candles", type=int, default=2,
+                        help="Velas que faltam no cache e são buscadas no StubClient durante o scan")
+    parser.add_argument("--client-latency", type=float, default=0.0, help="Latência simulada por chamada (s)")
+    parser.add_argument("--stages", default=",".join(STAGES), help="Etapas separadas por vírgula")
+    parser.add_argument("--output", help="Arquivo JSON de saída (padrão: stdout)")
+    parser.add_argument("--compare", help="JSON de uma execução anterior para comparar")
+    parser.add_argument("--max-regression", type=float,
+                        help="Sai com código 1 se alguma etapa ficar mais lenta que esta razão")
+    args = parser.parse_args(argv)
+
+    stages = [s.strip() for s in args.stages.split(",") if s.strip()]
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        parser.error(f"Etapas desconhecidas: {', '.join(sorted(unknown))}")
+
+    work_dir = tempfile.mkdtemp(prefix="cd_bench_")
+    try:
+        fixture_dir = args.fixtures
+        if fixture_dir is None:
+            fixture_dir = os.path.join(work_dir, "fixtures")
+            generate_fixtures(fixture_dir, args.symbols, SCAN_INTERVALS, args.candles, args.seed)
+        stage_results = run_benchmarks(fixture_dir, work_dir, stages, args.repeat, args.workers,
+                                       args.stale_candles, args.client_latency)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    results = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(),
+            "commit": _git_commit(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "versions": _versions(),
+            "params": {
+                "fixtures": args.fixtures or "synthetic",
+                "symbols": args.symbols if args.fixtures is None else None,
+                "candles": args.candles if args.fixtures is None else None,
+                "seed": args.seed,
+                "repeat": args.repeat,
+                "workers": args.workers,
+                "stale_candles": args.stale_candles,
+                "client_latency": args.client_latency,
+            },
+        },
+        "stages": stage_results,
+    }
+
+    exit_code = 0
+    if args.compare:
+        with open(args.compare, "r") as f:
+            ratios = compare(results, json.load(f))
+        results["comparison"] = {"baseline": args.compare, "ratios": ratios}
+        for stage, ratio in ratios.items():
+            flag = ""
+            if args.max_regression and ratio > args.max_regression:
+                flag = "  <-- regressão"
+                exit_code = 1
+            print(f"{stage:24s} {ratio:6.2f}x{flag}", file=sys.stderr)
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+    return exit_code
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,50 @@
+# stub_client.py
+#
+# Cliente da Binance falso para os benchmarks: responde futures_klines e
+# futures_exchange_info a partir de um FixtureSet, sem rede nem credenciais.
+# install() o coloca no lugar do Client criado por binance_client.get_client().
+import threading
+
+import numpy as np
+
+from binance_client import binance_client
+
+class StubClient:
+    def __init__(self, fixtures, latency=0.0):
+        self.fixtures = fixtures
+        self.latency = latency
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def futures_klines(self, symbol, interval, startTime=None, endTime=None, limit=500, **params):
+        with self._lock:
+            self.calls += 1
+        if self.latency:
+            threading.Event().wait(self.latency)
+        records = self.fixtures.records.get((symbol, interval))
+        if records is None:
+            return []
+        times = records["Time"]
+        first = 0 if startTime is None else int(np.searchsorted(times, startTime, side="left"))
+        last = len(times) if endTime is None else int(np.searchsorted(times, endTime, side="right"))
+        if startTime is None and endTime is not None:
+            first = max(0, last - limit)
+        rows = records[first:min(last, first + limit)]
+        step = binance_client.INTERVAL_MS[interval]
+        return [
+            [int(r["Time"]), str(r["Open"]), str(r["High"]), str(r["Low"]), str(r["Close"]),
+             str(r["Volume"]), int(r["Time"]) + step - 1]
+            for r in rows
+        ]
+
+    def futures_exchange_info(self, **params):
+        return {"symbols": [
+            {"symbol": symbol, "status": "TRADING", "contractType": "PERPETUAL"}
+            for symbol in self.fixtures.symbols
+        ]}
+
+def install(stub):
+    """Faz get_client() devolver `stub` até o próximo binance_client.reset_client()."""
+    with binance_client._client_lock:
+        binance_client._client = stub
+    return stub
@@ -1,45 +1,199 @@
 import os
-import nest_asyncio
-nest_asyncio.apply()
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
 # binance_client.py
+#
+# O Client da Binance (e os imports pesados de python-binance, aiohttp e nest_asyncio)
+# só é criado no primeiro uso via get_client(); importar este módulo não lê
+# credenciais nem abre conexões.
 import pandas as pd
-from binance import Client, ThreadedWebsocketManager
+import logging
 
-# Lógica para carregar KEY e SECRET de variáveis de ambiente ou do config.py
-KEY = os.environ.get('BINANCE_KEY')
-SECRET = os.environ.get('BINANCE_SECRET')
-if not KEY or not SECRET:
-    try:
-        from binance_client.config import KEY as FILE_KEY, SECRET as FILE_SECRET
-        KEY = FILE_KEY
-        SECRET = FILE_SECRET
-    except ImportError:
+try:
+    from binance_client.kline_store import RealtimeKlineStore
+    from binance_client.request_scheduler import (
+        RequestScheduler, ENDPOINT_WEIGHTS, LANE_ACCOUNT, LANE_SCANNER, LANE_BACKFILL, klines_weight
+    )
+    from binance_client.transport import configure_session, requests_params, call_with_retry
+except ImportError:
+    from kline_store import RealtimeKlineStore
+    from request_scheduler import (
+        RequestScheduler, ENDPOINT_WEIGHTS, LANE_ACCOUNT, LANE_SCANNER, LANE_BACKFILL, klines_weight
+    )
+    from transport import configure_session, requests_params, call_with_retry
+
+from metrics.metrics import API_REQUESTS, API_LATENCY, API_WEIGHT_WAIT, KLINES_FETCH, KLINES_FETCHED
+
+_credentials = None
+
+def _load_credentials():
+    """Lógica para carregar KEY e SECRET de variáveis de ambiente ou do config.py."""
+    global _credentials
+    if _credentials is not None:
+        return _credentials
+    KEY = os.environ.get('BINANCE_KEY')
+    SECRET = os.environ.get('BINANCE_SECRET')
+    if not KEY or not SECRET:
         try:
-            from config import KEY as FILE_KEY, SECRET as FILE_SECRET
+            from binance_client.config import KEY as FILE_KEY, SECRET as FILE_SECRET
             KEY = FILE_KEY
             SECRET = FILE_SECRET
         except ImportError:
-            config_path = os.path.join(os.path.dirname(__file__), 'config.py')
-            if not os.path.exists(config_path):
-                with open(config_path, 'w') as f:
-                    f.write('KEY = "COLOQUE_SUA_BINANCE_API_KEY_AQUI"\n')
-                    f.write('SECRET = "COLOQUE_SUA_BINANCE_API_SECRET_AQUI"\n')
-                print(f"Arquivo config.py criado em {config_path}. Coloque sua KEY e SECRET nele.")
-            raise ImportError(f'Você precisa definir as variáveis de ambiente BINANCE_KEY e BINANCE_SECRET ou preencher o arquivo {config_path} com KEY e SECRET.')
+            try:
+                from config import KEY as FILE_KEY, SECRET as FILE_SECRET
+                KEY = FILE_KEY
+                SECRET = FILE_SECRET
+            except ImportError:
+                config_path = os.path.join(os.path.dirname(__file__), 'config.py')
+                if not os.path.exists(config_path):
+                    with open(config_path, 'w') as f:
+                        f.write('KEY = "COLOQUE_SUA_BINANCE_API_KEY_AQUI"\n')
+                        f.write('SECRET = "COLOQUE_SUA_BINANCE_API_SECRET_AQUI"\n')
+                    print(f"Arquivo config.py criado em {config_path}. Coloque sua KEY e SECRET nele.")
+                raise ImportError(f'Você precisa definir as variáveis de ambiente BINANCE_KEY e BINANCE_SECRET ou preencher o arquivo {config_path} com KEY e SECRET.')
+    _credentials = (KEY, SECRET)
+    return _credentials
 
-import logging
+# --- Controle de peso das requisições (limite por IP da Binance Futures) ---
+
+# Peso máximo por minuto. O limite da Binance é 2400; a pequena margem cobre
+# requisições feitas por outras ferramentas com o mesmo IP.
+REQUEST_WEIGHT_LIMIT = int(os.environ.get("BINANCE_WEIGHT_LIMIT", "2300"))
 
+request_scheduler = RequestScheduler(REQUEST_WEIGHT_LIMIT)
 
-logging.basicConfig(level=logging.INFO)
-client = Client(KEY, SECRET)
+_client = None
+_client_lock = threading.Lock()
 
-def get_futures_klines(symbol: str, interval: str, lookback: str) -> pd.DataFrame:
+def get_client():
+    """
+    Retorna o Client da Binance do processo, criando-o no primeiro uso com o pool de
+    conexões (transport.configure_session) e o hook de peso do request_scheduler.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                from binance import Client
+                key, secret = _load_credentials()
+                new_client = Client(key, secret, requests_params=requests_params())
+                configure_session(new_client.session)
+                new_client.session.hooks["response"].append(request_scheduler.response_hook)
+                _client = new_client
+    return _client
+
+def reset_client():
+    """Descarta o Client atual; o próximo get_client() cria um novo (ex.: após fork)."""
+    global _client
+    with _client_lock:
+        _client = None
+
+def init_worker_process(share=1.0):
+    """
+    Prepara um processo filho (ex.: worker do scan em processos): cliente e sessão HTTP
+    próprios e um orçamento de peso com a fração `share` do limite do IP.
+    """
+    global request_scheduler
+    request_scheduler = RequestScheduler(REQUEST_WEIGHT_LIMIT, share=share)
+    reset_client()
+
+def __getattr__(name):
+    # Compatibilidade com código que acessa binance_client.client / KEY / SECRET
+    if name == "client":
+        return get_client()
+    if name == "KEY":
+        return _load_credentials()[0]
+    if name == "SECRET":
+        return _load_credentials()[1]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def acquire_weight(weight: int, lane: int = LANE_SCANNER):
+    """Bloqueia até que `weight` caiba no orçamento de peso (ver RequestScheduler)."""
+    request_scheduler.acquire(weight, lane)
+
+def _api_call(weight: int, lane: int, method, **params):
+    """
+    Chama um método do client respeitando o orçamento de peso e repetindo falhas
+    transitórias com backoff (ver transport.call_with_retry). Cada tentativa consome peso.
+    """
+    endpoint = getattr(method, "__name__", "unknown")
+
+    def wait_weight():
+        with API_WEIGHT_WAIT.time(lane=lane):
+            acquire_weight(weight, lane)
+
+    def attempt():
+        started = time.perf_counter()
+        try:
+            result = method(**params)
+        except Exception:
+            API_REQUESTS.inc(endpoint=endpoint, outcome="error")
+            raise
+        finally:
+            API_LATENCY.observe(time.perf_counter() - started, endpoint=endpoint)
+        API_REQUESTS.inc(endpoint=endpoint, outcome="ok")
+        return result
+    return call_with_retry(attempt, prepare=wait_weight, endpoint=endpoint)
+
+# Duração de cada intervalo em milissegundos, usada para paginar as buscas de klines
+INTERVAL_MS = {
+    "1m": 60_000,
+    "3m": 3 * 60_000,
+    "5m": 5 * 60_000,
+    "15m": 15 * 60_000,
+    "30m": 30 * 60_000,
+    "1h": 60 * 60_000,
+    "2h": 2 * 60 * 60_000,
+    "4h": 4 * 60 * 60_000,
+    "6h": 6 * 60 * 60_000,
+    "8h": 8 * 60 * 60_000,
+    "12h": 12 * 60 * 60_000,
+    "1d": 24 * 60 * 60_000,
+    "3d": 3 * 24 * 60 * 60_000,
+    "1w": 7 * 24 * 60 * 60_000,
+}
+KLINES_PAGE_LIMIT = 1500  # máximo de velas por requisição em /fapi/v1/klines
+BACKFILL_WORKERS = int(os.environ.get("BACKFILL_WORKERS", "4"))
+
+def _klines_to_frame(raw_data) -> pd.DataFrame:
+    frame = pd.DataFrame(raw_data)
+    frame = frame.iloc[:, :6]
+    frame.columns = ['Time', 'Open', 'High', 'Low', 'Close', 'Volume']
+    frame = frame.set_index('Time')
+    frame.index = pd.to_datetime(frame.index, unit='ms')
+    frame = frame.astype(float)
+    return frame
+
+def _lookback_to_ms(lookback) -> int:
+    if isinstance(lookback, str):
+        return int(pd.to_datetime(lookback).timestamp() * 1000)
+    return int(lookback)
+
+def get_futures_klines(symbol: str, interval: str, lookback: str, backfill: bool = False,
+                       lane: int = LANE_SCANNER) -> pd.DataFrame:
+    """
+    Busca velas de Futures a partir de `lookback`.
+    Sem backfill, faz uma única requisição (no máximo uma página de velas).
+    Com backfill=True, busca todo o período até agora via get_futures_klines_range.
+    """
+    with KLINES_FETCH.time(interval=interval):
+        df = _get_futures_klines(symbol, interval, lookback, backfill, lane)
+    KLINES_FETCHED.inc(len(df), interval=interval)
+    return df
+
+def _get_futures_klines(symbol, interval, lookback, backfill, lane):
+    if backfill:
+        try:
+            start_ms = _lookback_to_ms(lookback)
+        except Exception as e:
+            logging.error(f"Erro ao interpretar lookback de klines: {e}")
+            return pd.DataFrame()
+        return get_futures_klines_range(symbol, interval, start_ms, lane=lane)
     try:
-        if isinstance(lookback, str):
-            lookback_time = pd.to_datetime(lookback).timestamp() * 1000
-        else:
-            lookback_time = lookback
-        raw_data = client.futures_klines(
+        lookback_time = _lookback_to_ms(lookback)
+        raw_data = _api_call(
+            klines_weight(), lane, get_client().futures_klines,
             symbol=symbol,
             interval=interval,
             startTime=int(lookback_time)
@@ -50,17 +204,67 @@ def get_futures_klines(symbol: str, interval: str, lookback: str) -> pd.DataFram
     if not raw_data:
         logging.warning("Nenhum dado retornado pela API para klines de Futures.")
         return pd.DataFrame()
-    frame = pd.DataFrame(raw_data)
-    frame = frame.iloc[:, :6]
-    frame.columns = ['Time', 'Open', 'High', 'Low', 'Close', 'Volume']
-    frame = frame.set_index('Time')
-    frame.index = pd.to_datetime(frame.index, unit='ms')
-    frame = frame.astype(float)
+    return _klines_to_frame(raw_data)
+
+def _fetch_klines_page(symbol, interval, start_ms, end_ms, limit, lane=LANE_BACKFILL):
+    return _api_call(
+        klines_weight(limit), lane, get_client().futures_klines,
+        symbol=symbol,
+        interval=interval,
+        startTime=int(start_ms),
+        endTime=int(end_ms),
+        limit=limit
+    )
+
+def get_futures_klines_range(symbol: str, interval: str, start_ms: int, end_ms: int = None,
+                             max_workers: int = None, lane: int = LANE_BACKFILL) -> pd.DataFrame:
+    """
+    Busca todas as velas entre start_ms e end_ms (padrão: agora), dividindo o período
+    em janelas de até KLINES_PAGE_LIMIT velas buscadas em paralelo, respeitando o
+    orçamento de peso. As páginas são unidas em um único DataFrame ordenado e sem
+    velas duplicadas. Retorna DataFrame vazio se alguma página falhar.
+    """
+    if interval not in INTERVAL_MS:
+        return get_futures_klines(symbol, interval, start_ms, lane=lane)
+    step = INTERVAL_MS[interval]
+    if end_ms is None:
+        end_ms = int(time.time() * 1000)
+    if max_workers is None:
+        max_workers = BACKFILL_WORKERS
+
+    # Alinha o início à abertura da primeira vela do período
+    start_ms = -(-int(start_ms) // step) * step
+    windows = []
+    page_start = start_ms
+    while page_start <= end_ms:
+        candles = min(KLINES_PAGE_LIMIT, (end_ms - page_start) // step + 1)
+        page_end = page_start + (candles - 1) * step
+        windows.append((page_start, page_end, candles))
+        page_start = page_end + step
+    if not windows:
+        return pd.DataFrame()
+
+    try:
+        if len(windows) == 1 or max_workers <= 1:
+            pages = [_fetch_klines_page(symbol, interval, *window, lane) for window in windows]
+        else:
+            with ThreadPoolExecutor(max_workers=min(max_workers, len(windows))) as executor:
+                pages = list(executor.map(lambda w: _fetch_klines_page(symbol, interval, *w, lane), windows))
+    except Exception as e:
+        logging.error(f"Erro ao buscar histórico de klines para {symbol} {interval}: {e}")
+        return pd.DataFrame()
+
+    raw_data = [row for page in pages for row in page]
+    if not raw_data:
+        logging.warning(f"Nenhum dado retornado pela API para o histórico de {symbol} {interval}.")
+        return pd.DataFrame()
+    frame = _klines_to_frame(raw_data)
+    frame = frame[~frame.index.duplicated(keep='last')].sort_index()
     return frame
 
 def get_futures_open_orders(symbol: str) -> pd.DataFrame:
     try:
-        orders = client.futures_get_open_orders(symbol=symbol)
+        orders = _api_call(ENDPOINT_WEIGHTS["openOrders"], LANE_ACCOUNT, get_client().futures_get_open_orders, symbol=symbol)
     except Exception as e:
         logging.error(f"Erro ao buscar ordens abertas no Futures: {e}")
         return pd.DataFrame()
@@ -68,7 +272,7 @@ def get_futures_open_orders(symbol: str) -> pd.DataFrame:
 
 def get_futures_positions(symbol: str) -> pd.DataFrame:
     try:
-        positions = client.futures_position_information(symbol=symbol)
+        positions = _api_call(ENDPOINT_WEIGHTS["positionRisk"], LANE_ACCOUNT, get_client().futures_position_information, symbol=symbol)
     except Exception as e:
         logging.error(f"Erro ao buscar posições no Futures: {e}")
         return pd.DataFrame()
@@ -76,7 +280,7 @@ def get_futures_positions(symbol: str) -> pd.DataFrame:
 
 def get_funding_rate(symbol):
     try:
-        funding = client.futures_funding_rate(symbol=symbol, limit=1)
+        funding = _api_call(ENDPOINT_WEIGHTS["fundingRate"], LANE_SCANNER, get_client().futures_funding_rate, symbol=symbol, limit=1)
         return float(funding[-1]["fundingRate"])
     except Exception as e:
         logging.error(f"Erro ao buscar taxa de financiamento: {e}")
@@ -84,7 +288,7 @@ def get_funding_rate(symbol):
 
 def get_open_interest(symbol):
     try:
-        oi = client.futures_open_interest(symbol=symbol)
+        oi = _api_call(ENDPOINT_WEIGHTS["openInterest"], LANE_SCANNER, get_client().futures_open_interest, symbol=symbol)
         return float(oi["openInterest"])
     except Exception as e:
         logging.error(f"Erro ao buscar Open Interest: {e}")
@@ -92,7 +296,7 @@ def get_open_interest(symbol):
 
 def get_futures_balance():
     try:
-        account_info = client.futures_account()
+        account_info = _api_call(ENDPOINT_WEIGHTS["account"], LANE_ACCOUNT, get_client().futures_account)
         balances = pd.DataFrame(account_info["assets"])
         return balances[["asset", "walletBalance", "unrealizedProfit", "marginBalance"]]
     except Exception as e:
@@ -100,7 +304,7 @@ def get_futures_balance():
         return pd.DataFrame()
 
 def get_futures_pairs():
-    info = client.futures_exchange_info()
+    info = _api_call(ENDPOINT_WEIGHTS["exchangeInfo"], LANE_SCANNER, get_client().futures_exchange_info)
     # Pega apenas símbolos de contratos perpétuos ativos (os mais comuns)
     pairs = [
         s['symbol']
@@ -111,36 +315,68 @@ def get_futures_pairs():
 
 # --- Websocket de Kline para futuros ---
 
-# Dicionário global para armazenar dados de kline em tempo real
-realtime_data = {}
+# Velas fechadas recebidas em tempo real, em buffers circulares por (símbolo, intervalo)
+realtime_data = RealtimeKlineStore()
+
+# A Binance Futures aceita até 200 streams por conexão combinada
+STREAMS_PER_CONNECTION = 200
+
+_socket_manager = None
+_socket_manager_lock = threading.Lock()
+
+def _new_socket_manager():
+    """Cria um ThreadedWebsocketManager; nest_asyncio só é aplicado quando há websockets."""
+    import nest_asyncio
+    nest_asyncio.apply()
+    from binance import ThreadedWebsocketManager
+    key, secret = _load_credentials()
+    return ThreadedWebsocketManager(api_key=key, api_secret=secret)
+
+def _get_socket_manager():
+    """Retorna o ThreadedWebsocketManager compartilhado, iniciando-o na primeira chamada."""
+    global _socket_manager
+    with _socket_manager_lock:
+        if _socket_manager is None:
+            _socket_manager = _new_socket_manager()
+            _socket_manager.start()
+        return _socket_manager
 
 def process_kline_message(msg):
+    # Streams combinados entregam o evento dentro de "data"
+    msg = msg.get('data', msg)
     if msg.get('e') == 'kline':
         k = msg['k']
         if k.get('x'):  # vela fechada
             symbol = msg['s']
-            dt = pd.to_datetime(k['t'], unit='ms')
-            data = {
-                "Open": float(k['o']),
-                "High": float(k['h']),
-                "Low": float(k['l']),
-                "Close": float(k['c']),
-                "Volume": float(k['v'])
-            }
-            if symbol not in realtime_data:
-                realtime_data[symbol] = pd.DataFrame(columns=["Open", "High", "Low", "Close", "Volume"])
-            realtime_data[symbol].loc[dt] = data
-            logging.info(f"Realtime: {symbol} atualizado em {dt}")
+            realtime_data.append(
+                symbol, k['i'], int(k['t']),
+                float(k['o']), float(k['h']), float(k['l']), float(k['c']), float(k['v'])
+            )
+            logging.debug(f"Realtime: {symbol} {k['i']} atualizado em {k['t']}")
+
+def start_realtime_kline_streams(symbols, intervals, streams_per_connection=STREAMS_PER_CONNECTION):
+    """
+    Assina os streams de kline de todos os símbolos × intervalos usando poucas conexões
+    combinadas (até `streams_per_connection` streams cada) em um único
+    ThreadedWebsocketManager. Retorna o manager e a lista de chaves de conexão.
+    """
+    twm = _get_socket_manager()
+    streams = [f"{symbol.lower()}@kline_{interval}" for symbol in symbols for interval in intervals]
+    conn_keys = []
+    for i in range(0, len(streams), streams_per_connection):
+        chunk = streams[i:i + streams_per_connection]
+        conn_keys.append(twm.start_futures_multiplex_socket(process_kline_message, streams=chunk))
+    logging.info(f"Websocket de kline iniciado: {len(streams)} streams em {len(conn_keys)} conexões")
+    return twm, conn_keys
 
 def start_realtime_kline_socket(symbol: str, interval: str):
     """
     Inicia uma conexão websocket para receber dados de kline em tempo real para futuros.
     Constrói a string do stream (ex.: "btcusdt@kline_4h") e a passa em uma lista para o método
-    start_futures_multiplex_socket.
+    start_futures_multiplex_socket do manager compartilhado.
     Retorna o objeto ThreadedWebsocketManager e a chave de conexão.
     """
-    twm = ThreadedWebsocketManager(api_key=KEY, api_secret=SECRET)
-    twm.start()
+    twm = _get_socket_manager()
     stream = f"{symbol.lower()}@kline_{interval}"
     conn_key = twm.start_futures_multiplex_socket(process_kline_message, streams=[stream])
     logging.info(f"Websocket de kline iniciado para {symbol} no intervalo {interval} (stream: {stream})")
@@ -165,7 +401,7 @@ def process_user_message(msg):
         logging.info(f"Mensagem recebida: {msg}")
 
 def start_realtime_user_socket():
-    twm = ThreadedWebsocketManager(api_key=KEY, api_secret=SECRET)
+    twm = _new_socket_manager()
     twm.start()
     conn_key = twm.start_futures_user_socket(callback=process_user_message)
     logging.info("Websocket de usuário iniciado")
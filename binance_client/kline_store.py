@@ -0,0 +1,114 @@
+# kline_store.py
+#
+# Armazenamento em memória das velas recebidas pelo websocket. Cada (símbolo, intervalo)
+# tem um buffer circular pré-alocado de capacidade fixa, então o consumo de memória é
+# limitado e anexar uma vela não realoca nada.
+import os
+import threading
+import numpy as np
+import pandas as pd
+
+KLINE_FIELDS = ["Open", "High", "Low", "Close", "Volume"]
+
+# Velas mantidas por (símbolo, intervalo); 500 velas ocupam ~24 KB por buffer
+REALTIME_CAPACITY = int(os.environ.get("REALTIME_CAPACITY", "500"))
+
+class KlineRingBuffer:
+    """Buffer circular de velas: tempos em int64 (epoch ms) e OHLCV em float64."""
+
+    def __init__(self, capacity=REALTIME_CAPACITY):
+        self.capacity = capacity
+        self.times = np.zeros(capacity, dtype=np.int64)
+        self.values = np.zeros((capacity, len(KLINE_FIELDS)), dtype=np.float64)
+        self.size = 0
+        self._next = 0  # posição da próxima escrita
+        self._lock = threading.Lock()
+
+    def append(self, time_ms, open_, high, low, close, volume):
+        """
+        Anexa uma vela. Uma vela com o mesmo tempo da última a substitui; velas mais
+        antigas que a última são ignoradas. Retorna False se a vela foi ignorada.
+        """
+        with self._lock:
+            if self.size:
+                last = (self._next - 1) % self.capacity
+                last_time = self.times[last]
+                if time_ms < last_time:
+                    return False
+                if time_ms == last_time:
+                    self.values[last] = (open_, high, low, close, volume)
+                    return True
+            self.times[self._next] = time_ms
+            self.values[self._next] = (open_, high, low, close, volume)
+            self._next = (self._next + 1) % self.capacity
+            self.size = min(self.size + 1, self.capacity)
+            return True
+
+    def last_time(self):
+        with self._lock:
+            if not self.size:
+                return None
+            return int(self.times[(self._next - 1) % self.capacity])
+
+    def snapshot(self, n=None):
+        """
+        Cópia ordenada (mais antiga primeiro) das últimas `n` velas (todas se None).
+        Retorna (tempos, valores) com formatos (n,) e (n, 5).
+        """
+        with self._lock:
+            size = self.size if n is None else min(n, self.size)
+            start = (self._next - size) % self.capacity
+            if start + size <= self.capacity:
+                return self.times[start:start + size].copy(), self.values[start:start + size].copy()
+            first = self.capacity - start
+            times = np.concatenate((self.times[start:], self.times[:size - first]))
+            values = np.concatenate((self.values[start:], self.values[:size - first]))
+            return times, values
+
+    def to_frame(self, n=None):
+        times, values = self.snapshot(n)
+        index = pd.DatetimeIndex(pd.to_datetime(times, unit="ms"), name="Time")
+        return pd.DataFrame(values, index=index, columns=KLINE_FIELDS)
+
+class RealtimeKlineStore:
+    """Conjunto de KlineRingBuffer indexados por (símbolo, intervalo)."""
+
+    def __init__(self, capacity=REALTIME_CAPACITY):
+        self.capacity = capacity
+        self._buffers = {}
+        self._lock = threading.Lock()
+
+    def buffer(self, symbol, interval):
+        key = (symbol, interval)
+        buffer = self._buffers.get(key)
+        if buffer is None:
+            with self._lock:
+                buffer = self._buffers.setdefault(key, KlineRingBuffer(self.capacity))
+        return buffer
+
+    def append(self, symbol, interval, time_ms, open_, high, low, close, volume):
+        return self.buffer(symbol, interval).append(time_ms, open_, high, low, close, volume)
+
+    def snapshot(self, symbol, interval, n=None):
+        """Últimas `n` velas de (símbolo, intervalo) como DataFrame no formato de get_futures_klines."""
+        buffer = self._buffers.get((symbol, interval))
+        if buffer is None:
+            return pd.DataFrame()
+        return buffer.to_frame(n)
+
+    def snapshot_arrays(self, symbol, interval, n=None):
+        """Mesmo que snapshot, mas retorna (tempos, valores) em numpy, sem montar DataFrame."""
+        buffer = self._buffers.get((symbol, interval))
+        if buffer is None:
+            return np.empty(0, dtype=np.int64), np.empty((0, len(KLINE_FIELDS)))
+        return buffer.snapshot(n)
+
+    def keys(self):
+        return list(self._buffers)
+
+    def memory_bytes(self):
+        return sum(b.times.nbytes + b.values.nbytes for b in list(self._buffers.values()))
+
+    def clear(self):
+        with self._lock:
+            self._buffers.clear()
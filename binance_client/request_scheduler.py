@@ -0,0 +1,131 @@
+# request_scheduler.py
+#
+# Controle central do peso das requisições REST da Binance Futures. Todas as chamadas
+# de binance_client passam por RequestScheduler.acquire antes de ir para a API:
+#  - um token bucket com o limite de peso por minuto, reabastecido continuamente;
+#  - reconciliação com o peso usado informado pela Binance (X-MBX-USED-WEIGHT-1M);
+#  - pausa global quando a API responde 429/418, respeitando Retry-After;
+#  - faixas de prioridade: conta > scanner > backfill.
+import logging
+import threading
+import time
+
+LANE_ACCOUNT = 0
+LANE_SCANNER = 1
+LANE_BACKFILL = 2
+LANES = (LANE_ACCOUNT, LANE_SCANNER, LANE_BACKFILL)
+
+# Peso de cada endpoint usado pelo projeto (klines depende de limit, ver klines_weight)
+ENDPOINT_WEIGHTS = {
+    "exchangeInfo": 1,
+    "openOrders": 1,      # com symbol
+    "positionRisk": 5,
+    "fundingRate": 1,
+    "openInterest": 1,
+    "account": 5,
+}
+
+def klines_weight(limit: int = 500) -> int:
+    """Peso de GET /fapi/v1/klines conforme o parâmetro limit."""
+    if limit < 100:
+        return 1
+    if limit < 500:
+        return 2
+    if limit <= 1000:
+        return 5
+    return 10
+
+class RequestScheduler:
+    """
+    `share` é a fração do limite de peso do IP usada por este processo (ex.: 1/4 em cada
+    um de 4 processos do scan); o peso usado informado pela API é dividido na mesma proporção.
+    """
+
+    def __init__(self, limit_per_minute=2400, share=1.0):
+        self.server_limit = limit_per_minute
+        self.share = share
+        self.limit = limit_per_minute * share
+        self.rate = self.limit / 60.0  # peso reabastecido por segundo
+        self._tokens = float(self.limit)
+        self._last_refill = time.monotonic()
+        self._blocked_until = 0.0
+        self._waiting = {lane: 0 for lane in LANES}
+        self._cond = threading.Condition()
+        self.granted = {lane: 0 for lane in LANES}
+        self.server_used_weight = None
+        self.rate_limited = 0
+
+    def _refill(self, now):
+        self._tokens = min(self.limit, self._tokens + (now - self._last_refill) * self.rate)
+        self._last_refill = now
+
+    def acquire(self, weight, lane=LANE_SCANNER):
+        """
+        Bloqueia até haver `weight` disponível e nenhuma requisição de prioridade maior
+        esperando. Seguro para uso por várias threads.
+        """
+        weight = min(weight, self.limit)
+        with self._cond:
+            self._waiting[lane] += 1
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    if self._blocked_until > now:
+                        timeout = self._blocked_until - now
+                    elif any(self._waiting[higher] for higher in LANES[:lane]):
+                        timeout = 0.05
+                    elif self._tokens >= weight:
+                        self._tokens -= weight
+                        self.granted[lane] += weight
+                        return
+                    else:
+                        timeout = (weight - self._tokens) / self.rate
+                    self._cond.wait(timeout)
+            finally:
+                self._waiting[lane] -= 1
+                self._cond.notify_all()
+
+    def observe_used_weight(self, used_weight):
+        """Ajusta o saldo local para nunca ser mais otimista que o peso usado informado pela API."""
+        with self._cond:
+            self.server_used_weight = used_weight
+            self._refill(time.monotonic())
+            self._tokens = min(self._tokens, float(self.server_limit - used_weight) * self.share)
+
+    def penalize(self, retry_after):
+        """Suspende todas as requisições por `retry_after` segundos (resposta 429/418)."""
+        with self._cond:
+            now = time.monotonic()
+            self.rate_limited += 1
+            self._refill(now)
+            self._blocked_until = max(self._blocked_until, now + retry_after)
+            self._tokens = 0.0
+            self._cond.notify_all()
+
+    def response_hook(self, response, *args, **kwargs):
+        """Hook de resposta do requests.Session usado pelo cliente da Binance."""
+        used = response.headers.get("X-MBX-USED-WEIGHT-1M")
+        if used is not None:
+            try:
+                self.observe_used_weight(int(used))
+            except ValueError:
+                pass
+        if response.status_code in (418, 429):
+            try:
+                retry_after = float(response.headers.get("Retry-After", 60))
+            except ValueError:
+                retry_after = 60.0
+            logging.warning(f"Limite de requisições da Binance atingido ({response.status_code}); pausando {retry_after:.0f}s")
+            self.penalize(retry_after)
+        return response
+
+    def stats(self):
+        with self._cond:
+            self._refill(time.monotonic())
+            return {
+                "available_weight": self._tokens,
+                "server_used_weight": self.server_used_weight,
+                "granted_weight": dict(self.granted),
+                "rate_limited": self.rate_limited,
+            }
@@ -0,0 +1,119 @@
+# transport.py
+#
+# Camada de transporte HTTP do cliente Binance: pool de conexões keep-alive
+# dimensionado para buscas concorrentes, timeouts separados de conexão e leitura e
+# novas tentativas com backoff exponencial com jitter para falhas transitórias.
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+
+from metrics.metrics import API_RETRIES, API_FAILURES
+
+HTTP_POOL_SIZE = int(os.environ.get("BINANCE_HTTP_POOL_SIZE", "32"))
+CONNECT_TIMEOUT = float(os.environ.get("BINANCE_CONNECT_TIMEOUT", "3.05"))
+READ_TIMEOUT = float(os.environ.get("BINANCE_READ_TIMEOUT", "10"))
+MAX_RETRIES = int(os.environ.get("BINANCE_MAX_RETRIES", "4"))
+BACKOFF_BASE = 0.5   # segundos
+BACKOFF_MAX = 8.0    # segundos
+
+# Códigos de erro da Binance que indicam problema temporário no servidor
+RETRYABLE_API_CODES = {-1001, -1003, -1007}
+
+def requests_params():
+    """Parâmetros repassados a cada requisição do Client (timeouts de conexão e leitura)."""
+    return {"timeout": (CONNECT_TIMEOUT, READ_TIMEOUT)}
+
+def configure_session(session, pool_size=HTTP_POOL_SIZE):
+    """Monta um pool de conexões keep-alive com `pool_size` conexões por host na sessão."""
+    from requests.adapters import HTTPAdapter
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=0, pool_block=True)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+class TransportStats:
+    """Contadores de chamadas, novas tentativas, falhas e latência das requisições."""
+
+    def __init__(self, latency_window=5000):
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.retries = 0
+        self.failures = 0
+        self.latencies = deque(maxlen=latency_window)
+
+    def record(self, latency=None, retry=False, failure=False):
+        with self._lock:
+            if latency is not None:
+                self.calls += 1
+                self.latencies.append(latency)
+            if retry:
+                self.retries += 1
+            if failure:
+                self.failures += 1
+
+    def snapshot(self):
+        with self._lock:
+            latencies = sorted(self.latencies)
+            calls, retries, failures = self.calls, self.retries, self.failures
+
+        def percentile(p):
+            if not latencies:
+                return None
+            return latencies[min(len(latencies) - 1, int(p * len(latencies)))]
+
+        return {
+            "calls": calls,
+            "retries": retries,
+            "failures": failures,
+            "failure_rate": failures / (calls + failures) if calls + failures else 0.0,
+            "latency_p50": percentile(0.50),
+            "latency_p95": percentile(0.95),
+            "latency_p99": percentile(0.99),
+        }
+
+transport_stats = TransportStats()
+
+def is_retryable(exc):
+    import requests
+    if isinstance(exc, (requests.exceptions.Timeout, requests.exceptions.ConnectionError)):
+        return True
+    status_code = getattr(exc, "status_code", None)
+    if status_code is not None:
+        return status_code >= 500 or status_code in (418, 429) or getattr(exc, "code", None) in RETRYABLE_API_CODES
+    return False
+
+def backoff_delay(attempt):
+    """Backoff exponencial com jitter completo: aleatório entre 0 e base * 2^tentativa."""
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt)))
+
+def call_with_retry(fn, max_retries=None, prepare=None, endpoint="unknown"):
+    """
+    Executa `fn()` repetindo em falhas transitórias (timeout, conexão, 5xx, 429/418).
+    Erros definitivos e a última falha são relançados para o chamador.
+    `prepare()` roda antes de cada tentativa e fica fora da latência medida (ex.: a espera
+    pelo orçamento de peso). Novas tentativas e falhas também vão para metrics.metrics.
+    """
+    if max_retries is None:
+        max_retries = MAX_RETRIES
+    for attempt in range(max_retries + 1):
+        if prepare is not None:
+            prepare()
+        started = time.perf_counter()
+        try:
+            result = fn()
+        except Exception as exc:
+            if attempt >= max_retries or not is_retryable(exc):
+                transport_stats.record(failure=True)
+                API_FAILURES.inc(endpoint=endpoint)
+                raise
+            delay = backoff_delay(attempt)
+            transport_stats.record(retry=True)
+            API_RETRIES.inc(endpoint=endpoint)
+            logging.info(f"Falha transitória na API ({exc}); nova tentativa em {delay:.2f}s")
+            time.sleep(delay)
+            continue
+        transport_stats.record(latency=time.perf_counter() - started)
+        return result
@@ -1,10 +1,10 @@
 import streamlit as st
 import pandas as pd
-import json
-import os
-import time
 from datetime import datetime
 from streamlit_autorefresh import st_autorefresh
+from data_control.snapshot import SnapshotCache
+from data_control.filters import stoch_columns, filter_and_sort, macd_norm_column
+from data_control import sql_store
 
 st.set_page_config(layout="wide")
 st_autorefresh(interval=5000, key="filecheck")
@@ -12,44 +12,34 @@ st_autorefresh(interval=5000, key="filecheck")
 st.title("📊 Dashboard Crypto Filtering")
 st.markdown("Dev by aishend - Stochastic Version 5-3-3 & 14-3-3 ☕️")
 
+SNAPSHOT_PATH = 'data_control/crypto_data.json'
+
+@st.cache_resource
+def get_snapshot_cache():
+    # Um único cache por processo, compartilhado por todas as sessões abertas
+    return SnapshotCache(SNAPSHOT_PATH)
+
 def load_data_from_file():
-    for _ in range(3):
-        try:
-            if os.path.exists('data_control/crypto_data.json'):
-                with open('data_control/crypto_data.json', 'r') as f:
-                    data = json.load(f)
-                df_valid = pd.DataFrame(data.get('df_valid', []))
-                failed = data.get('failed', [])
-                last_update = datetime.fromisoformat(data.get('last_update', datetime.now().isoformat()))
-                total_pairs = data.get('total_pairs', len(df_valid))
-                last_len = st.session_state.get('last_len', 0)
-                if len(df_valid) >= last_len:
-                    st.session_state['last_df_valid'] = df_valid
-                    st.session_state['last_failed'] = failed
-                    st.session_state['last_last_update'] = last_update
-                    st.session_state['last_total_pairs'] = total_pairs
-                    st.session_state['last_file_exists'] = True
-                    st.session_state['last_len'] = len(df_valid)
-                return (
-                    st.session_state.get('last_df_valid', pd.DataFrame()),
-                    st.session_state.get('last_failed', []),
-                    st.session_state.get('last_last_update', datetime.now()),
-                    st.session_state.get('last_total_pairs', 0),
-                    st.session_state.get('last_file_exists', False)
-                )
-            else:
-                return pd.DataFrame(), [], datetime.now(), 0, False
-        except Exception:
-            time.sleep(0.2)
+    # O DataFrame do snapshot é compartilhado entre sessões: não deve ser alterado in-place
+    snapshot = get_snapshot_cache().get()
+    if snapshot is None:
+        return pd.DataFrame(), [], datetime.now(), 0, False, None, None
+    last_len = st.session_state.get('last_len', 0)
+    if len(snapshot.df_valid) >= last_len:
+        st.session_state['last_snapshot'] = snapshot
+        st.session_state['last_len'] = len(snapshot.df_valid)
+    snapshot = st.session_state.get('last_snapshot', snapshot)
     return (
-        st.session_state.get('last_df_valid', pd.DataFrame()),
-        st.session_state.get('last_failed', []),
-        st.session_state.get('last_last_update', datetime.now()),
-        st.session_state.get('last_total_pairs', 0),
-        st.session_state.get('last_file_exists', False)
+        snapshot.df_valid,
+        list(snapshot.failed),
+        snapshot.last_update,
+        snapshot.total_pairs,
+        True,
+        snapshot.version,
+        snapshot.scan_id
     )
 
-df_valid, failed, last_update_time, total_pairs, file_exists = load_data_from_file()
+df_valid, failed, last_update_time, total_pairs, file_exists, snapshot_version, snapshot_scan_id = load_data_from_file()
 
 # ----------- Sidebar: Barra de Progresso e Status ----------- #
 with st.sidebar:
@@ -130,51 +120,35 @@ with st.sidebar:
     ) if macd_timeframes else None
 
 # ----------- Aplicar Filtros Stochastic ----------- #
-df_filtered = df_valid.copy()
-selected_stoch_columns = []
-for tf in selected_timeframes:
-    selected_stoch_columns += [col for col in df_valid.columns if col.startswith(f"{tf} Stoch")]
+selected_stoch_columns = stoch_columns(df_valid.columns, selected_timeframes)
+active_filters = {}
 
 if enable_above and value_above is not None and selected_stoch_columns:
-    for col in selected_stoch_columns:
-        df_filtered = df_filtered[df_filtered[col] >= value_above]
+    active_filters['above'] = value_above
     st.sidebar.success(f"Filtro ativo: Todos os selecionados ≥ {value_above}")
 
 if enable_below and value_below is not None and selected_stoch_columns:
-    for col in selected_stoch_columns:
-        df_filtered = df_filtered[df_filtered[col] <= value_below]
+    active_filters['below'] = value_below
     st.sidebar.success(f"Filtro ativo: Todos os selecionados ≤ {value_below}")
 
 if enable_extremos and selected_stoch_columns:
-    mask_extremos = df_filtered[selected_stoch_columns].apply(
-        lambda row: all((v <= extremos_min or v >= extremos_max) for v in row), axis=1
-    )
-    df_filtered = df_filtered[mask_extremos]
+    active_filters['extremos'] = (extremos_min, extremos_max)
     st.sidebar.success(f"Filtro ativo: Todos os selecionados ≤ {extremos_min} ou ≥ {extremos_max} (extremos)")
 
 if enable_intervalo and selected_stoch_columns:
-    mask_intervalo = df_filtered[selected_stoch_columns].apply(
-        lambda row: all((intervalo_min <= v <= intervalo_max) for v in row), axis=1
-    )
-    df_filtered = df_filtered[mask_intervalo]
+    active_filters['intervalo'] = (intervalo_min, intervalo_max)
     st.sidebar.success(f"Filtro ativo: Todos os selecionados entre {intervalo_min} e {intervalo_max} (intervalo personalizado)")
 
 # ----------- Ordenação: mais próximo de 50 no topo ----------- #
+df_filtered = None
+if sql_store.SQL_STORE_ENABLED and snapshot_scan_id is not None:
+    # Filtros executados no banco, sobre o mesmo scan do snapshot exibido (None se o
+    # scan não está no banco: filtra df_valid como sem SQL_STORE)
+    df_filtered = sql_store.filter_and_sort_sql(
+        selected_stoch_columns, sort_tf=sort_tf, scan_id=snapshot_scan_id, **active_filters)
+if df_filtered is None:
+    df_filtered = filter_and_sort(df_valid, snapshot_version, selected_stoch_columns, sort_tf=sort_tf, **active_filters)
 if sort_tf:
-    hist_col = f"{sort_tf}_macd_zero_lag_hist"
-    min_col = f"{sort_tf}_macd_zero_lag_hist_min"
-    max_col = f"{sort_tf}_macd_zero_lag_hist_max"
-    norm_col = f"MACD0lag_norm_{sort_tf}"
-
-    range_hist = df_filtered[max_col] - df_filtered[min_col]
-    range_hist = range_hist.replace(0, 1e-9)
-    df_filtered[norm_col] = (df_filtered[hist_col] - df_filtered[min_col]) / range_hist
-    zero_pos = (-df_filtered[min_col]) / range_hist
-    df_filtered[norm_col] = 100 * (df_filtered[norm_col] - zero_pos + 0.5)
-    df_filtered[norm_col] = df_filtered[norm_col].clip(0, 100)
-
-    # Ordenação: mais próximo de 50 no topo
-    df_filtered = df_filtered.loc[(df_filtered[norm_col] - 50).abs().sort_values().index].reset_index(drop=True)
     st.sidebar.info(f"Ordenação: MACD normalizado mais próximo de 50 (cruzamento) no topo")
 
 # ----------- Exibir Resultados ----------- #
@@ -182,27 +156,18 @@ if df_filtered.empty:
     st.warning("⚠️ Nenhum par atende aos filtros.")
     if not df_valid.empty:
         if sort_tf:
-            hist_col = f"{sort_tf}_macd_zero_lag_hist"
-            min_col = f"{sort_tf}_macd_zero_lag_hist_min"
-            max_col = f"{sort_tf}_macd_zero_lag_hist_max"
-            norm_col = f"MACD0lag_norm_{sort_tf}"
-            range_hist = df_valid[max_col] - df_valid[min_col]
-            range_hist = range_hist.replace(0, 1e-9)
-            df_valid[norm_col] = (df_valid[hist_col] - df_valid[min_col]) / range_hist
-            zero_pos = (-df_valid[min_col]) / range_hist
-            df_valid[norm_col] = 100 * (df_valid[norm_col] - zero_pos + 0.5)
-            df_valid[norm_col] = df_valid[norm_col].clip(0, 100)
-            df_valid = df_valid.loc[(df_valid[norm_col] - 50).abs().sort_values().index].reset_index(drop=True)
-            main_cols = ["Symbol"] + [col for col in df_valid.columns if "Stoch" in col]
-            col_order = [c for c in main_cols if c in df_valid.columns] + [norm_col]
+            df_sorted = filter_and_sort(df_valid, snapshot_version, [], sort_tf=sort_tf)
+            norm_col = macd_norm_column(sort_tf)
+            main_cols = ["Symbol"] + [col for col in df_sorted.columns if "Stoch" in col]
+            col_order = [c for c in main_cols if c in df_sorted.columns] + [norm_col]
             st.write("Dados disponíveis (sem filtros, ordenados):")
-            st.dataframe(df_valid[col_order], use_container_width=True)
+            st.dataframe(df_sorted[col_order], use_container_width=True)
         else:
             st.write("Dados disponíveis (sem filtros):")
             st.dataframe(df_valid, use_container_width=True)
 else:
     if sort_tf:
-        norm_col = f"MACD0lag_norm_{sort_tf}"
+        norm_col = macd_norm_column(sort_tf)
         main_cols = ["Symbol"] + [col for col in df_filtered.columns if "Stoch" in col]
         col_order = [c for c in main_cols if c in df_filtered.columns] + [norm_col]
         st.subheader(f"✅ Pares Filtrados ({len(df_filtered)} pares)")
@@ -1,26 +1,52 @@
 try:
-    from data_control.cache import get_klines_with_cache  # Função com cache para obter velas
+    from data_control.resample import get_klines  # Velas com cache (e reamostragem opcional)
 except ImportError:
-    from cache import get_klines_with_cache
+    from resample import get_klines
 try:
     from indicators_set.indicators import apply_technicals
 except ImportError:
     from indicators import apply_technicals
+from metrics.metrics import INDICATOR_SECONDS
 
+KLINE_COLUMNS = ["Open", "High", "Low", "Close", "Volume"]
 
-def analyze_timeframe(symbol, interval, lookback, prefix=""):
-    df = get_klines_with_cache(symbol, interval, lookback)
+
+def analyze_timeframe(symbol, interval, lookback, prefix="", outputs=None):
+    """
+    Velas de `interval` com os indicadores. `outputs` limita as colunas calculadas (ver
+    apply_technicals); nesse caso o df volta vazio se alguma saída pedida ainda for NaN
+    na última vela (histórico insuficiente para o período do indicador).
+    """
+    df = get_klines(symbol, interval, lookback)
     
     if df.empty:
-        print("DataFrame vazio após get_klines_with_cache.")
+        print("DataFrame vazio após get_klines.")
         return df
     
+    return analyze_klines(df, interval, prefix, outputs)
+
+def analyze_klines(df, interval, prefix="", outputs=None):
+    """Aplica os indicadores a velas já carregadas (ver analyze_timeframe)."""
     # Repassa o timeframe para aplicar os indicadores com os parâmetros corretos
-    df = apply_technicals(df, timeframe=interval)
+    with INDICATOR_SECONDS.time(timeframe=interval):
+        df = apply_technicals(df, timeframe=interval, outputs=outputs)
     
     if df.empty:
         return df
+    if outputs is not None and df[list(outputs)].iloc[-1].isna().any():
+        return df.iloc[0:0]
     
     if prefix:
         df = df.add_prefix(prefix)
     return df
+
+def klines_signature(df):
+    """
+    Identifica o conteúdo das velas sem compará-las inteiras: quantidade, primeira e
+    última vela (horário e OHLCV). Velas novas ou a vela em aberto atualizada mudam a
+    assinatura; um cache que voltou igual ("hit") mantém a mesma.
+    """
+    if df.empty:
+        return None
+    last = df.iloc[-1]
+    return [len(df), int(df.index[0].value), int(df.index[-1].value)] + [float(last[col]) for col in KLINE_COLUMNS]
@@ -1,26 +1,472 @@
 import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+import numpy as np
 import pandas as pd
-from binance_client.binance_client import get_futures_klines
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from binance_client.binance_client import INTERVAL_MS, get_futures_klines, get_futures_klines_range
+from indicators_set.indicator_config import INDICATOR_CONFIG
+from metrics.metrics import CACHE_REQUESTS, CACHE_SECONDS, CACHE_LOAD_SECONDS
+
+try:
+    from data_control.memory_cache import CACHE_MEMORY_BYTES, MemoryCache, file_signature, next_close
+    from data_control import sql_store
+except ImportError:
+    from memory_cache import CACHE_MEMORY_BYTES, MemoryCache, file_signature, next_close
+    import sql_store
+
+try:
+    import fcntl
+except ImportError:
+    # Sem fcntl (Windows) os locks valem só entre as threads deste processo
+    fcntl = None
 
 # Use um diretório de cache portável
 CACHE_DIR = os.path.join(os.path.dirname(__file__), "cache")
 if not os.path.exists(CACHE_DIR):
     os.makedirs(CACHE_DIR)
 
-def get_cache_filename(symbol, interval):
-    return os.path.join(CACHE_DIR, f"{symbol}_{interval}.csv")
+# Backend do cache: "bin" (arquivo binário mapeado em memória, padrão), "csv" (legado) ou
+# "sqlite" (tabela klines de sql_store, em SQL_STORE_PATH)
+CACHE_BACKEND = os.environ.get("CACHE_BACKEND", "bin")
 
-def load_cached_data(symbol, interval):
-    cache_file = get_cache_filename(symbol, interval)
+# Layout do arquivo binário: cabeçalho fixo seguido de registros de tamanho fixo,
+# ordenados por Time (epoch em ms). Novas velas são anexadas ao final do arquivo.
+# A versão 2 usa os primeiros bytes reservados da versão 1 para um contador de geração,
+# incrementado a cada gravação (arquivos da versão 1 são lidos com geração 0).
+KLINE_COLUMNS = ["Open", "High", "Low", "Close", "Volume"]
+KLINE_DTYPE = np.dtype([("Time", "<i8")] + [(col, "<f8") for col in KLINE_COLUMNS])
+CACHE_MAGIC = b"CDKLINES"
+CACHE_VERSION = 2
+READABLE_VERSIONS = (1, 2)
+HEADER_DTYPE = np.dtype([("magic", "S8"), ("version", "<u4"), ("record_size", "<u4"),
+                         ("generation", "<u8"), ("reserved", "V40")])
+HEADER_SIZE = HEADER_DTYPE.itemsize
+GENERATION_OFFSET = HEADER_DTYPE.fields["generation"][1]
+
+# Concorrência: toda gravação (anexar, reescrever, compactar, migrar) acontece sob
+# cache_lock, que combina um lock entre threads e um flock exclusivo em
+# "{arquivo}.lock" entre processos. Reescritas vão para um arquivo temporário que
+# substitui o original com os.replace; anexos só acrescentam registros inteiros ao
+# final. Leitores não precisam de lock: abrem o arquivo uma vez e ignoram um registro
+# final incompleto, então nunca veem um arquivo pela metade.
+
+# --- Retenção ---
+#
+# Cada intervalo guarda só o histórico que os indicadores usam: o maior lookback pedido
+# (registrado por get_klines_with_cache) mais velas de aquecimento para as EMAs
+# convergirem. Velas mais antigas são descartadas por uma compactação em segundo plano,
+# então o custo de carregar um arquivo não cresce com o tempo de uso.
+
+# Velas de aquecimento: 4x o maior período configurado (EMA lenta do MACD = 26 -> 104)
+CACHE_WARMUP_CANDLES = int(os.environ.get(
+    "CACHE_WARMUP_CANDLES",
+    4 * max(v for tf in INDICATOR_CONFIG.values() for params in tf.values() for v in params.values())
+))
+# Retenção fixa por intervalo, em dias, no lugar da calculada (ex.: "15m=30,1d=400")
+CACHE_RETENTION_DAYS = {
+    interval.strip(): float(days)
+    for interval, _, days in (item.partition("=") for item in os.environ.get("CACHE_RETENTION_DAYS", "").split(","))
+    if days
+}
+# O arquivo é compactado quando guarda mais que esta fração da retenção
+CACHE_COMPACT_SLACK = float(os.environ.get("CACHE_COMPACT_SLACK", "1.25"))
+
+_retention = {}  # intervalo -> maior período (Timedelta) registrado
+_file_locks = {}
+_file_locks_guard = threading.Lock()
+_compaction_executor = None
+_compaction_pending = set()
+_compaction_guard = threading.Lock()
+
+# Frames recentes em memória (ver memory_cache.py); desativada com CACHE_MEMORY_BYTES=0
+memory_cache = MemoryCache(CACHE_MEMORY_BYTES)
+
+def get_cache_filename(symbol, interval, backend=None):
+    backend = backend or CACHE_BACKEND
+    # No backend "sqlite" o nome só identifica o lock e a entrada da camada em memória
+    extension = {"bin": "klines", "csv": "csv", "sqlite": "sqlite"}[backend]
+    return os.path.join(CACHE_DIR, f"{symbol}_{interval}.{extension}")
+
+def _file_lock(cache_file):
+    """Lock por arquivo entre threads deste processo (gravações e compactação)."""
+    with _file_locks_guard:
+        return _file_locks.setdefault(cache_file, [threading.RLock(), 0, None])
+
+@contextmanager
+def cache_lock(cache_file):
+    """Lock exclusivo de gravação de `cache_file` (reentrante na mesma thread)."""
+    state = _file_lock(cache_file)
+    with state[0]:
+        if state[1] == 0 and fcntl is not None:
+            handle = open(cache_file + ".lock", "a")
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX)
+            state[2] = handle
+        state[1] += 1
+        try:
+            yield
+        finally:
+            state[1] -= 1
+            if state[1] == 0 and state[2] is not None:
+                handle, state[2] = state[2], None
+                fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+                handle.close()
+
+def _replace_file(path, write):
+    """Grava com `write(f)` em um temporário e troca o arquivo de uma vez."""
+    temp_file = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(temp_file, "wb") as f:
+            write(f)
+        os.replace(temp_file, path)
+    finally:
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
+
+def warmup_span(interval):
+    return pd.Timedelta(milliseconds=INTERVAL_MS[interval] * CACHE_WARMUP_CANDLES) if interval in INTERVAL_MS else pd.Timedelta(0)
+
+def register_retention(interval, span):
+    """Garante que o cache de `interval` mantenha pelo menos `span` de histórico."""
+    if span > _retention.get(interval, pd.Timedelta(0)):
+        _retention[interval] = span
+
+def retention_for(interval):
+    """Histórico mantido no cache de `interval`, ou None se nenhum lookback foi registrado."""
+    if interval in CACHE_RETENTION_DAYS:
+        return pd.Timedelta(days=CACHE_RETENTION_DAYS[interval])
+    return _retention.get(interval)
+
+def apply_retention(df, interval):
+    """Descarta as velas anteriores à retenção, contada a partir da última vela."""
+    retention = retention_for(interval)
+    if retention is None or df.empty:
+        return df
+    cutoff = df.index[-1] - retention
+    if df.index[0] >= cutoff:
+        return df
+    return df.iloc[df.index.searchsorted(cutoff):]
+
+def _dedup_sorted(df):
+    """Uma vela por horário (a última recebida prevalece), em ordem de horário."""
+    return df[~df.index.duplicated(keep="last")].sort_index()
+
+def _frame_to_records(df):
+    records = np.empty(len(df), dtype=KLINE_DTYPE)
+    records["Time"] = df.index.values.astype("datetime64[ms]").astype(np.int64)
+    for col in KLINE_COLUMNS:
+        records[col] = df[col].to_numpy(dtype=float)
+    return records
+
+def _records_to_frame(records):
+    index = pd.DatetimeIndex(pd.to_datetime(records["Time"], unit="ms"), name="Time")
+    return pd.DataFrame({col: records[col] for col in KLINE_COLUMNS}, index=index)
+
+def _write_header(f, generation=0):
+    header = np.zeros(1, dtype=HEADER_DTYPE)
+    header["magic"] = CACHE_MAGIC
+    header["version"] = CACHE_VERSION
+    header["record_size"] = KLINE_DTYPE.itemsize
+    header["generation"] = generation
+    f.write(header.tobytes())
+
+def _read_header(f):
+    """
+    Estado do cabeçalho: ("ok", geração), ("newer", versão) para um arquivo gravado por
+    uma versão mais nova do código, ou ("invalid", None) se corrompido ou truncado.
+    """
+    header = np.frombuffer(f.read(HEADER_SIZE), dtype=np.uint8)
+    if len(header) != HEADER_SIZE:
+        return "invalid", None
+    header = header.view(HEADER_DTYPE)[0]
+    if header["magic"] != CACHE_MAGIC:
+        return "invalid", None
+    version = int(header["version"])
+    if version > CACHE_VERSION:
+        return "newer", version
+    if version not in READABLE_VERSIONS or header["record_size"] != KLINE_DTYPE.itemsize:
+        return "invalid", None
+    return "ok", int(header["generation"])
+
+def _open_records(cache_file):
+    """(estado, geração, registros) de um arquivo binário, lido de uma única abertura."""
+    try:
+        f = open(cache_file, "rb")
+    except FileNotFoundError:
+        return "missing", 0, np.empty(0, dtype=KLINE_DTYPE)
+    with f:
+        state, generation = _read_header(f)
+        if state != "ok":
+            return state, generation, np.empty(0, dtype=KLINE_DTYPE)
+        # O tamanho vem do arquivo aberto: uma troca concorrente não afeta esta leitura,
+        # e um registro final incompleto (anexo em andamento) é ignorado
+        count = (os.fstat(f.fileno()).st_size - HEADER_SIZE) // KLINE_DTYPE.itemsize
+        if count <= 0:
+            return state, generation, np.empty(0, dtype=KLINE_DTYPE)
+        return state, generation, np.memmap(f, dtype=KLINE_DTYPE, mode="r", offset=HEADER_SIZE, shape=(count,))
+
+def cache_generation(symbol, interval):
+    """Geração atual do arquivo binário (muda a cada gravação); None se não houver cache."""
+    try:
+        with open(get_cache_filename(symbol, interval, "bin"), "rb") as f:
+            state, generation = _read_header(f)
+    except FileNotFoundError:
+        return None
+    return generation if state == "ok" else None
+
+def load_cached_records(symbol, interval):
+    """
+    Retorna as velas em cache como array estruturado (KLINE_DTYPE) mapeado em memória,
+    sem cópia. Retorna um array vazio se não houver cache ou se o arquivo for inválido
+    ou de uma versão desconhecida (tratado como cache ausente).
+    """
+    cache_file = get_cache_filename(symbol, interval, "bin")
+    if not os.path.exists(cache_file):
+        _migrate_csv_file(symbol, interval)
+    state, version, records = _open_records(cache_file)
+    if state in ("invalid", "newer"):
+        print(f"[AVISO] Cache ignorado ({state}, versão {version}): {cache_file}")
+    return records
+
+def _load_csv(symbol, interval):
+    cache_file = get_cache_filename(symbol, interval, "csv")
     if os.path.exists(cache_file):
         df = pd.read_csv(cache_file, index_col="Time", parse_dates=True)
         df.index = pd.to_datetime(df.index)
         return df
     return pd.DataFrame()
 
+def load_cached_data(symbol, interval):
+    """
+    Velas em cache como DataFrame, servidas da camada em memória enquanto o arquivo não
+    muda e a próxima vela não fecha. O df retornado é uma cópia rasa: colunas novas não
+    afetam o cache, mas os valores existentes não devem ser alterados in-place.
+    """
+    if CACHE_BACKEND == "sqlite":
+        # O SQLite já mantém as páginas lidas em cache
+        return sql_store.load_klines(symbol, interval)
+    if not memory_cache.max_bytes:
+        return _load_from_disk(symbol, interval)
+    cache_file = get_cache_filename(symbol, interval)
+    signature = file_signature(cache_file)
+    if signature is not None:
+        df = memory_cache.get(cache_file, signature)
+        if df is not None:
+            return df.copy(deep=False)
+    df = _load_from_disk(symbol, interval)
+    if signature is not None and not df.empty and interval in INTERVAL_MS:
+        memory_cache.put(cache_file, df, signature, next_close(INTERVAL_MS[interval]))
+        df = df.copy(deep=False)
+    return df
+
+def _load_from_disk(symbol, interval):
+    if CACHE_BACKEND == "csv":
+        return _load_csv(symbol, interval)
+    records = load_cached_records(symbol, interval)
+    if len(records) == 0:
+        return pd.DataFrame()
+    return _records_to_frame(records)
+
+def _write_records(cache_file, records):
+    """Reescreve o arquivo (chamar sob cache_lock). Retorna False se ele é de versão mais nova."""
+    state, generation, old = _open_records(cache_file)
+    del old
+    if state == "newer":
+        # Não sobrescreve o cache de uma versão mais nova do código que roda em paralelo
+        return False
+
+    def write(f):
+        _write_header(f, generation + 1 if state == "ok" else 0)
+        f.write(records.tobytes())
+    _replace_file(cache_file, write)
+    memory_cache.invalidate(cache_file)
+    return True
+
+def _append_records(cache_file, records, generation):
+    """Anexa registros inteiros ao final e avança a geração no cabeçalho (sob cache_lock)."""
+    with open(cache_file, "r+b") as f:
+        f.seek(0, os.SEEK_END)
+        # Descarta um registro incompleto deixado por uma gravação interrompida
+        size = f.tell()
+        f.truncate(size - (size - HEADER_SIZE) % KLINE_DTYPE.itemsize)
+        f.seek(0, os.SEEK_END)
+        f.write(records.tobytes())
+        f.flush()
+        f.seek(GENERATION_OFFSET)
+        f.write(np.array(generation + 1, dtype="<u8").tobytes())
+    memory_cache.invalidate(cache_file)
+
 def save_cached_data(symbol, interval, df):
     cache_file = get_cache_filename(symbol, interval)
-    df.to_csv(cache_file)
+    with cache_lock(cache_file):
+        if CACHE_BACKEND == "sqlite":
+            sql_store.replace_klines(symbol, interval, df)
+            return
+        if CACHE_BACKEND == "csv":
+            _replace_file(cache_file, lambda f: df.to_csv(f, encoding="utf-8"))
+            memory_cache.invalidate(cache_file)
+            return
+        _write_records(cache_file, _frame_to_records(df.sort_index()))
+
+def append_cached_data(symbol, interval, df_new):
+    """
+    Grava apenas as velas novas. Se todas são posteriores à última vela em cache,
+    os registros são anexados ao final do arquivo; se houver sobreposição, as velas
+    novas substituem as antigas com o mesmo Time e o arquivo é reescrito.
+    """
+    if df_new.empty:
+        return
+    cache_file = get_cache_filename(symbol, interval)
+    with cache_lock(cache_file):
+        if CACHE_BACKEND == "sqlite":
+            sql_store.upsert_klines(symbol, interval, df_new)
+            return
+        if CACHE_BACKEND == "csv":
+            df_cached = _load_csv(symbol, interval)
+            df_complete = _dedup_sorted(pd.concat([df_cached, df_new]))
+            save_cached_data(symbol, interval, df_complete)
+            return
+        new_records = _frame_to_records(df_new.sort_index())
+        state, generation, cached = _open_records(cache_file)
+        if len(cached) == 0:
+            _write_records(cache_file, new_records)
+        elif new_records["Time"][0] > cached["Time"][-1]:
+            del cached
+            _append_records(cache_file, new_records, generation)
+        else:
+            merged = np.concatenate([cached, new_records])
+            del cached
+            # Mantém a última ocorrência de cada Time (a vela mais recente prevalece)
+            _, last_idx = np.unique(merged["Time"][::-1], return_index=True)
+            merged = merged[len(merged) - 1 - last_idx]
+            _write_records(cache_file, merged)
+
+# --- Compactação ---
+
+def compact_cached_data(symbol, interval):
+    """
+    Regrava o cache de (symbol, interval) só com as velas dentro da retenção.
+    Retorna o número de velas descartadas (0 se não havia o que descartar).
+    """
+    if retention_for(interval) is None:
+        return 0
+    cache_file = get_cache_filename(symbol, interval)
+    with cache_lock(cache_file):
+        df = load_cached_data(symbol, interval)
+        kept = apply_retention(df, interval)
+        if len(kept) == len(df):
+            return 0
+        if CACHE_BACKEND == "sqlite":
+            sql_store.delete_klines_before(symbol, interval, kept.index[0])
+        else:
+            save_cached_data(symbol, interval, kept)
+        return len(df) - len(kept)
+
+def _needs_compaction(df, interval):
+    retention = retention_for(interval)
+    return retention is not None and not df.empty and df.index[-1] - df.index[0] > retention * CACHE_COMPACT_SLACK
+
+def _compact_in_background(symbol, interval):
+    global _compaction_executor
+    with _compaction_guard:
+        if (symbol, interval) in _compaction_pending:
+            return
+        _compaction_pending.add((symbol, interval))
+        if _compaction_executor is None:
+            _compaction_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="cache-compaction")
+    _compaction_executor.submit(_run_compaction, symbol, interval)
+
+def _run_compaction(symbol, interval):
+    try:
+        compact_cached_data(symbol, interval)
+    except Exception as exc:
+        print(f"[ERRO] Falha ao compactar o cache de {symbol} {interval}: {exc}")
+    finally:
+        with _compaction_guard:
+            _compaction_pending.discard((symbol, interval))
+
+def _cache_files():
+    """(symbol, interval, backend, caminho) de cada arquivo do CACHE_DIR."""
+    for name in sorted(os.listdir(CACHE_DIR)):
+        stem, extension = os.path.splitext(name)
+        backend = {".klines": "bin", ".csv": "csv"}.get(extension)
+        symbol, _, interval = stem.rpartition("_")
+        if backend and symbol:
+            yield symbol, interval, backend, os.path.join(CACHE_DIR, name)
+
+def compact_cache():
+    """Compacta todos os arquivos do cache com retenção conhecida. Retorna as velas descartadas."""
+    removed = 0
+    if CACHE_BACKEND == "sqlite":
+        for row in sql_store.klines_report().itertuples():
+            removed += compact_cached_data(row.symbol, row.interval)
+        return removed
+    for symbol, interval, backend, _ in _cache_files():
+        if backend == CACHE_BACKEND:
+            removed += compact_cached_data(symbol, interval)
+    return removed
+
+def cache_report():
+    """
+    Um registro por arquivo do cache: tamanho em bytes, velas, primeira e última vela,
+    idade da última vela e a retenção do intervalo.
+    """
+    now = pd.Timestamp.now(tz="UTC").tz_localize(None)
+    if CACHE_BACKEND == "sqlite":
+        # Tamanho por par não se aplica: todas as velas ficam no mesmo banco
+        report = sql_store.klines_report()
+        report.insert(2, "backend", "sqlite")
+        report["age"] = now - report["last"]
+        report["retention"] = report["interval"].map(retention_for)
+        return report
+    rows = []
+    for symbol, interval, backend, path in _cache_files():
+        row = {"symbol": symbol, "interval": interval, "backend": backend, "bytes": os.path.getsize(path),
+               "candles": 0, "first": None, "last": None, "age": None, "retention": retention_for(interval)}
+        if backend == "bin":
+            records = load_cached_records(symbol, interval)
+            times = pd.to_datetime(records["Time"][[0, -1]], unit="ms") if len(records) else None
+            row["candles"] = len(records)
+        else:
+            df = pd.read_csv(path, index_col="Time", parse_dates=True)
+            times = df.index[[0, -1]] if len(df) else None
+            row["candles"] = len(df)
+        if times is not None:
+            row["first"], row["last"] = times[0], times[1]
+            row["age"] = now - times[1]
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+def _migrate_csv_file(symbol, interval):
+    csv_file = get_cache_filename(symbol, interval, "csv")
+    if not os.path.exists(csv_file):
+        return False
+    cache_file = get_cache_filename(symbol, interval, "bin")
+    with cache_lock(cache_file):
+        # Outro processo pode ter migrado o arquivo enquanto este esperava o lock
+        if not os.path.exists(csv_file):
+            return False
+        df = _load_csv(symbol, interval)
+        if not df.empty:
+            _write_records(cache_file, _frame_to_records(df.sort_index()))
+        os.remove(csv_file)
+    return True
+
+def migrate_csv_cache():
+    """
+    Converte todos os arquivos {symbol}_{interval}.csv do CACHE_DIR para o formato binário.
+    Retorna o número de arquivos convertidos.
+    """
+    migrated = 0
+    for name in sorted(os.listdir(CACHE_DIR)):
+        if not name.endswith(".csv"):
+            continue
+        symbol, _, interval = name[:-len(".csv")].rpartition("_")
+        if symbol and _migrate_csv_file(symbol, interval):
+            migrated += 1
+    return migrated
 
 import re
 
@@ -35,11 +481,35 @@ def parse_lookback(lookback):
     else:
         return pd.Timedelta(lookback)
 
+def backfill_klines(symbol, interval, lookback, max_workers=None):
+    """
+    Baixa todo o histórico de `lookback` em páginas buscadas em paralelo e grava
+    direto no cache. Usado para inicializar o histórico de símbolos novos.
+    """
+    lookback_delta = parse_lookback(lookback)
+    lookback_time = pd.Timestamp.now(tz='UTC') - lookback_delta
+    start_timestamp = int(lookback_time.timestamp() * 1000)
+    df_full = get_futures_klines_range(symbol, interval, start_timestamp, max_workers=max_workers)
+    if not df_full.empty:
+        append_cached_data(symbol, interval, df_full)
+    return df_full
+
 def get_klines_with_cache(symbol, interval, lookback):
     """
     Obtém dados de velas (OHLCV) usando cache para Futures ou Spot.
+    O lookback pedido entra na retenção do intervalo; o df retornado já vem limitado a
+    ela e o arquivo é compactado em segundo plano quando passa da margem.
     """
-    df_cached = load_cached_data(symbol, interval)
+    register_retention(interval, parse_lookback(lookback) + warmup_span(interval))
+    with CACHE_SECONDS.time(interval=interval):
+        df = _get_klines_with_cache(symbol, interval, lookback)
+    if _needs_compaction(df, interval):
+        _compact_in_background(symbol, interval)
+    return apply_retention(df, interval)
+
+def _get_klines_with_cache(symbol, interval, lookback):
+    with CACHE_LOAD_SECONDS.time(interval=interval):
+        df_cached = load_cached_data(symbol, interval)
     now = pd.Timestamp.now(tz='UTC')
     # Adicione suporte para 15m!
     INTERVAL_DELTA = {
@@ -50,35 +520,55 @@ def get_klines_with_cache(symbol, interval, lookback):
     }
     if interval not in INTERVAL_DELTA:
         # fallback: não faz cache, busca direto
+        CACHE_REQUESTS.inc(interval=interval, result="uncached")
         lookback_delta = parse_lookback(lookback)
         lookback_time = pd.Timestamp.now(tz='UTC') - lookback_delta
         start_timestamp = int(lookback_time.timestamp() * 1000)
-        df_full = get_futures_klines(symbol, interval, start_timestamp)
+        df_full = get_futures_klines(symbol, interval, start_timestamp, backfill=True)
         if not df_full.empty:
             save_cached_data(symbol, interval, df_full)
         return df_full
 
-    if not df_cached.empty:
-        last_cached_time = df_cached.index.max()
+    def next_expected(df):
+        last_cached_time = df.index.max()
         if last_cached_time.tzinfo is None:
             last_cached_time = last_cached_time.tz_localize('UTC')
-        next_expected_time = last_cached_time + INTERVAL_DELTA[interval]
+        return last_cached_time + INTERVAL_DELTA[interval]
+
+    if not df_cached.empty and next_expected(df_cached) > now:
+        CACHE_REQUESTS.inc(interval=interval, result="hit")
+        return df_cached
+
+    # Cache desatualizado: com o lock do arquivo, só um scanner (thread ou processo) busca
+    # as velas novas; os outros esperam e relêem o arquivo já atualizado
+    with cache_lock(get_cache_filename(symbol, interval)):
+        with CACHE_LOAD_SECONDS.time(interval=interval):
+            df_cached = load_cached_data(symbol, interval)
+        return _refresh_cached(symbol, interval, lookback, df_cached, next_expected, now)
+
+def _refresh_cached(symbol, interval, lookback, df_cached, next_expected, now):
+    if not df_cached.empty:
+        next_expected_time = next_expected(df_cached)
         if next_expected_time > now:
+            CACHE_REQUESTS.inc(interval=interval, result="hit")
             return df_cached
+        CACHE_REQUESTS.inc(interval=interval, result="incremental")
         new_start_timestamp = int(next_expected_time.timestamp() * 1000)
-        df_new = get_futures_klines(symbol, interval, new_start_timestamp)
+        df_new = get_futures_klines(symbol, interval, new_start_timestamp, backfill=True)
         if not df_new.empty:
-            df_complete = pd.concat([df_cached, df_new]).drop_duplicates().sort_index()
-            save_cached_data(symbol, interval, df_complete)
+            df_complete = _dedup_sorted(pd.concat([df_cached, df_new]))
+            append_cached_data(symbol, interval, df_new)
             return df_complete
         return df_cached
     else:
-        lookback_delta = parse_lookback(lookback)
-        lookback_time = pd.Timestamp.now(tz='UTC') - lookback_delta
-        start_timestamp = int(lookback_time.timestamp() * 1000)
-        df_full = get_futures_klines(symbol, interval, start_timestamp)
-        if not df_full.empty:
-            save_cached_data(symbol, interval, df_full)
-        return df_full
-
+        CACHE_REQUESTS.inc(interval=interval, result="miss")
+        return backfill_klines(symbol, interval, lookback)
 
+if __name__ == "__main__":
+    if "--report" in sys.argv:
+        report = cache_report()
+        print(report.to_string(index=False) if not report.empty else "Cache vazio.")
+        if not report.empty:
+            print(f"\n{len(report)} arquivos, {report['bytes'].sum() / 1e6:.1f} MB, {report['candles'].sum()} velas")
+    else:
+        print(f"{migrate_csv_cache()} arquivos CSV convertidos para o cache binário.")
@@ -0,0 +1,102 @@
+# filters.py
+#
+# Filtros Stochastic e ordenação por MACD Zero Lag normalizado usados pelo dashboard.
+# As máscaras são montadas com numpy sobre a matriz (pares × colunas Stoch) em uma
+# única passada, e o resultado é memoizado por (versão do snapshot, parâmetros).
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+TIMEFRAMES = ["15m", "1h", "4h", "1d"]
+MEMO_SIZE = 64
+
+_memo = OrderedDict()
+_memo_lock = threading.Lock()
+
+def stoch_columns(columns, timeframes):
+    """Colunas "<tf> Stoch ..." dos timeframes selecionados, na ordem dos timeframes."""
+    selected = []
+    for tf in timeframes:
+        selected += [col for col in columns if col.startswith(f"{tf} Stoch")]
+    return selected
+
+def stoch_mask(values, above=None, below=None, extremos=None, intervalo=None):
+    """
+    Máscara booleana de linhas em que *todas* as colunas de `values` (matriz pares × colunas)
+    atendem aos filtros ativos. NaN nunca atende a um filtro, como nas comparações do pandas.
+      above:     todos >= above
+      below:     todos <= below
+      extremos:  (mín, máx) -> todos <= mín ou >= máx
+      intervalo: (mín, máx) -> todos entre mín e máx
+    """
+    values = np.asarray(values, dtype=float)
+    mask = np.ones(values.shape[0], dtype=bool)
+    if values.shape[1] == 0:
+        return mask
+    with np.errstate(invalid="ignore"):
+        if above is not None:
+            mask &= (values >= above).all(axis=1)
+        if below is not None:
+            mask &= (values <= below).all(axis=1)
+        if extremos is not None:
+            low, high = extremos
+            mask &= ((values <= low) | (values >= high)).all(axis=1)
+        if intervalo is not None:
+            low, high = intervalo
+            mask &= ((values >= low) & (values <= high)).all(axis=1)
+    return mask
+
+def normalized_macd(hist, hist_min, hist_max):
+    """
+    Histograma do MACD Zero Lag normalizado para 0-100 pelo mínimo/máximo de cada par,
+    com o zero do histograma em 50.
+    """
+    hist = np.asarray(hist, dtype=float)
+    hist_min = np.asarray(hist_min, dtype=float)
+    range_hist = np.asarray(hist_max, dtype=float) - hist_min
+    range_hist = np.where(range_hist == 0, 1e-9, range_hist)
+    norm = (hist - hist_min) / range_hist
+    zero_pos = -hist_min / range_hist
+    return np.clip(100 * (norm - zero_pos + 0.5), 0, 100)
+
+def macd_norm_column(sort_tf):
+    return f"MACD0lag_norm_{sort_tf}"
+
+def _filter_and_sort(df, columns, above, below, extremos, intervalo, sort_tf):
+    if df.empty:
+        return df
+    mask = stoch_mask(df[list(columns)].to_numpy(dtype=float), above, below, extremos, intervalo)
+    rows = np.flatnonzero(mask)
+    result = {col: df[col].to_numpy()[rows] for col in df.columns}
+    if sort_tf:
+        norm = normalized_macd(
+            result[f"{sort_tf}_macd_zero_lag_hist"],
+            result[f"{sort_tf}_macd_zero_lag_hist_min"],
+            result[f"{sort_tf}_macd_zero_lag_hist_max"]
+        )
+        result[macd_norm_column(sort_tf)] = norm
+        # Ordenação: mais próximo de 50 (cruzamento do zero) no topo
+        order = np.argsort(np.abs(norm - 50), kind="stable")
+        result = {col: values[order] for col, values in result.items()}
+    return pd.DataFrame(result, columns=list(result))
+
+def filter_and_sort(df, version, columns, above=None, below=None, extremos=None, intervalo=None, sort_tf=None):
+    """
+    Aplica os filtros Stochastic sobre `columns` e, se `sort_tf` for informado, adiciona a
+    coluna MACD0lag_norm_<tf> e ordena pelo valor mais próximo de 50. O resultado é
+    memoizado por (version, parâmetros) e compartilhado: não deve ser alterado in-place.
+    """
+    key = (version, tuple(columns), above, below,
+           tuple(extremos) if extremos else None, tuple(intervalo) if intervalo else None, sort_tf)
+    with _memo_lock:
+        if key in _memo:
+            _memo.move_to_end(key)
+            return _memo[key]
+    result = _filter_and_sort(df, columns, above, below, extremos, intervalo, sort_tf)
+    with _memo_lock:
+        _memo[key] = result
+        while len(_memo) > MEMO_SIZE:
+            _memo.popitem(last=False)
+    return result
@@ -0,0 +1,104 @@
+# memory_cache.py
+#
+# Camada em memória na frente de cache.load_cached_data. Os DataFrames de velas ficam
+# em um LRU limitado por bytes (CACHE_MEMORY_BYTES); cada entrada expira no próximo
+# fechamento de vela do seu intervalo, quando o arquivo em disco vai receber uma vela
+# nova de qualquer forma. Além do prazo, cada entrada guarda a assinatura do arquivo
+# (inode, tamanho, mtime): uma gravação deste ou de outro processo invalida a entrada
+# na leitura seguinte, e as gravações deste processo a descartam na hora (ver cache.py).
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from metrics.metrics import CACHE_MEMORY_REQUESTS, CACHE_MEMORY_BYTES_USED
+
+# Orçamento de memória da camada, em bytes (0 desativa)
+CACHE_MEMORY_BYTES = int(os.environ.get("CACHE_MEMORY_BYTES", str(256 * 1024 * 1024)))
+
+class MemoryCache:
+    """LRU de DataFrames limitado por bytes, com validade por entrada."""
+
+    def __init__(self, max_bytes=CACHE_MEMORY_BYTES):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._entries = OrderedDict()  # chave -> (df, assinatura, expira_em, bytes)
+        self._lock = threading.Lock()
+        self.stats = {"hit": 0, "miss": 0, "stale": 0, "expired": 0, "evicted": 0}
+
+    def _count(self, result):
+        self.stats[result] += 1
+        if result != "evicted":
+            CACHE_MEMORY_REQUESTS.inc(result=result)
+
+    def _drop(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.bytes -= entry[3]
+
+    def get(self, key, signature, now=None):
+        """DataFrame guardado em `key` se a assinatura confere e ainda não expirou, senão None."""
+        now = time.time() if now is None else now
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._count("miss")
+                return None
+            df, entry_signature, expires_at, _ = entry
+            if entry_signature != signature:
+                self._drop(key)
+                self._count("stale")
+                return None
+            if now >= expires_at:
+                self._drop(key)
+                self._count("expired")
+                return None
+            self._entries.move_to_end(key)
+            self._count("hit")
+            return df
+
+    def put(self, key, df, signature, expires_at):
+        size = int(df.memory_usage(index=True, deep=False).sum())
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            self._drop(key)
+            self._entries[key] = (df, signature, expires_at, size)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+                self._count("evicted")
+            CACHE_MEMORY_BYTES_USED.set(self.bytes)
+
+    def invalidate(self, key):
+        with self._lock:
+            self._drop(key)
+            CACHE_MEMORY_BYTES_USED.set(self.bytes)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+            CACHE_MEMORY_BYTES_USED.set(0)
+
+    def summary(self):
+        """Contadores, ocupação e taxa de acerto desde o início do processo."""
+        with self._lock:
+            lookups = self.stats["hit"] + self.stats["miss"] + self.stats["stale"] + self.stats["expired"]
+            return dict(self.stats, entries=len(self._entries), bytes=self.bytes, max_bytes=self.max_bytes,
+                        hit_ratio=round(self.stats["hit"] / lookups, 4) if lookups else None)
+
+def file_signature(path):
+    """(inode, tamanho, mtime) do arquivo, ou None se ele não existe."""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return st.st_ino, st.st_size, st.st_mtime_ns
+
+def next_close(interval_ms, now=None):
+    """Instante (epoch em segundos) do próximo fechamento de vela do intervalo."""
+    now = time.time() if now is None else now
+    step = interval_ms / 1000
+    return (now // step + 1) * step
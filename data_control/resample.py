@@ -0,0 +1,124 @@
+# resample.py
+import os
+import numpy as np
+import pandas as pd
+from binance_client.binance_client import INTERVAL_MS
+
+try:
+    from data_control.cache import get_klines_with_cache, backfill_klines, parse_lookback, register_retention, warmup_span
+except ImportError:
+    from cache import get_klines_with_cache, backfill_klines, parse_lookback, register_retention, warmup_span
+
+# Intervalo base buscado na API (ex.: "15m" ou "1m"). Os timeframes maiores são
+# montados localmente a partir dele. Vazio = cada timeframe é buscado na API.
+RESAMPLE_BASE_INTERVAL = os.environ.get("RESAMPLE_BASE_INTERVAL", "")
+
+# As velas semanais da Binance abrem na segunda-feira 00:00 UTC; o epoch (1970-01-01)
+# é uma quinta-feira, então os baldes semanais são deslocados em 4 dias.
+_BUCKET_OFFSET_MS = {"1w": 4 * INTERVAL_MS["1d"]}
+
+# Início mais antigo já solicitado por (símbolo, intervalo base), para não repetir o
+# backfill de símbolos listados há menos tempo que o lookback.
+_backfilled_since = {}
+
+def can_resample(interval, base_interval):
+    if not base_interval or interval == base_interval:
+        return False
+    if interval not in INTERVAL_MS or base_interval not in INTERVAL_MS:
+        return False
+    return INTERVAL_MS[interval] > INTERVAL_MS[base_interval] and INTERVAL_MS[interval] % INTERVAL_MS[base_interval] == 0
+
+def resample_ohlcv(df, interval, drop_partial_first=True):
+    """
+    Agrega velas OHLCV para `interval` com baldes alinhados aos da Binance (UTC).
+    Open = primeira abertura, High = máximo, Low = mínimo, Close = último fechamento,
+    Volume = soma. O primeiro balde é descartado se o histórico começa no meio dele;
+    o último pode estar incompleto, igual à vela em aberto retornada pela API.
+    """
+    if df.empty:
+        return df
+    step = INTERVAL_MS[interval]
+    offset = _BUCKET_OFFSET_MS.get(interval, 0)
+    times = df.index.values.astype("datetime64[ms]").astype(np.int64)
+    buckets = (times - offset) // step * step + offset
+
+    boundaries = np.flatnonzero(np.diff(buckets)) + 1
+    starts = np.concatenate(([0], boundaries))
+    ends = np.concatenate((boundaries, [len(times)])) - 1
+
+    opens = df["Open"].to_numpy(dtype=float)
+    highs = df["High"].to_numpy(dtype=float)
+    lows = df["Low"].to_numpy(dtype=float)
+    closes = df["Close"].to_numpy(dtype=float)
+    volumes = df["Volume"].to_numpy(dtype=float)
+
+    index = pd.DatetimeIndex(pd.to_datetime(buckets[starts], unit="ms"), name=df.index.name)
+    frame = pd.DataFrame({
+        "Open": opens[starts],
+        "High": np.maximum.reduceat(highs, starts),
+        "Low": np.minimum.reduceat(lows, starts),
+        "Close": closes[ends],
+        "Volume": np.add.reduceat(volumes, starts),
+    }, index=index)
+
+    if drop_partial_first and times[0] != buckets[0]:
+        frame = frame.iloc[1:]
+    return frame
+
+def _ensure_base_history(symbol, base_interval, lookback):
+    """
+    Garante que o cache do intervalo base cobre todo o lookback pedido pelo timeframe
+    maior; o cache base pode ter sido criado por um timeframe com lookback menor.
+    """
+    df = get_klines_with_cache(symbol, base_interval, lookback)
+    start = pd.Timestamp.now(tz='UTC').tz_localize(None) - parse_lookback(lookback)
+    key = (symbol, base_interval)
+    if key in _backfilled_since and _backfilled_since[key] <= start:
+        return df
+    if df.empty or df.index.min() > start + pd.Timedelta(milliseconds=INTERVAL_MS[base_interval]):
+        backfill_klines(symbol, base_interval, lookback)
+        _backfilled_since[key] = start
+        df = get_klines_with_cache(symbol, base_interval, lookback)
+    return df
+
+def register_timeframes(timeframes, base_interval=None):
+    """
+    Registra de uma vez a retenção de todos os (intervalo, lookback) do scan, antes da
+    primeira leitura. Sem isso o primeiro timeframe lido (com o menor lookback) fixa a
+    retenção do intervalo base, a compactação corta o histórico e o timeframe maior
+    seguinte precisa buscá-lo de novo na API.
+    """
+    if base_interval is None:
+        base_interval = RESAMPLE_BASE_INTERVAL
+    for interval, lookback in timeframes:
+        target = base_interval if can_resample(interval, base_interval) else interval
+        register_retention(target, parse_lookback(lookback) + warmup_span(interval))
+
+def get_klines(symbol, interval, lookback, base_interval=None):
+    """
+    Retorna velas de `interval`. Com um intervalo base configurado, busca e mantém em
+    cache apenas o intervalo base e monta os timeframes maiores localmente.
+    """
+    if base_interval is None:
+        base_interval = RESAMPLE_BASE_INTERVAL
+    if not can_resample(interval, base_interval):
+        return get_klines_with_cache(symbol, interval, lookback)
+    # O cache base precisa cobrir também o aquecimento dos indicadores no timeframe maior
+    register_retention(base_interval, parse_lookback(lookback) + warmup_span(interval))
+    df_base = _ensure_base_history(symbol, base_interval, lookback)
+    return resample_ohlcv(df_base, interval)
+
+def verify_resample(symbol, interval, lookback, base_interval=None):
+    """
+    Compara as velas montadas localmente com as velas nativas da Binance para o mesmo
+    período. Retorna a maior diferença absoluta por coluna (NaN se não houver sobreposição).
+    """
+    base_interval = base_interval or RESAMPLE_BASE_INTERVAL
+    local = get_klines(symbol, interval, lookback, base_interval)
+    native = get_klines_with_cache(symbol, interval, lookback)
+    common = local.index.intersection(native.index)
+    # A última vela pode estar em aberto em um dos lados
+    common = common[common < common.max()] if len(common) else common
+    if not len(common):
+        return pd.Series(np.nan, index=local.columns)
+    return (local.loc[common] - native.loc[common, local.columns]).abs().max()
@@ -0,0 +1,115 @@
+# result_log.py
+#
+# Gravação incremental dos resultados do scan. Cada par processado vira uma linha JSON
+# anexada a crypto_data.log (custo constante por par, sem fsync). O crypto_data.json
+# passa a ser um manifesto compacto regravado a cada MANIFEST_EVERY pares e no fim do
+# scan, com o deslocamento do log até onde os resultados já estão incluídos.
+#
+# Leitores combinam manifesto + linhas do log após log_offset (ver read_log_records),
+# desde que o scan_id do cabeçalho do log seja o mesmo do manifesto.
+import json
+import os
+import uuid
+from datetime import datetime
+
+from metrics.metrics import JSON_WRITE_SECONDS
+
+MANIFEST_EVERY = int(os.environ.get("MANIFEST_EVERY", "50"))
+
+def log_path_for(manifest_path):
+    return os.path.splitext(str(manifest_path))[0] + ".log"
+
+def safe_json_write(data, final_path):
+    with JSON_WRITE_SECONDS.time():
+        temp_path = str(final_path) + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, final_path)
+
+class ScanResultLog:
+    """
+    Escritor do scan: start() abre um novo scan, record() anexa um resultado e
+    finish() grava o manifesto final com todos os pares na ordem de índice.
+    """
+
+    def __init__(self, manifest_path, total_pairs, manifest_every=None):
+        self.manifest_path = manifest_path
+        self.log_path = log_path_for(manifest_path)
+        self.total_pairs = total_pairs
+        self.manifest_every = manifest_every or MANIFEST_EVERY
+        self.scan_id = None
+        self.results = {}  # índice -> linha válida, ou None se falhou
+        self.symbols = {}
+        self._log = None
+        self._since_manifest = 0
+
+    def start(self):
+        self.scan_id = uuid.uuid4().hex
+        header = json.dumps({"scan_id": self.scan_id, "started": datetime.now().isoformat()}) + "\n"
+        # O manifesto novo é gravado antes de truncar o log: um leitor que ainda veja o
+        # log antigo o ignora, porque o scan_id do cabeçalho não confere.
+        self.write_manifest(log_offset=len(header.encode("utf-8")))
+        self._log = open(self.log_path, "w", encoding="utf-8")
+        self._log.write(header)
+        self._log.flush()
+
+    def record(self, idx, symbol, row):
+        """Anexa o resultado de um par (row=None indica falha)."""
+        self.results[idx] = row
+        self.symbols[idx] = symbol
+        entry = {"i": idx, "row": row} if row is not None else {"i": idx, "failed": symbol}
+        self._log.write(json.dumps(entry) + "\n")
+        self._log.flush()
+        self._since_manifest += 1
+        if self._since_manifest >= self.manifest_every:
+            self.write_manifest()
+
+    def rows(self):
+        valid_rows = [self.results[i] for i in sorted(self.results) if self.results[i] is not None]
+        failed_pairs = [self.symbols[i] for i in sorted(self.results) if self.results[i] is None]
+        return valid_rows, failed_pairs
+
+    def write_manifest(self, log_offset=None, complete=False, summary=None):
+        if log_offset is None:
+            log_offset = self._log.tell() if self._log else 0
+        valid_rows, failed_pairs = self.rows()
+        data = {
+            'df_valid': valid_rows,
+            'failed': failed_pairs,
+            'last_update': datetime.now().isoformat(),
+            'total_pairs': self.total_pairs,
+            'scan_id': self.scan_id,
+            'log_offset': log_offset,
+            'complete': complete
+        }
+        if summary is not None:
+            data['scan_summary'] = summary
+        safe_json_write(data, self.manifest_path)
+        self._since_manifest = 0
+
+    def finish(self, summary=None):
+        """Grava o manifesto final; `summary` vai junto como scan_summary (ver update_data)."""
+        self.write_manifest(complete=True, summary=summary)
+        self._log.close()
+        self._log = None
+        return self.rows()
+
+def read_log_records(log_path, scan_id, offset):
+    """
+    Lê as linhas completas do log a partir de `offset` se o cabeçalho for de `scan_id`.
+    Retorna (registros, novo_offset); linhas ainda sendo escritas ficam para a próxima leitura.
+    """
+    try:
+        with open(log_path, "rb") as f:
+            header = json.loads(f.readline() or b"{}")
+            if header.get("scan_id") != scan_id:
+                return [], offset
+            f.seek(offset)
+            chunk = f.read()
+    except (OSError, ValueError):
+        return [], offset
+    end = chunk.rfind(b"\n") + 1
+    records = [json.loads(line) for line in chunk[:end].splitlines() if line]
+    return records, offset + end
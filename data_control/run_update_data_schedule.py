@@ -1,29 +1,85 @@
 #!/usr/bin/env python3
-import schedule
-import time
-import subprocess
+# Daemon de atualização: roda no mesmo processo (cliente Binance, caches e módulos já
+# carregados ficam em memória entre os scans) e dispara cada scan logo após o
+# fechamento de uma vela de SCAN_INTERVAL, sem sobrepor execuções.
+import sys
 import os
+import time
+import signal
+import logging
+import threading
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from binance_client.binance_client import INTERVAL_MS, get_futures_pairs
+from data_control.update_data import scan_pairs
+from data_control.update_trading_pairs import write_pairs_to_file
+from trading_pairs.trading_pairs import TRADING_PAIRS
+from metrics.metrics import start_metrics_server
+
+# Intervalo de vela que define quando os scans rodam (um scan por fechamento)
+SCAN_INTERVAL = os.environ.get("SCAN_INTERVAL", "15m")
+# Espera após o fechamento para a vela fechada já estar disponível na API
+SCAN_DELAY_SECONDS = float(os.environ.get("SCAN_DELAY_SECONDS", "5"))
+# A lista de pares é atualizada a cada 24 horas
+PAIRS_REFRESH_SECONDS = 24 * 60 * 60
+TRADING_PAIRS_FILE = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'trading_pairs', 'trading_pairs.py'))
 
-VENV_PYTHON = "/home/leandro/cryptoDashboard/.venv/bin/python"
-DATA_CONTROL = "/home/leandro/cryptoDashboard/data_control"
+def next_candle_close(now, interval=SCAN_INTERVAL):
+    """Instante (epoch em segundos) do próximo fechamento de vela de `interval` após `now`."""
+    step = INTERVAL_MS[interval] / 1000
+    return (now // step + 1) * step
 
-def update_trading_pairs():
-    print("Rodando update_trading_pairs.py")
-    subprocess.run([VENV_PYTHON, f"{DATA_CONTROL}/update_trading_pairs.py"])
+class UpdateDaemon:
+    def __init__(self, interval=SCAN_INTERVAL, delay=SCAN_DELAY_SECONDS):
+        self.interval = interval
+        self.delay = delay
+        self.pairs = list(TRADING_PAIRS)
+        self.last_pairs_update = None
+        self._stop = threading.Event()
 
-def update_data():
-    print("Rodando update_data.py")
-    subprocess.run([VENV_PYTHON, f"{DATA_CONTROL}/update_data.py"])
+    def stop(self, *args):
+        self._stop.set()
 
-# Roda update_trading_pairs.py a cada 24 horas (a partir do momento em que o script iniciar)
-schedule.every(24).hours.do(update_trading_pairs)
+    def update_trading_pairs(self):
+        print("Atualizando lista de pares")
+        try:
+            pairs = get_futures_pairs()
+            write_pairs_to_file(pairs, TRADING_PAIRS_FILE)
+            self.pairs = pairs
+        except Exception as e:
+            print(f"[ERRO] Erro ao atualizar trading_pairs.py: {e}")
+        self.last_pairs_update = time.time()
 
-# Roda update_data.py a cada 30 minutos
-schedule.every(15).minutes.do(update_data)
+    def update_data(self):
+        print(f"Iniciando scan de {len(self.pairs)} pares")
+        started = time.time()
+        try:
+            scan_pairs(pairs=self.pairs)
+        except Exception as e:
+            print(f"[ERRO] Erro na atualização: {e}")
+        print(f"Scan concluído em {time.time() - started:.1f}s")
 
-# (Opcional) Rode ambos no início
-update_trading_pairs()
-update_data()
+    def run_forever(self):
+        self.update_trading_pairs()
+        self.update_data()
+        while not self._stop.is_set():
+            now = time.time()
+            wake_at = next_candle_close(now - self.delay, self.interval) + self.delay
+            # Bloqueia até o próximo fechamento (sem consumir CPU) ou até stop()
+            if self._stop.wait(timeout=max(wake_at - now, 0)):
+                break
+            if time.time() - self.last_pairs_update >= PAIRS_REFRESH_SECONDS:
+                self.update_trading_pairs()
+            # O scan roda nesta mesma thread, então nunca há dois ao mesmo tempo. Se um
+            # scan passar do próximo fechamento, esse fechamento é pulado.
+            self.update_data()
 
-while True:
-    schedule.run_pending()
\ No newline at end of file
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    # Com METRICS_PORT definido, as métricas acumuladas entre scans ficam em /metrics
+    if start_metrics_server():
+        logging.info(f"Métricas disponíveis em http://127.0.0.1:{os.environ.get('METRICS_PORT')}/metrics")
+    daemon = UpdateDaemon()
+    signal.signal(signal.SIGTERM, daemon.stop)
+    signal.signal(signal.SIGINT, daemon.stop)
+    daemon.run_forever()
@@ -0,0 +1,122 @@
+# snapshot.py
+#
+# Cache em memória do crypto_data.json compartilhado por todas as sessões do dashboard
+# no mesmo processo. O manifesto só é lido de novo quando muda de mtime, tamanho ou
+# inode (o scanner grava com os.replace, que troca o inode a cada versão). Entre
+# manifestos, apenas as linhas novas do log do scan (crypto_data.log) são lidas.
+import json
+import os
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime
+
+import pandas as pd
+
+try:
+    from data_control.result_log import log_path_for, read_log_records
+except ImportError:
+    from result_log import log_path_for, read_log_records
+
+Snapshot = namedtuple("Snapshot", ["df_valid", "failed", "last_update", "total_pairs", "version", "scan_id"])
+
+def _freeze_frame(rows):
+    """Monta o DataFrame com arrays somente leitura (o mesmo objeto é compartilhado entre sessões)."""
+    df = pd.DataFrame(rows)
+    columns = {}
+    for col in df.columns:
+        values = df[col].to_numpy(copy=True)
+        values.setflags(write=False)
+        columns[col] = values
+    return pd.DataFrame(columns, index=df.index, copy=False)
+
+class SnapshotCache:
+    """
+    Mantém o último snapshot lido de `path`. get() só faz json.load do manifesto quando a
+    versão do arquivo (mtime, tamanho, inode) mudou, e só lê do log as linhas anexadas
+    desde a última chamada; sem mudanças devolve o mesmo objeto.
+    """
+
+    def __init__(self, path, retries=3, retry_delay=0.2):
+        self.path = path
+        self.log_path = log_path_for(path)
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.loads = 0
+        self._snapshot = None
+        self._manifest = None
+        self._manifest_version = None
+        self._log_rows = []
+        self._log_failed = []
+        self._log_offset = 0
+        self._lock = threading.Lock()
+
+    def _file_version(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+    def _read_manifest(self, version):
+        with open(self.path, "r") as f:
+            self._manifest = json.load(f)
+        self._manifest_version = version
+        self._log_rows = []
+        self._log_failed = []
+        self._log_offset = self._manifest.get("log_offset", 0)
+        self.loads += 1
+
+    def _read_log(self):
+        scan_id = self._manifest.get("scan_id")
+        if not scan_id or self._manifest.get("complete"):
+            return False
+        records, offset = read_log_records(self.log_path, scan_id, self._log_offset)
+        if offset == self._log_offset:
+            return False
+        self._log_offset = offset
+        for record in records:
+            if "row" in record:
+                self._log_rows.append(record["row"])
+            else:
+                self._log_failed.append(record["failed"])
+        return True
+
+    def _build(self):
+        data = self._manifest
+        rows = data.get("df_valid", []) + self._log_rows
+        last_update = data.get("last_update")
+        last_update = datetime.fromisoformat(last_update) if last_update else datetime.now()
+        if self._log_rows or self._log_failed:
+            last_update = max(last_update, datetime.fromtimestamp(os.path.getmtime(self.log_path)))
+        return Snapshot(
+            df_valid=_freeze_frame(rows),
+            failed=tuple(data.get("failed", []) + self._log_failed),
+            last_update=last_update,
+            total_pairs=data.get("total_pairs", len(rows)),
+            version=(self._manifest_version, self._log_offset),
+            scan_id=data.get("scan_id"),
+        )
+
+    def get(self):
+        """
+        Retorna o Snapshot atual, ou None se o arquivo não existe. Se a leitura falhar
+        (arquivo sendo trocado), devolve o último snapshot válido.
+        """
+        with self._lock:
+            for _ in range(self.retries):
+                version = self._file_version()
+                if version is None:
+                    return None
+                try:
+                    changed = False
+                    if version != self._manifest_version:
+                        self._read_manifest(version)
+                        changed = True
+                    changed = self._read_log() or changed
+                    if changed or self._snapshot is None:
+                        self._snapshot = self._build()
+                    break
+                except Exception:
+                    time.sleep(self.retry_delay)
+            return self._snapshot
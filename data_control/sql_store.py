@@ -0,0 +1,327 @@
+# sql_store.py
+#
+# Armazenamento opcional em SQLite (sqlite3 da biblioteca padrão) para velas e
+# resultados dos scans, em tabelas indexadas:
+#
+#   klines   (symbol, interval, time) -> OHLCV          backend "sqlite" do cache (CACHE_BACKEND)
+#   scans    um registro por scan concluído            gravado por scan_pairs com SQL_STORE=1
+#   results  (scan_id, symbol, timeframe) -> Stoch 5-3-3, Stoch 14-3-3, MACD Zero Lag, Close
+#
+# As linhas de results são gravadas durante o scan, par a par, então o scan em andamento
+# (o mesmo que o dashboard mostra a partir do crypto_data.json) já pode ser consultado;
+# o registro em scans só aparece quando ele termina.
+#
+# Os resultados ficam em formato longo (uma linha por símbolo e timeframe), então
+# consultas ad hoc como "pares com Stoch 4h < 20 na última semana" e os filtros do
+# dashboard (filter_and_sort_sql) viram SQL servido pelos índices, sem carregar o
+# crypto_data.json inteiro no pandas.
+import json
+import os
+import sqlite3
+import threading
+
+import numpy as np
+import pandas as pd
+
+try:
+    from data_control.filters import TIMEFRAMES, _filter_and_sort
+except ImportError:
+    from filters import TIMEFRAMES, _filter_and_sort
+
+SQL_STORE_PATH = os.environ.get(
+    "SQL_STORE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "crypto_data.sqlite")
+)
+# Grava os resultados de cada scan e filtra o dashboard em SQL
+SQL_STORE_ENABLED = os.environ.get("SQL_STORE", "") not in ("", "0")
+# Scans concluídos mantidos no banco (os mais antigos e seus resultados são apagados ao
+# gravar um scan novo); 0 = mantém todos. 96 = um dia de scans a cada 15 minutos.
+SQL_STORE_KEEP_SCANS = int(os.environ.get("SQL_STORE_KEEP_SCANS", "96"))
+
+SCHEMA_VERSION = 1
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS klines (
+    symbol   TEXT    NOT NULL,
+    interval TEXT    NOT NULL,
+    time     INTEGER NOT NULL,  -- abertura da vela, epoch em ms
+    open     REAL, high REAL, low REAL, close REAL, volume REAL,
+    PRIMARY KEY (symbol, interval, time)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS scans (
+    scan_id     TEXT PRIMARY KEY,
+    started     TEXT,
+    finished    TEXT NOT NULL,
+    total_pairs INTEGER,
+    valid       INTEGER,
+    failed      TEXT,  -- lista JSON
+    summary     TEXT   -- scan_summary em JSON
+);
+CREATE INDEX IF NOT EXISTS scans_finished ON scans (finished);
+
+CREATE TABLE IF NOT EXISTS results (
+    scan_id       TEXT NOT NULL,
+    symbol        TEXT NOT NULL,
+    timeframe     TEXT NOT NULL,
+    position      INTEGER,  -- índice do par na lista do scan (o "i" do log de resultados)
+    stoch_5_3_3   REAL,
+    stoch_14_3_3  REAL,
+    macd_hist     REAL,
+    macd_hist_min REAL,
+    macd_hist_max REAL,
+    close         REAL,
+    PRIMARY KEY (scan_id, symbol, timeframe)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS results_stoch_5 ON results (scan_id, timeframe, stoch_5_3_3);
+CREATE INDEX IF NOT EXISTS results_stoch_14 ON results (scan_id, timeframe, stoch_14_3_3);
+CREATE INDEX IF NOT EXISTS results_symbol ON results (symbol, timeframe);
+"""
+
+KLINE_COLUMNS = ["Open", "High", "Low", "Close", "Volume"]
+
+# Coluna da tabela results -> chave da linha de resultado do scan (ver update_data._timeframe_result)
+RESULT_COLUMNS = {
+    "stoch_5_3_3": "{tf} Stoch 5-3-3",
+    "stoch_14_3_3": "{tf} Stoch 14-3-3",
+    "macd_hist": "{tf}_macd_zero_lag_hist",
+    "macd_hist_min": "{tf}_macd_zero_lag_hist_min",
+    "macd_hist_max": "{tf}_macd_zero_lag_hist_max",
+    "close": "{tf}_Close",
+}
+# Coluna Stoch do dashboard ("<tf> Stoch 5-3-3") -> coluna da tabela results
+STOCH_COLUMNS = {"Stoch 5-3-3": "stoch_5_3_3", "Stoch 14-3-3": "stoch_14_3_3"}
+
+_local = threading.local()
+
+def connect(path=None):
+    """
+    Conexão da thread atual com o banco (uma por thread e processo, reaproveitada).
+    Cria as tabelas na primeira conexão. WAL permite leitores durante as gravações.
+    """
+    path = path or SQL_STORE_PATH
+    key = (os.getpid(), path)
+    connections = getattr(_local, "connections", None)
+    if connections is None:
+        connections = _local.connections = {}
+    conn = connections.get(key)
+    if conn is None:
+        conn = sqlite3.connect(path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        if conn.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+            with conn:
+                conn.executescript(SCHEMA)
+                conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        connections[key] = conn
+    return conn
+
+def query(sql, params=(), path=None):
+    """Consulta ad hoc: retorna o resultado como DataFrame."""
+    return pd.read_sql_query(sql, connect(path), params=params)
+
+# --- Velas ---
+
+def _kline_rows(symbol, interval, df):
+    times = df.index.values.astype("datetime64[ms]").astype(np.int64)
+    values = df[KLINE_COLUMNS].to_numpy(dtype=float)
+    return [(symbol, interval, int(t), *map(float, row)) for t, row in zip(times, values)]
+
+_UPSERT_KLINES = """
+INSERT INTO klines (symbol, interval, time, open, high, low, close, volume) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (symbol, interval, time) DO UPDATE SET
+    open = excluded.open, high = excluded.high, low = excluded.low, close = excluded.close, volume = excluded.volume
+"""
+
+def upsert_klines(symbol, interval, df, path=None):
+    """Grava as velas de `df` (índice = horário de abertura); a vela mais nova prevalece."""
+    if df.empty:
+        return 0
+    conn = connect(path)
+    with conn:
+        conn.executemany(_UPSERT_KLINES, _kline_rows(symbol, interval, df))
+    return len(df)
+
+def replace_klines(symbol, interval, df, path=None):
+    """Substitui todas as velas de (symbol, interval) por `df` em uma transação."""
+    conn = connect(path)
+    with conn:
+        conn.execute("DELETE FROM klines WHERE symbol = ? AND interval = ?", (symbol, interval))
+        if not df.empty:
+            conn.executemany(_UPSERT_KLINES, _kline_rows(symbol, interval, df))
+
+def load_klines(symbol, interval, since=None, path=None):
+    """Velas de (symbol, interval) no formato do cache (índice Time, colunas OHLCV)."""
+    sql = "SELECT time, open, high, low, close, volume FROM klines WHERE symbol = ? AND interval = ?"
+    params = [symbol, interval]
+    if since is not None:
+        sql += " AND time >= ?"
+        params.append(int(pd.Timestamp(since).value // 10 ** 6))
+    rows = connect(path).execute(sql + " ORDER BY time", params).fetchall()
+    if not rows:
+        return pd.DataFrame()
+    values = np.array(rows, dtype=float)
+    index = pd.DatetimeIndex(pd.to_datetime(values[:, 0].astype(np.int64), unit="ms"), name="Time")
+    return pd.DataFrame(values[:, 1:], index=index, columns=KLINE_COLUMNS)
+
+def delete_klines_before(symbol, interval, cutoff, path=None):
+    """Apaga as velas anteriores a `cutoff` (Timestamp). Retorna quantas foram apagadas."""
+    conn = connect(path)
+    with conn:
+        cursor = conn.execute("DELETE FROM klines WHERE symbol = ? AND interval = ? AND time < ?",
+                              (symbol, interval, int(pd.Timestamp(cutoff).value // 10 ** 6)))
+    return cursor.rowcount
+
+def klines_report(path=None):
+    """Velas, primeira e última vela por (symbol, interval)."""
+    df = query("SELECT symbol, interval, COUNT(*) AS candles, MIN(time) AS first, MAX(time) AS last "
+               "FROM klines GROUP BY symbol, interval ORDER BY symbol, interval", path=path)
+    for col in ("first", "last"):
+        df[col] = pd.to_datetime(df[col], unit="ms")
+    return df
+
+# --- Resultados dos scans ---
+
+def _result_rows(scan_id, position, row):
+    rows = []
+    for tf in TIMEFRAMES:
+        values = [row.get(template.format(tf=tf)) for template in RESULT_COLUMNS.values()]
+        if all(v is None for v in values):
+            continue
+        rows.append((scan_id, row["Symbol"], tf, position,
+                     *(None if v is None or v != v else float(v) for v in values)))
+    return rows
+
+def _upsert_results(conn, results):
+    columns = ", ".join(RESULT_COLUMNS)
+    updates = ", ".join(f"{col} = excluded.{col}" for col in RESULT_COLUMNS)
+    conn.executemany(
+        f"INSERT INTO results (scan_id, symbol, timeframe, position, {columns}) "
+        f"VALUES (?, ?, ?, ?, {', '.join('?' * len(RESULT_COLUMNS))}) "
+        f"ON CONFLICT (scan_id, symbol, timeframe) DO UPDATE SET position = excluded.position, {updates}",
+        results)
+
+def record_result(scan_id, position, row, path=None):
+    """Grava as linhas de resultado de um par do scan em andamento."""
+    conn = connect(path)
+    with conn:
+        _upsert_results(conn, _result_rows(scan_id, position, row))
+
+def prune_scans(keep=None, path=None):
+    """
+    Mantém só os `keep` scans concluídos mais recentes (padrão SQL_STORE_KEEP_SCANS) e
+    apaga os resultados sem registro em scans (scans antigos ou interrompidos). Deve
+    rodar depois de gravar o registro do scan atual. Retorna os scans apagados.
+    """
+    keep = SQL_STORE_KEEP_SCANS if keep is None else keep
+    if keep <= 0:
+        return 0
+    conn = connect(path)
+    with conn:
+        cursor = conn.execute(
+            "DELETE FROM scans WHERE scan_id NOT IN (SELECT scan_id FROM scans ORDER BY finished DESC LIMIT ?)",
+            (keep,))
+        conn.execute("DELETE FROM results WHERE scan_id NOT IN (SELECT scan_id FROM scans)")
+    return cursor.rowcount
+
+def record_scan(scan_id, started, finished, valid, failed, total_pairs, summary=None, path=None):
+    """
+    Grava o registro do scan concluído (upsert: regravar o mesmo scan_id é seguro) e
+    aplica a retenção de prune_scans. As linhas de resultado já foram gravadas por
+    record_result durante o scan.
+    """
+    conn = connect(path)
+    with conn:
+        conn.execute(
+            "INSERT INTO scans (scan_id, started, finished, total_pairs, valid, failed, summary) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT (scan_id) DO UPDATE SET "
+            "started = excluded.started, finished = excluded.finished, total_pairs = excluded.total_pairs, "
+            "valid = excluded.valid, failed = excluded.failed, summary = excluded.summary",
+            (scan_id, started, finished, total_pairs, valid, json.dumps(list(failed)),
+             json.dumps(summary) if summary is not None else None))
+    prune_scans(path=path)
+
+def latest_scan(path=None):
+    """(scan_id, finished) do último scan gravado, ou None."""
+    return connect(path).execute("SELECT scan_id, finished FROM scans ORDER BY finished DESC LIMIT 1").fetchone()
+
+def _stoch_conditions(column, above, below, extremos, intervalo):
+    conditions, params = [], []
+    if above is not None:
+        conditions.append(f"{column} >= ?")
+        params.append(above)
+    if below is not None:
+        conditions.append(f"{column} <= ?")
+        params.append(below)
+    if extremos is not None:
+        conditions.append(f"({column} <= ? OR {column} >= ?)")
+        params += list(extremos)
+    if intervalo is not None:
+        conditions.append(f"{column} BETWEEN ? AND ?")
+        params += list(intervalo)
+    return conditions, params
+
+def scan_frame(scan_id, symbols=None, path=None):
+    """Linhas de resultado de um scan no formato do crypto_data.json (uma por símbolo)."""
+    sql = f"SELECT symbol, timeframe, {', '.join(RESULT_COLUMNS)} FROM results WHERE scan_id = ?"
+    params = [scan_id]
+    if symbols is not None:
+        if not symbols:
+            return pd.DataFrame()
+        sql += f" AND symbol IN ({', '.join('?' * len(symbols))})"
+        params += list(symbols)
+    long = query(sql + " ORDER BY position", params, path=path)
+    if long.empty:
+        return pd.DataFrame()
+    order = long["symbol"].drop_duplicates().tolist()
+    wide = long.pivot(index="symbol", columns="timeframe", values=list(RESULT_COLUMNS)).reindex(order)
+    rows = {"Symbol": order}
+    for tf in TIMEFRAMES:
+        for column, template in RESULT_COLUMNS.items():
+            if (column, tf) in wide.columns:
+                rows[template.format(tf=tf)] = wide[(column, tf)].to_numpy()
+    return pd.DataFrame(rows)
+
+def filter_and_sort_sql(columns, above=None, below=None, extremos=None, intervalo=None, sort_tf=None,
+                        scan_id=None, path=None):
+    """
+    Mesmo resultado de filters.filter_and_sort, mas os filtros Stochastic rodam no banco
+    sobre `scan_id` (o scan do snapshot exibido, mesmo em andamento; padrão: o último
+    scan concluído): cada timeframe selecionado vira uma consulta pelos índices
+    (scan_id, timeframe, stoch) e os símbolos são a interseção delas. Só as linhas
+    aprovadas são carregadas para calcular o MACD normalizado e ordenar.
+    Retorna None se `scan_id` não tem linhas no banco (ex.: scan gravado com SQL_STORE
+    desligado); o chamador deve filtrar o próprio DataFrame em vez de trocar de scan.
+    """
+    if scan_id is not None:
+        if connect(path).execute("SELECT 1 FROM results WHERE scan_id = ? LIMIT 1", (scan_id,)).fetchone() is None:
+            return None
+    else:
+        latest = latest_scan(path)
+        if latest is None:
+            return pd.DataFrame()
+        scan_id = latest[0]
+
+    by_tf = {}
+    for name in columns:
+        tf, _, label = name.partition(" ")
+        by_tf.setdefault(tf, []).append(STOCH_COLUMNS[label])
+
+    selects, params = [], []
+    for tf, stoch_columns in by_tf.items():
+        conditions, values = [], []
+        for column in stoch_columns:
+            column_conditions, column_params = _stoch_conditions(column, above, below, extremos, intervalo)
+            conditions += column_conditions
+            values += column_params
+        if not conditions:
+            continue
+        selects.append("SELECT symbol FROM results WHERE scan_id = ? AND timeframe = ? AND " + " AND ".join(conditions))
+        params += [scan_id, tf] + values
+
+    if selects:
+        symbols = [r[0] for r in connect(path).execute(" INTERSECT ".join(selects), params).fetchall()]
+        df = scan_frame(scan_id, symbols, path=path)
+    else:
+        df = scan_frame(scan_id, path=path)
+    if df.empty:
+        return df
+    return _filter_and_sort(df, [], None, None, None, None, sort_tf)
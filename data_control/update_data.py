@@ -2,112 +2,558 @@ import sys
 import os
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-import pandas as pd
-import pandas_ta as ta
+import hashlib
 import json
+import math
+import multiprocessing
+import numpy as np
+import pandas as pd
 import logging
-from datetime import datetime
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
 from pathlib import Path
+from datetime import datetime
 
 try:
-    from data_control.analysis import analyze_timeframe
+    from data_control.analysis import analyze_klines, klines_signature
+    from data_control.resample import get_klines, register_timeframes
 except ImportError:
-    from analysis import analyze_timeframe
+    from analysis import analyze_klines, klines_signature
+    from resample import get_klines, register_timeframes
 
 try:
     from trading_pairs.trading_pairs import TRADING_PAIRS
 except ImportError:
     from trading_pairs import TRADING_PAIRS
 
-from indicators_set.indicators import calc_macd_zero_lag
+from indicators_set.indicator_config import INDICATOR_CONFIG
+from indicators_set.panel import build_panel, panel_last, panel_outputs
+from indicators_set.incremental import IndicatorStateStore
+from data_control.result_log import ScanResultLog, safe_json_write
+from data_control import sql_store
+from metrics.metrics import (
+    SCAN_SYMBOL_SECONDS, SCAN_SYMBOL_LAST_SECONDS, SCAN_PAIRS, SCAN_DURATION, SCAN_LAST_END, SCAN_MEMO,
+    API_REQUESTS, API_RETRIES, API_FAILURES, CACHE_REQUESTS, INDICATOR_SECONDS, CACHE_MEMORY_REQUESTS, stage_totals, write_metrics,
+    registry_snapshot, registry_delta, merge_registry
+)
+
+# Saídas de indicador usadas no resultado do scan: %K do Stochastic 5-3-3 e 14-3-3 (padrão
+# pandas_ta) e o histograma do MACD Zero Lag. Só elas são calculadas (ver indicators_set.graph).
+SCAN_OUTPUTS = ["STOCHk_5_3_3", "STOCHk_14_3_3", "macd_zero_lag_hist"]
+
+# Número de símbolos processados em paralelo. As requisições continuam
+# limitadas pelo orçamento de peso em binance_client.acquire_weight.
+SCAN_WORKERS = int(os.environ.get("SCAN_WORKERS", "8"))
+# Processos do scan (indicadores em vários núcleos). 0 ou 1 = threads em um só processo.
+SCAN_PROCESSES = int(os.environ.get("SCAN_PROCESSES", "0"))
+# Como os processos do scan são criados. "forkserver"/"spawn" partem de um interpretador
+# limpo; um fork direto copiaria locks e threads em andamento deste processo (compactação
+# do cache, pool HTTP, daemon) e o worker poderia travar.
+SCAN_START_METHOD = os.environ.get(
+    "SCAN_START_METHOD", "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn")
+
+# Modo painel: cada timeframe é carregado para todos os símbolos e os indicadores são
+# calculados de uma vez em matrizes tempo × símbolos (ver indicators_set.panel), em vez
+# de símbolo a símbolo. Tem precedência sobre SCAN_PROCESSES.
+SCAN_PANEL = os.environ.get("SCAN_PANEL", "") not in ("", "0")
+
+# Modo incremental: cada (símbolo, timeframe) mantém o estado dos indicadores (ver
+# indicators_set.incremental) e só as velas fechadas novas são processadas; a vela em
+# aberto é avaliada sem alterar o estado. As EMAs continuam do primeiro scan em vez de
+# recomeçar no início do frame a cada execução, então os valores podem diferir do cálculo
+# completo nas primeiras velas do frame. VERIFY_INCREMENTAL=1 compara com ele.
+SCAN_INCREMENTAL = os.environ.get("SCAN_INCREMENTAL", "") not in ("", "0")
+# Arquivo opcional (pickle) para manter os estados incrementais entre execuções
+INDICATOR_STATE_FILE = os.environ.get("INDICATOR_STATE_FILE", "")
+
+# Timeframes do scan e o histórico carregado para cada um
+SCAN_TIMEFRAMES = [("15m", "1 day ago UTC"), ("1h", "7 day ago UTC"), ("4h", "30 day ago UTC"), ("1d", "180 day ago UTC")]
+# Retenção do cache de todos os timeframes registrada na importação (também nos processos
+# do scan), antes que qualquer compactação possa cortar o histórico do intervalo base.
+register_timeframes(SCAN_TIMEFRAMES)
+
+# Resultado de cada (símbolo, timeframe) no último scan: {(símbolo, tf): (assinatura das
+# velas, resultado)}. Um timeframe sem vela nova desde o scan anterior (ex.: 1d e 4h na
+# maioria das execuções de 15 min) reaproveita o resultado sem recalcular os indicadores.
+_timeframe_memo = {}
+
+# Estados incrementais do scan (criados no primeiro uso; ver indicator_states)
+_indicator_states = None
+
+# Arquivo opcional para manter o memo entre execuções separadas do update_data.py.
+# Vazio = só em memória (suficiente no daemon de run_update_data_schedule.py).
+SCAN_MEMO_FILE = os.environ.get("SCAN_MEMO_FILE", "")
+
+def _result_values(tf, last_row, hist_min, hist_max):
+    """Resultado de um timeframe a partir da última linha (saídas do scan e Close)."""
+    return {
+        f"{tf} Stoch 5-3-3": round(last_row["STOCHk_5_3_3"], 2),
+        f"{tf} Stoch 14-3-3": round(last_row["STOCHk_14_3_3"], 2),
+        f"{tf}_macd_zero_lag_hist": round(last_row["macd_zero_lag_hist"], 6),
+        f"{tf}_macd_zero_lag_hist_min": round(hist_min, 6),
+        f"{tf}_macd_zero_lag_hist_max": round(hist_max, 6),
+        f"{tf}_Close": round(last_row["Close"], 6)
+    }
+
+def _timeframe_result(df, tf):
+    macd_hist = df["macd_zero_lag_hist"]
+    return _result_values(tf, df.iloc[-1], macd_hist.min(), macd_hist.max())
+
+def config_fingerprint(tf, incremental=None):
+    """
+    Hash dos parâmetros de indicador do timeframe, das saídas do scan e do modo de cálculo
+    (`incremental`, padrão SCAN_INCREMENTAL). Entra na assinatura do memo para que uma
+    mudança em INDICATOR_CONFIG, SCAN_OUTPUTS ou SCAN_INCREMENTAL descarte os resultados
+    calculados da forma anterior (também os gravados em SCAN_MEMO_FILE): os dois modos
+    dão hist_min/hist_max diferentes.
+    """
+    config = INDICATOR_CONFIG.get(tf, INDICATOR_CONFIG["1h"])
+    incremental = SCAN_INCREMENTAL if incremental is None else incremental
+    payload = json.dumps({"config": config, "outputs": SCAN_OUTPUTS, "incremental": bool(incremental)},
+                         sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:16]
+
+def _memo_signature(df, tf, incremental=None):
+    signature = klines_signature(df)
+    return None if signature is None else [config_fingerprint(tf, incremental)] + signature
+
+def _memo_lookup(memo, symbol, tf, signature):
+    """(True, resultado) se o memo tem o resultado destas velas, senão (False, None)."""
+    cached = memo.get((symbol, tf))
+    if signature is not None and cached is not None and cached[0] == signature:
+        SCAN_MEMO.inc(result="hit")
+        return True, cached[1]
+    SCAN_MEMO.inc(result="miss")
+    return False, None
+
+def _analyze_result(df, tf):
+    if df.empty:
+        print("DataFrame vazio após get_klines.")
+        return None
+    df = analyze_klines(df, tf, outputs=SCAN_OUTPUTS)
+    return None if df.empty else _timeframe_result(df, tf)
+
+def _scan_stoch_variants():
+    # "STOCHk_5_3_3" -> (5, 3, 3) = (k, d, smooth_k)
+    return [tuple(int(p) for p in name.split("_")[1:]) for name in SCAN_OUTPUTS if name.startswith("STOCHk_")]
+
+def new_indicator_states(path=None):
+    """Armazém de estados incrementais com as saídas do scan (ver SCAN_INCREMENTAL)."""
+    return IndicatorStateStore(path=path, stoch_variants=_scan_stoch_variants(), history=True)
+
+def indicator_states():
+    """Estados incrementais deste processo, carregados de INDICATOR_STATE_FILE no primeiro uso."""
+    global _indicator_states
+    if _indicator_states is None:
+        _indicator_states = new_indicator_states(INDICATOR_STATE_FILE or None)
+    return _indicator_states
+
+def _incremental_result(symbol, df, tf, states):
+    """
+    Mesmo resultado de _analyze_result pelo estado incremental: o estado recebe só as
+    velas fechadas (df sem a última linha) e a vela em aberto é avaliada com peek.
+    """
+    if df.empty:
+        print("DataFrame vazio após get_klines.")
+        return None
+    config = INDICATOR_CONFIG.get(tf, INDICATOR_CONFIG["1h"])
+    current = df.iloc[-1]
+    with INDICATOR_SECONDS.time(timeframe=tf):
+        states.update(symbol, tf, df.iloc[:-1], config)
+        state = states.get(symbol, tf, config)
+        values = state.peek(float(current["High"]), float(current["Low"]), float(current["Close"]))
+        macd_hist = state.history_since(df.index[0])
+        macd_hist = macd_hist[~np.isnan(macd_hist)].tolist() + [values["macd_zero_lag_hist"]]
+    if any(math.isnan(values[name]) for name in SCAN_OUTPUTS):
+        # Mesmo critério de analyze_klines: histórico insuficiente para alguma saída
+        return None
+    return _result_values(tf, {**values, "Close": float(current["Close"])}, min(macd_hist), max(macd_hist))
+
+def timeframe_result(symbol, tf, lookback, memo=None, states=None):
+    """
+    Resultado de um timeframe (ver _timeframe_result) ou None se as velas não bastam.
+    Os indicadores só são recalculados se as velas ou a configuração do timeframe mudaram
+    desde o último scan. Com SCAN_INCREMENTAL o cálculo usa o estado incremental do
+    (símbolo, timeframe) em `states` (padrão: indicator_states()).
+    """
+    memo = _timeframe_memo if memo is None else memo
+    df = get_klines(symbol, tf, lookback)
+    signature = _memo_signature(df, tf)
+    hit, result = _memo_lookup(memo, symbol, tf, signature)
+    if hit:
+        return result
+    if SCAN_INCREMENTAL:
+        result = _incremental_result(symbol, df, tf, indicator_states() if states is None else states)
+    else:
+        result = _analyze_result(df, tf)
+    memo[(symbol, tf)] = (signature, result)
+    return result
+
+def process_symbol(symbol, memo=None, states=None):
+    """
+    Analisa os quatro timeframes de um símbolo e retorna a linha de resultado,
+    ou None se algum timeframe obrigatório veio vazio.
+    """
+    results = {tf: timeframe_result(symbol, tf, lookback, memo, states) for tf, lookback in SCAN_TIMEFRAMES}
+    return _symbol_row(symbol, results)
+
+def _symbol_row(symbol, results):
+    """Linha de resultado a partir de {tf: resultado ou None} (ver process_symbol)."""
+    if results["1h"] is None or results["4h"] is None or results["1d"] is None:
+        return None
+
+    result_data = {"Symbol": symbol}
 
-logging.basicConfig(level=logging.INFO)
+    # 15m é opcional
+    for tf, _ in SCAN_TIMEFRAMES:
+        if results[tf] is not None:
+            result_data.update(results[tf])
 
-def _calc_stoch(df: pd.DataFrame, k: int, d: int, smooth_k: int, label_prefix: str):
-    if not all(col in df.columns for col in ["High", "Low", "Close"]):
-        raise KeyError(f"DataFrame sem colunas necessárias, colunas: {df.columns.tolist()}")
-    stoch = ta.stoch(df["High"], df["Low"], df["Close"], k=k, d=d, smooth_k=smooth_k)
-    df[f"{label_prefix}_stoch_{k}"] = stoch.iloc[:, 0]
-    return df
+    return result_data
 
-def safe_json_write(data, final_path):
-    temp_path = str(final_path) + ".tmp"
-    with open(temp_path, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2)
-        f.flush()
-        os.fsync(f.fileno())
-    os.replace(temp_path, final_path)
+# --- Scan em painel ---
 
-def scan_pairs():
-    valid_rows = []
-    failed_pairs = []
-    total_pairs = len(TRADING_PAIRS)
-    json_path = Path(__file__).parent / "crypto_data.json"
+def _panel_results(panel, tf):
+    """{símbolo: resultado ou None} de todos os símbolos do painel (ver _timeframe_result)."""
+    with INDICATOR_SECONDS.time(timeframe=tf):
+        values = panel_outputs(panel, tf, SCAN_OUTPUTS)
+    last = panel_last(values)
+    macd_hist = values["macd_zero_lag_hist"]
+    hist_min, hist_max = macd_hist.min(), macd_hist.max()
+    close = panel.close.iloc[-1]
+    results = {}
+    for symbol in panel.symbols:
+        last_row = last.loc[symbol]
+        if last_row.isna().any():
+            # Mesmo critério de analyze_klines: histórico insuficiente para alguma saída
+            results[symbol] = None
+            continue
+        results[symbol] = _result_values(tf, {**last_row, "Close": close[symbol]}, hist_min[symbol], hist_max[symbol])
+    return results
 
-    for idx, symbol in enumerate(TRADING_PAIRS):
+def panel_timeframe_results(frames, tf, memo=None):
+    """
+    Resultados de um timeframe para {símbolo: velas} com os indicadores calculados em um
+    único painel. Símbolos sem vela nova reaproveitam o memo; os que não se alinham ao
+    painel (outra última vela ou buracos no histórico) são calculados um a um.
+    """
+    memo = _timeframe_memo if memo is None else memo
+    results, pending, signatures = {}, {}, {}
+    for symbol, df in frames.items():
+        # O painel calcula sempre pelo caminho completo, mesmo com SCAN_INCREMENTAL
+        signatures[symbol] = _memo_signature(df, tf, incremental=False)
+        hit, result = _memo_lookup(memo, symbol, tf, signatures[symbol])
+        if hit:
+            results[symbol] = result
+        elif df.empty:
+            print("DataFrame vazio após get_klines.")
+            results[symbol] = None
+        else:
+            pending[symbol] = df
+    if pending:
+        panel = build_panel(pending)
+        computed = _panel_results(panel, tf) if panel.symbols else {}
+        for symbol in panel.excluded:
+            computed[symbol] = _analyze_result(pending[symbol], tf)
+        for symbol, result in computed.items():
+            memo[(symbol, tf)] = (signatures[symbol], result)
+        results.update(computed)
+    return results
+
+def _load_frames(symbols, tf, lookback, max_workers):
+    """({símbolo: velas}, {símbolo: exceção}, {símbolo: segundos}) de get_klines em threads."""
+    def load(symbol):
+        started = time.perf_counter()
         try:
-            df_15m = analyze_timeframe(symbol, "15m", "1 day ago UTC")
-            df_1h = analyze_timeframe(symbol, "1h", "7 day ago UTC")
-            df_4h = analyze_timeframe(symbol, "4h", "30 day ago UTC")
-            df_1d = analyze_timeframe(symbol, "1d", "180 day ago UTC")
-
-            if df_1h.empty or df_4h.empty or df_1d.empty:
-                failed_pairs.append(symbol)
-                continue
-
-            result_data = {"Symbol": symbol}
-
-            # 15m
-            if not df_15m.empty:
-                _calc_stoch(df_15m, 5, 3, 3, "15m_5")
-                _calc_stoch(df_15m, 14, 3, 3, "15m_14")
-                last_15m = df_15m.iloc[-1]
-                macd_line, signal_line, macd_hist = calc_macd_zero_lag(df_15m['Close'])
-                result_data.update({
-                    "15m Stoch 5-3-3": round(last_15m["15m_5_stoch_5"], 2),
-                    "15m Stoch 14-3-3": round(last_15m["15m_14_stoch_14"], 2),
-                    "15m_macd_zero_lag_hist": round(macd_hist.iloc[-1], 6),
-                    "15m_macd_zero_lag_hist_min": round(macd_hist.min(), 6),
-                    "15m_macd_zero_lag_hist_max": round(macd_hist.max(), 6),
-                    "15m_Close": round(last_15m["Close"], 6)
-                })
-
-            # 1h, 4h, 1d
-            for df, tf in ((df_1h, "1h"), (df_4h, "4h"), (df_1d, "1d")):
-                _calc_stoch(df, 5, 3, 3, f"{tf}_5")
-                _calc_stoch(df, 14, 3, 3, f"{tf}_14")
-                last_row = df.iloc[-1]
-                macd_line, signal_line, macd_hist = calc_macd_zero_lag(df['Close'])
-                result_data.update({
-                    f"{tf} Stoch 5-3-3": round(last_row[f"{tf}_5_stoch_5"], 2),
-                    f"{tf} Stoch 14-3-3": round(last_row[f"{tf}_14_stoch_14"], 2),
-                    f"{tf}_macd_zero_lag_hist": round(macd_hist.iloc[-1], 6),
-                    f"{tf}_macd_zero_lag_hist_min": round(macd_hist.min(), 6),
-                    f"{tf}_macd_zero_lag_hist_max": round(macd_hist.max(), 6),
-                    f"{tf}_Close": round(last_row["Close"], 6)
-                })
-
-            valid_rows.append(result_data)
+            return symbol, get_klines(symbol, tf, lookback), None, time.perf_counter() - started
         except Exception as exc:
+            return symbol, None, exc, time.perf_counter() - started
+
+    frames, errors, seconds = {}, {}, {}
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        for symbol, df, exc, elapsed in executor.map(load, symbols):
+            seconds[symbol] = elapsed
+            if exc is None:
+                frames[symbol] = df
+            else:
+                errors[symbol] = exc
+    return frames, errors, seconds
+
+def _panel_scan(pairs, max_workers, memo=None):
+    """
+    Scan em painel: {símbolo: linha ou None} e {símbolo: segundos de leitura das velas}.
+    Um símbolo que falha em um timeframe fica de fora dos seguintes, como em process_symbol.
+    """
+    results = {symbol: {} for symbol in pairs}
+    seconds = dict.fromkeys(pairs, 0.0)
+    failed = set()
+    for tf, lookback in SCAN_TIMEFRAMES:
+        frames, errors, load_seconds = _load_frames([s for s in pairs if s not in failed], tf, lookback, max_workers)
+        for symbol, exc in errors.items():
             logging.warning(f"Falha ao processar {symbol}: {exc}")
-            failed_pairs.append(symbol)
+            failed.add(symbol)
+        for symbol, elapsed in load_seconds.items():
+            seconds[symbol] += elapsed
+        for symbol, result in panel_timeframe_results(frames, tf, memo).items():
+            results[symbol][tf] = result
+    rows = {symbol: None if symbol in failed else _symbol_row(symbol, results[symbol]) for symbol in pairs}
+    return rows, seconds
+
+def load_timeframe_memo(path=None):
+    """
+    Carrega o memo gravado por save_timeframe_memo (ignorado se as saídas do scan mudaram;
+    entradas de uma configuração de indicador anterior não casam com config_fingerprint).
+    """
+    path = path or SCAN_MEMO_FILE
+    if not path or not os.path.exists(path):
+        return 0
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError) as exc:
+        logging.warning(f"Memo do scan ilegível ({path}): {exc}")
+        return 0
+    if data.get("outputs") != SCAN_OUTPUTS:
+        return 0
+    for symbol, tf, signature, result in data.get("entries", []):
+        _timeframe_memo[(symbol, tf)] = (signature, result)
+    return len(_timeframe_memo)
+
+def save_timeframe_memo(path=None):
+    path = path or SCAN_MEMO_FILE
+    if not path:
+        return
+    entries = [[symbol, tf, signature, result] for (symbol, tf), (signature, result) in _timeframe_memo.items()]
+    safe_json_write({"outputs": SCAN_OUTPUTS, "entries": entries}, path)
+
+def _process_symbol_safe(symbol, memo=None, states=None):
+    """Retorna (linha de resultado ou None, duração em segundos)."""
+    started = time.perf_counter()
+    try:
+        row = process_symbol(symbol, memo, states)
+    except Exception as exc:
+        logging.warning(f"Falha ao processar {symbol}: {exc}")
+        row = None
+    return row, time.perf_counter() - started
+
+# --- Scan em processos ---
+
+# Métricas do worker já enviadas ao processo principal (ver _scan_task)
+_worker_metrics = {}
+
+def _init_scan_process(processes):
+    global _worker_metrics
+    # Cada processo tem cliente e sessão HTTP próprios e 1/processes do orçamento de peso
+    from binance_client.binance_client import init_worker_process
+    init_worker_process(share=1.0 / processes)
+    _worker_metrics = registry_snapshot()
+
+def _scan_task(symbol, memo, states):
+    """
+    Tarefa de um worker: processa o símbolo com as entradas dele no memo e os estados
+    incrementais dele (que ficam no processo principal) e devolve também o memo e os
+    estados atualizados e as métricas geradas desde a tarefa anterior deste processo
+    (ver metrics.merge_registry).
+    """
+    global _worker_metrics
+    store = new_indicator_states()
+    store.merge(states)
+    row, elapsed = _process_symbol_safe(symbol, memo, store)
+    current = registry_snapshot()
+    delta = registry_delta(current, _worker_metrics)
+    _worker_metrics = current
+    return row, elapsed, memo, store.states_for(symbol), delta
+
+# --- Resumo do scan ---
 
-        # Salva incrementalmente a cada par processado, de forma atômica
-        data = {
-            'df_valid': valid_rows,
-            'failed': failed_pairs,
-            'last_update': datetime.now().isoformat(),
-            'total_pairs': len(TRADING_PAIRS)
-        }
-        safe_json_write(data, json_path)
+# Quantidade de símbolos mais lentos listados no resumo do scan
+SUMMARY_SLOWEST = 10
 
+def _metrics_snapshot():
+    return {
+        "stages": stage_totals(),
+        "api": API_REQUESTS.totals_by("outcome"),
+        "retries": API_RETRIES.totals_by("endpoint"),
+        "failures": API_FAILURES.totals_by("endpoint"),
+        "cache": CACHE_REQUESTS.totals_by("result"),
+        "memo": SCAN_MEMO.totals_by("result"),
+        "memory": CACHE_MEMORY_REQUESTS.totals_by("result"),
+    }
+
+def _metrics_delta(after, before):
+    return {
+        group: {key: after[group][key] - before[group].get(key, 0.0)
+                for key in after[group] if after[group][key] - before[group].get(key, 0.0)}
+        for group in after
+    }
+
+def _scan_summary(started_at, elapsed, durations, valid, failed, workers, mode, deltas):
+    """Resumo do scan gravado em crypto_data.json (chave scan_summary)."""
+    cache_results = deltas.get("cache", {})
+    cache_reads = sum(cache_results.values())
+    values = sorted(durations.values())
+    slowest = sorted(durations.items(), key=lambda item: item[1], reverse=True)[:SUMMARY_SLOWEST]
+
+    def percentile(p):
+        return round(values[min(len(values) - 1, int(p * len(values)))], 4) if values else None
+
+    return {
+        "started": started_at,
+        "duration_seconds": round(elapsed, 3),
+        "pairs": len(durations),
+        "valid": valid,
+        "failed": failed,
+        "mode": mode,
+        "workers": workers,
+        "symbol_seconds": {"p50": percentile(0.50), "p95": percentile(0.95), "max": percentile(1.0)},
+        "slowest": [{"symbol": symbol, "seconds": round(seconds, 4)} for symbol, seconds in slowest],
+        # Segundos somados entre as threads/processos do scan em cada etapa
+        "stage_seconds": {stage: round(seconds, 3) for stage, seconds in deltas.get("stages", {}).items()},
+        "api_requests": deltas.get("api", {}),
+        # Novas tentativas e falhas definitivas por endpoint (ver binance_client.transport)
+        "api_retries": deltas.get("retries", {}),
+        "api_failures": deltas.get("failures", {}),
+        "cache_results": cache_results,
+        "cache_hit_ratio": round(cache_results.get("hit", 0.0) / cache_reads, 4) if cache_reads else None,
+        # Leituras do cache servidas pela camada em memória (ver data_control/memory_cache.py)
+        "memory_cache_results": deltas.get("memory", {}),
+        # Timeframes reaproveitados do scan anterior (hit) ou recalculados (miss)
+        "timeframe_memo": deltas.get("memo", {}),
+    }
+
+def scan_pairs(max_workers=None, pairs=None, json_path=None, processes=None, panel=None):
+    """
+    Processa todos os pares (padrão: TRADING_PAIRS). Cada par concluído é anexado ao log
+    do scan e o crypto_data.json é regravado periodicamente e no fim (ver result_log).
+    Com max_workers > 1 os símbolos são buscados em paralelo; as linhas do arquivo final
+    continuam na ordem de `pairs`, igual ao modo sequencial.
+    Com processes > 1 (padrão: SCAN_PROCESSES) os símbolos são distribuídos entre
+    processos, um por vez: quem termina pega o próximo, então símbolos lentos não
+    atrasam os demais. Só este processo grava o crypto_data.json.
+    Com panel=True (padrão: SCAN_PANEL) cada timeframe é lido para todos os pares (em
+    max_workers threads) e os indicadores saem de um painel por timeframe (ver
+    panel_timeframe_results); as linhas são registradas no fim, na ordem de `pairs`.
+    `json_path` troca o arquivo de saída (padrão: data_control/crypto_data.json).
+    Timeframes sem vela nova desde o scan anterior reaproveitam o resultado (ver
+    timeframe_result); o memo é gravado em SCAN_MEMO_FILE, se configurado.
+    Com SCAN_INCREMENTAL=1 (fora do modo painel) os indicadores vêm dos estados
+    incrementais por (símbolo, timeframe), gravados em INDICATOR_STATE_FILE se configurado.
+    Com SQL_STORE=1 cada par também é gravado no banco e o scan concluído é registrado
+    (ver sql_store).
+    O manifesto final inclui scan_summary e as métricas são gravadas em METRICS_FILE.
+    """
+    if max_workers is None:
+        max_workers = SCAN_WORKERS
+    if processes is None:
+        processes = SCAN_PROCESSES
+    if panel is None:
+        panel = SCAN_PANEL
+    if pairs is None:
+        pairs = TRADING_PAIRS
+    if json_path is None:
+        json_path = Path(__file__).parent / "crypto_data.json"
+    started_at = datetime.now().isoformat()
+    started = time.perf_counter()
+    if SCAN_MEMO_FILE and not _timeframe_memo:
+        load_timeframe_memo()
+    before = _metrics_snapshot()
+    SCAN_SYMBOL_LAST_SECONDS.clear()
+    durations = {}
+    result_log = ScanResultLog(json_path, total_pairs=len(pairs))
+    result_log.start()
+
+    def record(idx, row, elapsed):
+        symbol = pairs[idx]
+        durations[symbol] = elapsed
+        SCAN_SYMBOL_SECONDS.observe(elapsed)
+        SCAN_SYMBOL_LAST_SECONDS.set(elapsed, symbol=symbol)
+        SCAN_PAIRS.inc(outcome="ok" if row is not None else "failed")
+        if sql_store.SQL_STORE_ENABLED and row is not None:
+            # Gravada no banco antes do log: o dashboard filtra o mesmo scan que exibe
+            try:
+                sql_store.record_result(result_log.scan_id, idx, row)
+            except Exception as exc:
+                logging.warning(f"Não foi possível gravar {symbol} no SQL_STORE_PATH: {exc}")
+        result_log.record(idx, symbol, row)
+
+    if panel:
+        mode, workers = "panel", max_workers
+        rows, seconds = _panel_scan(pairs, max_workers)
+        for idx, symbol in enumerate(pairs):
+            # Duração por par no modo painel = leitura das velas dele
+            record(idx, rows[symbol], seconds[symbol])
+    elif processes > 1:
+        mode, workers = "processes", processes
+        with ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context(SCAN_START_METHOD),
+                                 initializer=_init_scan_process, initargs=(processes,)) as executor:
+            futures = {
+                executor.submit(_scan_task, symbol, {
+                    (symbol, tf): _timeframe_memo[(symbol, tf)]
+                    for tf, _ in SCAN_TIMEFRAMES if (symbol, tf) in _timeframe_memo
+                }, indicator_states().states_for(symbol) if SCAN_INCREMENTAL else {}): idx
+                for idx, symbol in enumerate(pairs)
+            }
+            for future in as_completed(futures):
+                idx = futures[future]
+                try:
+                    row, elapsed, memo, states, delta = future.result()
+                except Exception as exc:
+                    # Falha do próprio worker (ex.: processo encerrado)
+                    logging.warning(f"Falha ao processar {pairs[idx]}: {exc}")
+                    row, elapsed, memo, states, delta = None, 0.0, {}, {}, {}
+                _timeframe_memo.update(memo)
+                if states:
+                    indicator_states().merge(states)
+                merge_registry(delta)
+                record(idx, row, elapsed)
+    elif max_workers <= 1:
+        mode, workers = "sequential", 1
+        for idx, symbol in enumerate(pairs):
+            record(idx, *_process_symbol_safe(symbol))
+    else:
+        mode, workers = "threads", max_workers
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                executor.submit(_process_symbol_safe, symbol): idx
+                for idx, symbol in enumerate(pairs)
+            }
+            for future in as_completed(futures):
+                record(futures[future], *future.result())
+
+    valid_rows, failed_pairs = result_log.rows()
+    elapsed = time.perf_counter() - started
+    deltas = _metrics_delta(_metrics_snapshot(), before)
+    summary = _scan_summary(started_at, elapsed, durations, len(valid_rows), len(failed_pairs), workers, mode, deltas)
+    result_log.finish(summary=summary)
+    if sql_store.SQL_STORE_ENABLED:
+        try:
+            sql_store.record_scan(result_log.scan_id, started_at, datetime.now().isoformat(), len(valid_rows),
+                                  failed_pairs, len(pairs), summary)
+        except Exception as exc:
+            logging.warning(f"Não foi possível gravar o scan no SQL_STORE_PATH: {exc}")
+    try:
+        save_timeframe_memo()
+    except OSError as exc:
+        logging.warning(f"Não foi possível gravar o memo do scan: {exc}")
+    if SCAN_INCREMENTAL and INDICATOR_STATE_FILE:
+        try:
+            indicator_states().save()
+        except OSError as exc:
+            logging.warning(f"Não foi possível gravar INDICATOR_STATE_FILE: {exc}")
+    SCAN_DURATION.set(elapsed)
+    SCAN_LAST_END.set(time.time())
+    try:
+        write_metrics()
+    except OSError as exc:
+        logging.warning(f"Não foi possível gravar as métricas: {exc}")
     return pd.DataFrame(valid_rows), failed_pairs
 
-def update_data():
+def update_data(max_workers=None):
     try:
-        scan_pairs()
+        scan_pairs(max_workers)
     except Exception as e:
         print(f"[ERRO] Erro na atualização: {e}")
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
     update_data()
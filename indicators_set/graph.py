@@ -0,0 +1,158 @@
+# graph.py
+#
+# Grafo de dependências dos indicadores. Cada saída (coluna) é ligada a um nó, e cada nó
+# pede os intermediários de que precisa a um IndicatorContext, que calcula cada
+# intermediário uma única vez por DataFrame. Assim:
+#  - só os nós das saídas pedidas (e suas dependências) são calculados;
+#  - EMAs iguais são compartilhadas (a EMA 12 do fechamento serve ao MACD tradicional e
+#    ao MACD Zero Lag; o RSI serve a todas as saídas do StochRSI);
+#  - todas as variantes do Stochastic pedidas saem de uma única chamada de
+#    stochastic_variants, com os extremos de High/Low calculados uma vez.
+#
+# As fórmulas são as mesmas de kernels.py (calc_macd, calc_macd_zero_lag, ...),
+# decompostas em nós; os resultados são idênticos.
+import re
+
+from indicators_set.indicator_config import INDICATOR_CONFIG
+from indicators_set.kernels import calc_rsi, calc_stoch_rsi
+from indicators_set.rolling import stochastic_variants
+
+CLOSE = ("column", "Close")
+
+# Colunas gravadas por apply_technicals sem `outputs`, na ordem original
+TECHNICAL_OUTPUTS = [
+    "rsi", "stoch_rsi", "k", "d",
+    "macd_line", "signal_line", "macd_hist",
+    "macd_zero_lag_line", "macd_zero_lag_signal", "macd_zero_lag_hist",
+    "stoch", "stoch_d",
+]
+
+# Saídas no padrão pandas_ta.stoch: STOCHk_<k>_<d>_<smooth_k> (%K) e STOCHd_... (%D)
+_PANDAS_TA_STOCH = re.compile(r"STOCH([kd])_(\d+)_(\d+)_(\d+)")
+
+class IndicatorContext:
+    """Intermediários de um DataFrame, calculados sob demanda e memoizados por chave."""
+
+    def __init__(self, df):
+        self.df = df
+        self.values = {}
+        self.computed = []  # chaves na ordem de cálculo (diagnóstico)
+
+    def get(self, kind, *params):
+        key = (kind,) + params
+        if key not in self.values:
+            self.values[key] = NODES[kind](self, *params)
+            self.computed.append(key)
+        return self.values[key]
+
+def _column(ctx, name):
+    return ctx.df[name]
+
+def _ema(ctx, source, span):
+    return ctx.get(*source).ewm(span=span, adjust=False).mean()
+
+def _zero_lag_ema(ctx, source, span):
+    ema = ctx.get("ema", source, span)
+    ema2 = ctx.get("ema", ("ema", source, span), span)
+    diff = ema - ema2
+    return ema + diff
+
+def _macd_line(ctx, fast, slow):
+    return ctx.get("ema", CLOSE, fast) - ctx.get("ema", CLOSE, slow)
+
+def _macd(ctx, fast, slow, signal):
+    macd_line = ctx.get("macd_line", fast, slow)
+    signal_line = ctx.get("ema", ("macd_line", fast, slow), signal)
+    return macd_line, signal_line, macd_line - signal_line
+
+def _zero_lag_line(ctx, fast, slow):
+    return ctx.get("zero_lag_ema", CLOSE, fast) - ctx.get("zero_lag_ema", CLOSE, slow)
+
+def _macd_zero_lag(ctx, fast, slow, signal):
+    macd_line = ctx.get("zero_lag_line", fast, slow)
+    signal_line = ctx.get("zero_lag_ema", ("zero_lag_line", fast, slow), signal)
+    return macd_line, signal_line, macd_line - signal_line
+
+def _rsi(ctx, length):
+    return calc_rsi(ctx.get(*CLOSE), length=length)
+
+def _stoch_rsi(ctx, length, rsi_length, k, d):
+    return calc_stoch_rsi(ctx.get("rsi", length), rsi_length=rsi_length, k=k, d=d)
+
+def _stochastic(ctx, period_k, smooth_k, period_d, zero_range):
+    df = ctx.df
+    variants = stochastic_variants(df["High"], df["Low"], df["Close"], [(period_k, smooth_k, period_d)], zero_range)
+    return variants[(period_k, smooth_k, period_d)]
+
+NODES = {
+    "column": _column,
+    "ema": _ema,
+    "zero_lag_ema": _zero_lag_ema,
+    "macd_line": _macd_line,
+    "macd": _macd,
+    "zero_lag_line": _zero_lag_line,
+    "macd_zero_lag": _macd_zero_lag,
+    "rsi": _rsi,
+    "stoch_rsi": _stoch_rsi,
+    "stochastic": _stochastic,
+}
+
+def output_node(name, config):
+    """(chave do nó, posição na tupla ou None) que produz a saída `name`."""
+    match = _PANDAS_TA_STOCH.fullmatch(name)
+    if match:
+        line, k, d, smooth_k = match.group(1), *map(int, match.groups()[1:])
+        return ("stochastic", k, smooth_k, d, "epsilon"), 0 if line == "k" else 1
+
+    rsi = (config["RSI"]["length"], config["StochRSI"]["rsi_length"], config["StochRSI"]["k"], config["StochRSI"]["d"])
+    macd = (config["MACD"]["fast_length"], config["MACD"]["slow_length"], config["MACD"]["signal_length"])
+    zero_lag = (config["MACDZeroLag"]["fast_length"], config["MACDZeroLag"]["slow_length"],
+                config["MACDZeroLag"]["signal_length"])
+    stochastic = (config["Stochastic"]["periodK"], config["Stochastic"]["smoothK"], config["Stochastic"]["periodD"], "inf")
+    table = {
+        "rsi": (("rsi", rsi[0]), None),
+        "stoch_rsi": (("stoch_rsi",) + rsi, 0),
+        "k": (("stoch_rsi",) + rsi, 1),
+        "d": (("stoch_rsi",) + rsi, 2),
+        "macd_line": (("macd",) + macd, 0),
+        "signal_line": (("macd",) + macd, 1),
+        "macd_hist": (("macd",) + macd, 2),
+        "macd_zero_lag_line": (("macd_zero_lag",) + zero_lag, 0),
+        "macd_zero_lag_signal": (("macd_zero_lag",) + zero_lag, 1),
+        "macd_zero_lag_hist": (("macd_zero_lag",) + zero_lag, 2),
+        "stoch": (("stochastic",) + stochastic, 0),
+        "stoch_d": (("stochastic",) + stochastic, 1),
+    }
+    if name not in table:
+        raise KeyError(f"Saída de indicador desconhecida: {name}")
+    return table[name]
+
+def _prime_stochastics(ctx, keys):
+    """Calcula juntas todas as variantes do Stochastic pedidas (mesmos extremos de High/Low)."""
+    groups = {}
+    for key in keys:
+        if key[0] == "stochastic" and key not in ctx.values:
+            groups.setdefault(key[4], set()).add(key[1:4])
+    df = ctx.df
+    for zero_range, variants in groups.items():
+        results = stochastic_variants(df["High"], df["Low"], df["Close"], sorted(variants), zero_range)
+        for variant, lines in results.items():
+            ctx.values[("stochastic",) + variant + (zero_range,)] = lines
+            ctx.computed.append(("stochastic",) + variant + (zero_range,))
+
+def compute_indicators(df, timeframe=None, outputs=None, context=None):
+    """
+    Calcula apenas as saídas pedidas (padrão: TECHNICAL_OUTPUTS) com os parâmetros de
+    INDICATOR_CONFIG do timeframe. Retorna {saída: Series} na ordem de `outputs`.
+    `context` permite reaproveitar intermediários entre chamadas sobre o mesmo df.
+    """
+    config = INDICATOR_CONFIG.get(timeframe, INDICATOR_CONFIG["1h"])
+    outputs = list(TECHNICAL_OUTPUTS if outputs is None else outputs)
+    ctx = context if context is not None else IndicatorContext(df)
+    specs = [(name, *output_node(name, config)) for name in outputs]
+    _prime_stochastics(ctx, [key for _, key, _ in specs])
+    result = {}
+    for name, key, position in specs:
+        value = ctx.get(*key)
+        result[name] = value if position is None else value[position]
+    return result
@@ -0,0 +1,556 @@
+# incremental.py
+#
+# Versão incremental dos indicadores de kernels.py. Cada estado guarda apenas o
+# necessário (últimos valores das EMAs/RMAs e as janelas móveis), então uma vela nova
+# custa O(1) em vez de recalcular todo o histórico.
+import copy
+import json
+import logging
+import math
+import os
+import pickle
+import sys
+import threading
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+from indicators_set.indicator_config import INDICATOR_CONFIG
+from indicators_set.kernels import (
+    calc_rsi, calc_stoch_rsi, calc_macd, calc_macd_zero_lag, calc_stochastic_indicator, calc_stoch_variants
+)
+
+NAN = float("nan")
+
+# Compara cada atualização incremental com o cálculo completo (lento; só para depuração)
+VERIFY_INCREMENTAL = os.environ.get("VERIFY_INCREMENTAL", "") == "1"
+
+# Colunas produzidas, com os mesmos nomes usados por apply_technicals
+OUTPUT_COLUMNS = [
+    "rsi", "stoch_rsi", "k", "d",
+    "macd_line", "signal_line", "macd_hist",
+    "macd_zero_lag_line", "macd_zero_lag_signal", "macd_zero_lag_hist",
+    "stoch", "stoch_d",
+]
+
+def _div(num, den):
+    # Divisão com a semântica do numpy/pandas (x/0 = ±inf, 0/0 = NaN)
+    if den == 0:
+        if num == 0 or math.isnan(num):
+            return NAN
+        return math.copysign(math.inf, num) * math.copysign(1.0, den)
+    return num / den
+
+class EWMState:
+    """
+    Média exponencial equivalente a Series.ewm(alpha=..., adjust=False).mean(), com as
+    mesmas operações do pandas (peso da média anterior, normalização), então o resultado
+    é idêntico bit a bit, inclusive com NaN no meio da série.
+    """
+    __slots__ = ("alpha", "value", "old_weight")
+
+    def __init__(self, alpha):
+        self.alpha = alpha
+        self.value = NAN
+        self.old_weight = 1.0
+
+    @classmethod
+    def from_span(cls, span):
+        return cls(2.0 / (span + 1.0))
+
+    def copy(self):
+        clone = EWMState(self.alpha)
+        clone.value = self.value
+        clone.old_weight = self.old_weight
+        return clone
+
+    def update(self, x):
+        if math.isnan(self.value):
+            if not math.isnan(x):
+                self.value = x
+                self.old_weight = 1.0
+            return self.value
+        self.old_weight *= 1.0 - self.alpha
+        if not math.isnan(x):
+            if self.value != x:
+                self.value = (self.old_weight * self.value + self.alpha * x) / (self.old_weight + self.alpha)
+            self.old_weight = 1.0
+        return self.value
+
+class RollingWindow:
+    """
+    Janela móvel de tamanho fixo com média, mínimo e máximo em O(1) amortizado.
+    Assim como rolling(n) do pandas, retorna NaN enquanto a janela não estiver cheia
+    ou se houver NaN dentro dela.
+    """
+    __slots__ = ("length", "values", "total", "nan_count", "count", "_min", "_max")
+
+    def __init__(self, length):
+        self.length = length
+        self.values = deque(maxlen=length)
+        self.total = 0.0
+        self.nan_count = 0
+        self.count = 0
+        self._min = deque()  # (posição, valor) em ordem crescente de valor
+        self._max = deque()  # (posição, valor) em ordem decrescente de valor
+
+    def copy(self):
+        clone = RollingWindow(self.length)
+        clone.values = deque(self.values, maxlen=self.length)
+        clone.total = self.total
+        clone.nan_count = self.nan_count
+        clone.count = self.count
+        clone._min = deque(self._min)
+        clone._max = deque(self._max)
+        return clone
+
+    def push(self, x):
+        if len(self.values) == self.length:
+            old = self.values[0]
+            if math.isnan(old):
+                self.nan_count -= 1
+            else:
+                self.total -= old
+        self.values.append(x)
+        position = self.count
+        self.count += 1
+        if math.isnan(x):
+            self.nan_count += 1
+        else:
+            self.total += x
+            while self._min and self._min[-1][1] >= x:
+                self._min.pop()
+            self._min.append((position, x))
+            while self._max and self._max[-1][1] <= x:
+                self._max.pop()
+            self._max.append((position, x))
+        oldest = self.count - self.length
+        while self._min and self._min[0][0] < oldest:
+            self._min.popleft()
+        while self._max and self._max[0][0] < oldest:
+            self._max.popleft()
+
+    @property
+    def ready(self):
+        return len(self.values) == self.length and self.nan_count == 0
+
+    def mean(self):
+        return self.total / self.length if self.ready else NAN
+
+    def min(self):
+        return self._min[0][1] if self.ready else NAN
+
+    def max(self):
+        return self._max[0][1] if self.ready else NAN
+
+    def exact_mean(self):
+        """
+        Média somando da mais recente para a mais antiga, na mesma ordem de
+        rolling.rolling_mean (resultado idêntico bit a bit; O(tamanho da janela)).
+        """
+        if not self.ready:
+            return NAN
+        total = self.values[-1]
+        for i in range(2, self.length + 1):
+            total += self.values[-i]
+        return total / self.length
+
+class ZeroLagEMA:
+    """EMA de atraso zero usada no MACD Zero Lag: ema + (ema - ema(ema))."""
+    __slots__ = ("ema", "ema2")
+
+    def __init__(self, span):
+        self.ema = EWMState.from_span(span)
+        self.ema2 = EWMState.from_span(span)
+
+    def copy(self):
+        clone = ZeroLagEMA.__new__(ZeroLagEMA)
+        clone.ema = self.ema.copy()
+        clone.ema2 = self.ema2.copy()
+        return clone
+
+    def update(self, x):
+        e1 = self.ema.update(x)
+        e2 = self.ema2.update(e1)
+        return e1 + (e1 - e2)
+
+def stoch_columns(variant):
+    """Colunas %K e %D de uma variante (k, d, smooth_k) no padrão pandas_ta.stoch."""
+    k, d, smooth_k = variant
+    return f"STOCHk_{k}_{d}_{smooth_k}", f"STOCHd_{k}_{d}_{smooth_k}"
+
+class IncrementalIndicators:
+    """
+    Estado incremental de todos os indicadores de apply_technicals para uma
+    configuração de timeframe (mesmo formato de INDICATOR_CONFIG[tf]).
+    `stoch_variants` acrescenta variantes (k, d, smooth_k) do Stochastic no padrão
+    pandas_ta (colunas STOCHk_/STOCHd_, ver kernels.calc_stoch_variants). Com
+    `history=True` o histograma do MACD Zero Lag de cada vela fica guardado (ver
+    history_since), para mínimo/máximo sobre as velas de um frame, junto com um checksum
+    da máxima, mínima e fechamento processados (ver candle_checksums e continues).
+    """
+
+    last_candle = None  # (máxima, mínima, fechamento) da última vela processada
+
+    def __init__(self, config, stoch_variants=(), history=False):
+        self.config = config
+        self.stoch_variants = [tuple(int(p) for p in variant) for variant in stoch_variants]
+        self.columns = OUTPUT_COLUMNS + [col for variant in self.stoch_variants for col in stoch_columns(variant)]
+        self.first_time = None
+        self.last_time = None
+        self.last_values = dict.fromkeys(self.columns, NAN)
+        # (horário em ns, macd_zero_lag_hist, checksum da vela)
+        self.history = deque() if history else None
+        self._prev_close = NAN
+
+        rsi_length = config["RSI"]["length"]
+        self._rma_up = EWMState(1.0 / rsi_length)
+        self._rma_down = EWMState(1.0 / rsi_length)
+
+        self._rsi_window = RollingWindow(config["StochRSI"]["rsi_length"])
+        self._stoch_rsi_k = RollingWindow(config["StochRSI"]["k"])
+        self._stoch_rsi_d = RollingWindow(config["StochRSI"]["d"])
+
+        macd = config["MACD"]
+        self._macd_fast = EWMState.from_span(macd["fast_length"])
+        self._macd_slow = EWMState.from_span(macd["slow_length"])
+        self._macd_signal = EWMState.from_span(macd["signal_length"])
+
+        zero_lag = config["MACDZeroLag"]
+        self._zl_fast = ZeroLagEMA(zero_lag["fast_length"])
+        self._zl_slow = ZeroLagEMA(zero_lag["slow_length"])
+        self._zl_signal = ZeroLagEMA(zero_lag["signal_length"])
+
+        stochastic = config["Stochastic"]
+        self._low_window = RollingWindow(stochastic["periodK"])
+        self._high_window = RollingWindow(stochastic["periodK"])
+        self._stoch_k = RollingWindow(stochastic["smoothK"])
+        self._stoch_d = RollingWindow(stochastic["periodD"])
+
+        periods = sorted({k for k, _, _ in self.stoch_variants})
+        self._ta_low = {k: RollingWindow(k) for k in periods}
+        self._ta_high = {k: RollingWindow(k) for k in periods}
+        self._ta_k = {(k, smooth_k): RollingWindow(smooth_k) for k, _, smooth_k in self.stoch_variants}
+        self._ta_d = {variant: RollingWindow(variant[1]) for variant in self.stoch_variants}
+
+    def update(self, high, low, close, time=None):
+        """Consome uma vela fechada e retorna os valores atuais dos indicadores."""
+        # RSI (Wilder)
+        delta = close - self._prev_close
+        self._prev_close = close
+        up = NAN if math.isnan(delta) else max(delta, 0.0)
+        down = NAN if math.isnan(delta) else -min(delta, 0.0)
+        rma_up = self._rma_up.update(up)
+        rma_down = self._rma_down.update(down)
+        rsi = 100 - _div(100, 1 + _div(rma_up, rma_down))
+
+        # Stochastic RSI
+        self._rsi_window.push(rsi)
+        stoch_rsi = 100 * _div(rsi - self._rsi_window.min(), self._rsi_window.max() - self._rsi_window.min())
+        if math.isinf(stoch_rsi):
+            stoch_rsi = NAN
+        self._stoch_rsi_k.push(stoch_rsi)
+        k_line = self._stoch_rsi_k.mean()
+        self._stoch_rsi_d.push(k_line)
+        d_line = self._stoch_rsi_d.mean()
+
+        # MACD tradicional
+        macd_line = self._macd_fast.update(close) - self._macd_slow.update(close)
+        signal_line = self._macd_signal.update(macd_line)
+
+        # MACD Zero Lag
+        zl_line = self._zl_fast.update(close) - self._zl_slow.update(close)
+        zl_signal = self._zl_signal.update(zl_line)
+
+        # Stochastic (estilo PineScript)
+        self._low_window.push(low)
+        self._high_window.push(high)
+        lowest_low = self._low_window.min()
+        stoch = 100 * _div(close - lowest_low, self._high_window.max() - lowest_low)
+        self._stoch_k.push(stoch)
+        stoch_k = self._stoch_k.mean()
+        self._stoch_d.push(stoch_k)
+        stoch_d = self._stoch_d.mean()
+
+        # Stochastic padrão pandas_ta: amplitude zero recebe epsilon
+        raw = {}
+        for period in self._ta_low:
+            self._ta_low[period].push(low)
+            self._ta_high[period].push(high)
+            lowest = self._ta_low[period].min()
+            price_range = self._ta_high[period].max() - lowest
+            if price_range == 0:
+                price_range += sys.float_info.epsilon
+            raw[period] = _div(100 * (close - lowest), price_range)
+        for (period, smooth_k), window in self._ta_k.items():
+            window.push(raw[period])
+        variants = {}
+        for variant in self.stoch_variants:
+            ta_k = self._ta_k[(variant[0], variant[2])].exact_mean()
+            self._ta_d[variant].push(ta_k)
+            col_k, col_d = stoch_columns(variant)
+            variants[col_k] = ta_k
+            variants[col_d] = self._ta_d[variant].exact_mean()
+
+        if self.first_time is None:
+            self.first_time = time
+        self.last_time = time
+        self.last_candle = (high, low, close)
+        if self.history is not None and time is not None:
+            checksum = int(candle_checksums(np.array([high]), np.array([low]), np.array([close]))[0])
+            self.history.append((pd.Timestamp(time).value, zl_line - zl_signal, checksum))
+        self.last_values = {
+            "rsi": rsi,
+            "stoch_rsi": stoch_rsi,
+            "k": k_line,
+            "d": d_line,
+            "macd_line": macd_line,
+            "signal_line": signal_line,
+            "macd_hist": macd_line - signal_line,
+            "macd_zero_lag_line": zl_line,
+            "macd_zero_lag_signal": zl_signal,
+            "macd_zero_lag_hist": zl_line - zl_signal,
+            "stoch": stoch_k,
+            "stoch_d": stoch_d,
+            **variants,
+        }
+        return self.last_values
+
+    def copy(self):
+        """Cópia independente do estado (sem o histórico, que não muda em peek)."""
+        clone = copy.copy(self)
+        clone.history = None
+        for name, value in vars(self).items():
+            if isinstance(value, (EWMState, RollingWindow, ZeroLagEMA)):
+                setattr(clone, name, value.copy())
+            elif isinstance(value, dict) and name.startswith("_ta_"):
+                setattr(clone, name, {key: window.copy() for key, window in value.items()})
+        return clone
+
+    def peek(self, high, low, close):
+        """Valores que resultariam de uma vela ainda em aberto, sem alterar o estado."""
+        return self.copy().update(high, low, close)
+
+    def history_since(self, start):
+        """
+        Histograma do MACD Zero Lag das velas a partir de `start` (array). As velas
+        anteriores são descartadas do histórico: os frames só andam para frente.
+        """
+        if self.history is None:
+            raise ValueError("Estado criado sem history=True")
+        start = pd.Timestamp(start).value
+        while self.history and self.history[0][0] < start:
+            self.history.popleft()
+        return np.array([entry[1] for entry in self.history], dtype=float)
+
+    def update_frame(self, df):
+        """
+        Consome as velas de `df` posteriores à última já processada e retorna os
+        valores atuais. Só devem ser passadas velas fechadas.
+        """
+        if self.last_time is not None:
+            df = df[df.index > self.last_time]
+        highs = df["High"].to_numpy(dtype=float)
+        lows = df["Low"].to_numpy(dtype=float)
+        closes = df["Close"].to_numpy(dtype=float)
+        for time, high, low, close in zip(df.index, highs, lows, closes):
+            self.update(high, low, close, time)
+        return self.last_values
+
+def _config_key(config):
+    return json.dumps(config, sort_keys=True)
+
+_CANDLE_FIELDS = ["High", "Low", "Close"]
+_CHECKSUM_WEIGHTS = np.array([0x9E3779B97F4A7C15, 0xC2B2AE3D27D4EB4F, 0x165667B19E3779F9], dtype=np.uint64)
+
+def candle_checksums(highs, lows, closes):
+    """
+    Checksum (uint64) de cada vela a partir dos bits da máxima, mínima e fechamento,
+    os únicos preços usados pelos indicadores: um preço regravado muda o checksum.
+    """
+    bits = np.column_stack([highs, lows, closes]).astype(np.float64).view(np.uint64)
+    return (bits * _CHECKSUM_WEIGHTS).sum(axis=1, dtype=np.uint64)
+
+def continues(state, df):
+    """
+    Se as velas de `df` continuam o estado: a última vela processada está em `df` com a
+    mesma máxima, mínima e fechamento (sem histórico reescrito depois dela). Com
+    histórico, `df` também não pode começar antes da primeira vela processada e as velas
+    já processadas que ele contém precisam ser as mesmas, com os mesmos preços (nenhuma
+    removida, inserida ou regravada).
+    """
+    if state.last_time is None or df.empty:
+        return True
+    if state.last_candle is None:
+        # Estado gravado por uma versão anterior, sem os preços processados
+        return False
+    index = df.index.asi8
+    last = pd.Timestamp(state.last_time).value
+    position = int(np.searchsorted(index, last))
+    if position == len(index) or index[position] != last:
+        return False
+    highs, lows, closes = (df[field].to_numpy(dtype=float) for field in _CANDLE_FIELDS)
+    if (highs[position], lows[position], closes[position]) != state.last_candle:
+        return False
+    if state.history is None:
+        return True
+    if state.first_time > df.index[0] or not state.history:
+        return False
+    count = len(state.history)
+    times = np.fromiter((entry[0] for entry in state.history), dtype=np.int64, count=count)
+    checksums = np.fromiter((entry[2] for entry in state.history), dtype=np.uint64, count=count)
+    seen = times >= index[0]
+    inside = slice(int(np.searchsorted(index, times[0])), position + 1)
+    if not np.array_equal(times[seen], index[inside]):
+        return False
+    return np.array_equal(checksums[seen], candle_checksums(highs[inside], lows[inside], closes[inside]))
+
+class IndicatorStateStore:
+    """
+    Estados incrementais por (símbolo, intervalo, configuração), com persistência
+    opcional em disco via pickle. `stoch_variants` e `history` valem para todos os
+    estados criados (ver IncrementalIndicators).
+    """
+
+    def __init__(self, path=None, verify=None, stoch_variants=(), history=False):
+        self.path = path
+        self.verify = VERIFY_INCREMENTAL if verify is None else verify
+        self.stoch_variants = list(stoch_variants)
+        self.history = history
+        self._states = {}
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            self.load(path)
+
+    def get(self, symbol, interval, config=None):
+        if config is None:
+            config = INDICATOR_CONFIG.get(interval, INDICATOR_CONFIG["1h"])
+        key = (symbol, interval, _config_key(config))
+        with self._lock:
+            state = self._states.get(key)
+            if state is None:
+                state = self._states[key] = IncrementalIndicators(config, self.stoch_variants, self.history)
+        return state
+
+    def update(self, symbol, interval, df, config=None):
+        """
+        Atualiza o estado com as velas fechadas novas de `df` e retorna os valores atuais.
+        Se `df` não continua o estado (ver continues), ele é recriado a partir de `df`.
+        """
+        state = self.get(symbol, interval, config)
+        if not continues(state, df):
+            self.reset(symbol, interval, config)
+            state = self.get(symbol, interval, config)
+        values = state.update_frame(df)
+        if self.verify and len(df):
+            if state.first_time == df.index[0]:
+                # Estado iniciado na mesma vela: compara a última linha com o cálculo completo
+                expected = batch_indicators(df, state.config, state.stoch_variants).iloc[-1]
+                mismatches = {
+                    col: abs(values[col] - expected[col]) for col in state.columns
+                    if not np.isclose(values[col], expected[col], rtol=1e-7, atol=1e-8, equal_nan=True)
+                }
+            else:
+                mismatches = verify_against_batch(df, config=state.config, stoch_variants=state.stoch_variants)
+            if mismatches:
+                logging.warning(f"Indicadores incrementais divergentes para {symbol} {interval}: {mismatches}")
+        return values
+
+    def reset(self, symbol, interval, config=None):
+        if config is None:
+            config = INDICATOR_CONFIG.get(interval, INDICATOR_CONFIG["1h"])
+        with self._lock:
+            self._states.pop((symbol, interval, _config_key(config)), None)
+
+    def states_for(self, symbol):
+        """Estados de um símbolo ({chave: estado}), para levar a outro processo."""
+        with self._lock:
+            return {key: state for key, state in self._states.items() if key[0] == symbol}
+
+    def merge(self, states):
+        """Adota estados exportados por states_for (substitui os da mesma chave)."""
+        with self._lock:
+            self._states.update(states)
+
+    def save(self, path=None):
+        path = path or self.path
+        temp_path = path + ".tmp"
+        with self._lock:
+            with open(temp_path, "wb") as f:
+                pickle.dump(self._states, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, path)
+
+    def load(self, path=None):
+        path = path or self.path
+        try:
+            with open(path, "rb") as f:
+                states = pickle.load(f)
+        except Exception as e:
+            logging.warning(f"Não foi possível carregar o estado dos indicadores ({path}): {e}")
+            return
+        with self._lock:
+            self._states = states
+
+def batch_indicators(df, config, stoch_variants=()):
+    """Calcula os mesmos indicadores do modo incremental usando as funções de kernels.py."""
+    rsi = calc_rsi(df["Close"], length=config["RSI"]["length"])
+    stoch_rsi, k_line, d_line = calc_stoch_rsi(
+        rsi,
+        rsi_length=config["StochRSI"]["rsi_length"],
+        k=config["StochRSI"]["k"],
+        d=config["StochRSI"]["d"]
+    )
+    macd_line, signal_line, macd_hist = calc_macd(
+        df["Close"],
+        config["MACD"]["fast_length"],
+        config["MACD"]["slow_length"],
+        config["MACD"]["signal_length"]
+    )
+    zl_line, zl_signal, zl_hist = calc_macd_zero_lag(
+        df["Close"],
+        fast_length=config["MACDZeroLag"]["fast_length"],
+        slow_length=config["MACDZeroLag"]["slow_length"],
+        signal_length=config["MACDZeroLag"]["signal_length"]
+    )
+    stoch_k, stoch_d = calc_stochastic_indicator(
+        df,
+        periodK=config["Stochastic"]["periodK"],
+        smoothK=config["Stochastic"]["smoothK"],
+        periodD=config["Stochastic"]["periodD"]
+    )
+    columns = {
+        "rsi": rsi, "stoch_rsi": stoch_rsi, "k": k_line, "d": d_line,
+        "macd_line": macd_line, "signal_line": signal_line, "macd_hist": macd_hist,
+        "macd_zero_lag_line": zl_line, "macd_zero_lag_signal": zl_signal, "macd_zero_lag_hist": zl_hist,
+        "stoch": stoch_k, "stoch_d": stoch_d,
+    }
+    if stoch_variants:
+        for variant, lines in calc_stoch_variants(df, stoch_variants).items():
+            columns.update(zip(stoch_columns(variant), lines))
+    return pd.DataFrame(columns, index=df.index)
+
+def verify_against_batch(df, timeframe=None, config=None, rtol=1e-7, atol=1e-8, stoch_variants=()):
+    """
+    Processa `df` vela a vela no modo incremental e compara cada linha com o cálculo
+    completo. Retorna {coluna: maior diferença absoluta} apenas para colunas divergentes
+    (dicionário vazio = resultados equivalentes).
+    """
+    if config is None:
+        config = INDICATOR_CONFIG.get(timeframe, INDICATOR_CONFIG["1h"])
+    batch = batch_indicators(df, config, stoch_variants)
+    state = IncrementalIndicators(config, stoch_variants)
+    rows = [
+        state.update(high, low, close)
+        for high, low, close in zip(
+            df["High"].to_numpy(dtype=float), df["Low"].to_numpy(dtype=float), df["Close"].to_numpy(dtype=float)
+        )
+    ]
+    incremental = pd.DataFrame(rows, index=df.index, columns=state.columns)
+    mismatches = {}
+    for col in state.columns:
+        expected = batch[col].to_numpy(dtype=float)
+        actual = incremental[col].to_numpy(dtype=float)
+        if not np.allclose(actual, expected, rtol=rtol, atol=atol, equal_nan=True):
+            mismatches[col] = float(np.nanmax(np.abs(actual - expected)))
+    return mismatches
@@ -0,0 +1,93 @@
+# kernels.py
+#
+# Fórmulas dos indicadores (RSI, StochRSI, MACD, MACD Zero Lag, Stochastic) sobre
+# Series ou matrizes tempo × símbolos. Ficam fora de indicators.py para que graph.py,
+# panel.py e incremental.py dependam só delas: indicators -> graph -> kernels -> rolling.
+import pandas as pd
+from indicators_set.rolling import rolling_mean, stochastic_oscillator, stochastic_variants, wrap_like
+
+# --------------------------------------------
+# 3) Cálculo manual do RSI (Wilders)
+# --------------------------------------------
+def calc_rsi(series, length=14):
+    delta = series.diff()
+    up = delta.clip(lower=0)
+    down = -1 * delta.clip(upper=0)
+    alpha = 1 / length
+    rma_up = up.ewm(alpha=alpha, adjust=False).mean()
+    rma_down = down.ewm(alpha=alpha, adjust=False).mean()
+    rsi = 100 - (100 / (1 + (rma_up / rma_down)))
+    return rsi
+
+# --------------------------------------------
+# 4) Cálculo manual do Stochastic RSI
+# --------------------------------------------
+def calc_stoch_rsi(rsi, rsi_length=14, k=3, d=3):
+    # Mínimo/máximo móveis pelos kernels de indicators_set.rolling
+    stoch_rsi = stochastic_oscillator(rsi, [rsi_length])[rsi_length]
+    k_line = rolling_mean(stoch_rsi, k)
+    d_line = rolling_mean(k_line, d)
+    return wrap_like(stoch_rsi, rsi), wrap_like(k_line, rsi), wrap_like(d_line, rsi)
+
+# --------------------------------------------
+# 5) Cálculo manual do MACD tradicional
+# --------------------------------------------
+def calc_macd(series, fast_length=12, slow_length=26, signal_length=9):
+    ema_fast = series.ewm(span=fast_length, adjust=False).mean()
+    ema_slow = series.ewm(span=slow_length, adjust=False).mean()
+    macd_line = ema_fast - ema_slow
+    signal_line = macd_line.ewm(span=signal_length, adjust=False).mean()
+    macd_hist = macd_line - signal_line
+    return macd_line, signal_line, macd_hist
+
+# --------------------------------------------
+# 6) Cálculo do MACD Zero Lag
+# Utiliza duas sucessivas EMAs para reduzir o atraso (lag)
+# --------------------------------------------
+def calc_macd_zero_lag(series, fast_length=12, slow_length=24, signal_length=9):
+    ema_fast = series.ewm(span=fast_length, adjust=False).mean()
+    ema_fast2 = ema_fast.ewm(span=fast_length, adjust=False).mean()
+    diff_fast = ema_fast - ema_fast2
+    zlag_fast = ema_fast + diff_fast
+
+    ema_slow = series.ewm(span=slow_length, adjust=False).mean()
+    ema_slow2 = ema_slow.ewm(span=slow_length, adjust=False).mean()
+    diff_slow = ema_slow - ema_slow2
+    zlag_slow = ema_slow + diff_slow
+
+    macd_line = zlag_fast - zlag_slow
+
+    ema_signal = macd_line.ewm(span=signal_length, adjust=False).mean()
+    ema_signal2 = ema_signal.ewm(span=signal_length, adjust=False).mean()
+    diff_signal = ema_signal - ema_signal2
+    signal_line = ema_signal + diff_signal
+
+    macd_hist = macd_line - signal_line
+    return macd_line, signal_line, macd_hist
+
+# --------------------------------------------
+# Novo: Cálculo do indicador Stochastic (baseado no PineScript)
+# --------------------------------------------
+def calc_stochastic_indicator(df, periodK, smoothK, periodD):
+    return stochastic_variants(
+        df['High'], df['Low'], df['Close'], [(periodK, smoothK, periodD)]
+    )[(periodK, smoothK, periodD)]
+
+# ------------------------------------------------------------
+# Stochastic no padrão do pandas_ta (stoch)
+# ------------------------------------------------------------
+def calc_stoch_variants(df: pd.DataFrame, variants):
+    """
+    Todas as variantes (k, d, smooth_k) de pandas_ta.stoch em uma única chamada, com os
+    extremos de High/Low calculados uma vez para todas as janelas.
+    Retorna {(k, d, smooth_k): (%K, %D)} como Series com o índice de df.
+    """
+    if not all(col in df.columns for col in ["High", "Low", "Close"]):
+        raise KeyError(f"DataFrame sem colunas necessárias, colunas: {df.columns.tolist()}")
+    variants = [tuple(variant) for variant in variants]
+    # pandas_ta: %K = SMA(smooth_k) do estocástico bruto, %D = SMA(d) de %K, amplitude zero + epsilon
+    stochs = stochastic_variants(
+        df["High"], df["Low"], df["Close"],
+        [(k, smooth_k, d) for k, d, smooth_k in variants], zero_range="epsilon"
+    )
+    return {(k, d, smooth_k): stochs[(k, smooth_k, d)] for k, d, smooth_k in variants}
@@ -0,0 +1,110 @@
+# panel.py
+#
+# Cálculo dos indicadores para vários símbolos de uma vez. As velas de um timeframe
+# são alinhadas em matrizes (tempo × símbolos) e o grafo de graph.py (compute_indicators)
+# é aplicado às matrizes inteiras: o pandas processa cada coluna em código compilado,
+# sem o custo de Python/pandas por símbolo.
+#
+# O alinhamento é pelo horário das velas: as linhas do painel são os horários das velas
+# dos símbolos incluídos, e símbolos com histórico mais curto ficam com NaN no início.
+# Só entram símbolos cuja última vela é a mais comum entre eles e cujas velas ocupam
+# horários consecutivos do painel (sem buracos); assim cada coluna tem exatamente a
+# mesma sequência de velas do cálculo por símbolo. Os demais ficam em `excluded` e
+# devem ser calculados símbolo a símbolo.
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from indicators_set.graph import compute_indicators
+
+PANEL_FIELDS = ["Open", "High", "Low", "Close", "Volume"]
+
+Panel = namedtuple(
+    "Panel", ["symbols", "last_time", "lengths", "excluded"] + [f.lower() for f in PANEL_FIELDS])
+
+def _majority_time(last_times):
+    """Horário de última vela mais frequente (no empate, o mais recente)."""
+    counts = last_times.value_counts()
+    return counts[counts == counts.max()].index.max()
+
+def build_panel(frames, length=None):
+    """
+    Monta um Panel a partir de {símbolo: DataFrame OHLCV}. Cada campo (open, high, ...)
+    é um DataFrame (tempo × símbolos) indexado pelo horário das velas, cujo .to_numpy()
+    é a matriz de preços. `length` limita o número de velas (linhas) do painel (padrão:
+    todos os horários). Símbolos com outra última vela ou com buracos no histórico vão
+    para `excluded`.
+    """
+    frames = {symbol: df for symbol, df in frames.items() if not df.empty}
+    excluded = []
+    if frames:
+        last_times = pd.Series({symbol: df.index[-1] for symbol, df in frames.items()})
+        majority = _majority_time(last_times)
+        excluded = [symbol for symbol in frames if last_times[symbol] != majority]
+        frames = {symbol: df for symbol, df in frames.items() if last_times[symbol] == majority}
+        index = pd.DatetimeIndex(np.unique(np.concatenate([df.index.values for df in frames.values()])))
+    else:
+        index = pd.DatetimeIndex([])
+    if length:
+        index = index[-int(length):]
+    rows = len(index)
+
+    aligned = {}
+    for symbol, df in frames.items():
+        n = min(len(df), rows)
+        if df.index[len(df) - n:].equals(index[rows - n:]):
+            aligned[symbol] = (df, n)
+        else:
+            excluded.append(symbol)
+    symbols = list(aligned)
+    lengths = np.array([n for _, n in aligned.values()], dtype=np.int64)
+
+    matrices = {field: np.full((rows, len(symbols)), np.nan) for field in PANEL_FIELDS}
+    for col, (df, n) in enumerate(aligned.values()):
+        for field in PANEL_FIELDS:
+            matrices[field][rows - n:, col] = df[field].to_numpy(dtype=float)[len(df) - n:]
+
+    last_time = pd.Series([index[-1]] * len(symbols), index=symbols, dtype="datetime64[ns]")
+    fields = {field.lower(): pd.DataFrame(matrices[field], index=index, columns=symbols) for field in PANEL_FIELDS}
+    return Panel(symbols=symbols, last_time=last_time, lengths=pd.Series(lengths, index=symbols),
+                 excluded=excluded, **fields)
+
+def panel_outputs(panel, timeframe=None, outputs=None):
+    """
+    Saídas de indicador pedidas (ver indicators_set.graph) para todos os símbolos do
+    painel: {saída: DataFrame (tempo × símbolos)}. Os nós do grafo operam igual sobre as
+    matrizes, então o resultado de cada coluna é o de compute_indicators no símbolo.
+    """
+    columns = {field: getattr(panel, field.lower()) for field in PANEL_FIELDS}
+    return compute_indicators(columns, timeframe, outputs)
+
+def panel_last(results):
+    """Última linha de cada indicador: DataFrame (símbolos × indicadores)."""
+    return pd.DataFrame({name: matrix.iloc[-1] for name, matrix in results.items()})
+
+def panel_to_frame(panel, results, symbol):
+    """Indicadores de um símbolo extraídos do painel, na mesma ordem das velas originais."""
+    n = int(panel.lengths[symbol])
+    frame = pd.DataFrame({name: matrix[symbol].to_numpy()[len(matrix) - n:] for name, matrix in results.items()})
+    return frame
+
+def verify_panel(frames, timeframe=None, outputs=None, length=None, rtol=1e-9, atol=1e-9):
+    """
+    Compara panel_outputs com compute_indicators aplicado símbolo a símbolo sobre as
+    mesmas velas. Retorna {símbolo: [saídas divergentes]} (vazio = equivalentes).
+    """
+    panel = build_panel(frames, length)
+    results = panel_outputs(panel, timeframe, outputs)
+    mismatches = {}
+    for symbol in panel.symbols:
+        df = frames[symbol]
+        expected = compute_indicators(df.iloc[len(df) - int(panel.lengths[symbol]):], timeframe, outputs)
+        actual = panel_to_frame(panel, results, symbol)
+        bad = [
+            name for name, series in expected.items()
+            if not np.allclose(actual[name].to_numpy(), series.to_numpy(dtype=float), rtol=rtol, atol=atol, equal_nan=True)
+        ]
+        if bad:
+            mismatches[symbol] = bad
+    return mismatches
@@ -0,0 +1,129 @@
+# rolling.py
+#
+# Kernels numpy de janelas deslizantes para o Stochastic e o StochRSI.
+#
+# Mínimo/máximo móveis usam uma tabela de potências de 2: o nível j guarda o extremo
+# de cada bloco de 2^j elementos e é obtido do nível anterior com uma única operação
+# vetorizada. Qualquer janela w é o extremo de dois blocos de 2^floor(log2 w) que se
+# sobrepõem, então várias janelas (ex.: 5 e 14) saem da mesma tabela com uma operação
+# extra cada. Funciona em séries (1D) e em matrizes tempo × símbolos (2D, eixo 0).
+#
+# Os resultados seguem rolling(w).min()/max()/mean() do pandas: NaN enquanto a janela
+# não está cheia ou se ela contém NaN.
+import sys
+
+import numpy as np
+import pandas as pd
+
+def _as_array(values):
+    return np.asarray(values, dtype=float)
+
+def wrap_like(values, template):
+    """Devolve `values` como Series/DataFrame com o índice de `template`, se for pandas."""
+    if isinstance(template, pd.DataFrame):
+        return pd.DataFrame(values, index=template.index, columns=template.columns)
+    if isinstance(template, pd.Series):
+        return pd.Series(values, index=template.index, name=template.name)
+    return values
+
+def rolling_extrema(values, windows, func=np.minimum):
+    """
+    Extremo móvel (func=np.minimum ou np.maximum) de `values` para cada janela.
+    Retorna {janela: array do mesmo formato de values}.
+    """
+    values = _as_array(values)
+    n = values.shape[0]
+    windows = sorted(set(int(w) for w in windows))
+    if windows and windows[0] < 1:
+        raise ValueError(f"Janelas devem ser >= 1: {windows}")
+
+    # levels[j][i] = extremo de values[i : i + 2^j]
+    levels = [values]
+    span = 1
+    limit = min(max(windows, default=1), n)
+    while span * 2 <= limit:
+        previous = levels[-1]
+        levels.append(func(previous[:-span], previous[span:]))
+        span *= 2
+
+    result = {}
+    for w in windows:
+        out = np.full(values.shape, np.nan)
+        if w <= n:
+            j = w.bit_length() - 1
+            block = 1 << j
+            level = levels[j]
+            # janela terminando em i: blocos iniciando em i-w+1 e em i-block+1
+            out[w - 1:] = func(level[:n - w + 1], level[w - block:n - block + 1])
+        result[w] = out
+    return result
+
+def rolling_min(values, windows):
+    return rolling_extrema(values, windows, np.minimum)
+
+def rolling_max(values, windows):
+    return rolling_extrema(values, windows, np.maximum)
+
+def rolling_mean(values, window):
+    """Média móvel simples por soma de deslocamentos (janelas curtas de suavização)."""
+    values = _as_array(values)
+    n = values.shape[0]
+    out = np.full(values.shape, np.nan)
+    if window <= n:
+        total = values[window - 1:].copy()
+        for lag in range(1, window):
+            total += values[window - 1 - lag:n - lag]
+        out[window - 1:] = total / window
+    return out
+
+def stochastic_variants(high, low, close, variants, zero_range="inf"):
+    """
+    Calcula de uma vez todas as variantes (periodK, smoothK, periodD) do Stochastic
+    sobre as mesmas séries High/Low/Close, reaproveitando os extremos e as médias comuns.
+
+    zero_range define o tratamento de amplitude zero (máxima == mínima):
+      "inf":     divisão direta, como calc_stochastic_indicator (inf ou NaN);
+      "epsilon": soma sys.float_info.epsilon à amplitude, como pandas_ta.stoch.
+
+    Retorna {(periodK, smoothK, periodD): (%K, %D)} como arrays (ou Series/DataFrame
+    se `close` for pandas, com o mesmo índice).
+    """
+    variants = [tuple(int(p) for p in variant) for variant in variants]
+    periods = {variant[0] for variant in variants}
+    lows = rolling_min(low, periods)
+    highs = rolling_max(high, periods)
+    closes = _as_array(close)
+
+    raw = {}
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for period in periods:
+            price_range = highs[period] - lows[period]
+            if zero_range == "epsilon":
+                price_range = np.where(price_range == 0, price_range + sys.float_info.epsilon, price_range)
+            raw[period] = 100 * (closes - lows[period]) / price_range
+
+    smoothed = {}
+    result = {}
+    for period, smooth_k, period_d in variants:
+        if (period, smooth_k) not in smoothed:
+            smoothed[(period, smooth_k)] = rolling_mean(raw[period], smooth_k)
+        stoch_k = smoothed[(period, smooth_k)]
+        stoch_d = rolling_mean(stoch_k, period_d)
+        result[(period, smooth_k, period_d)] = (wrap_like(stoch_k, close), wrap_like(stoch_d, close))
+    return result
+
+def stochastic_oscillator(source, windows):
+    """
+    Oscilador 0-100 de `source` contra seus próprios extremos (base do StochRSI), para
+    cada janela. Divisões por amplitude zero viram NaN. Retorna {janela: array}.
+    """
+    values = _as_array(source)
+    lows = rolling_min(values, windows)
+    highs = rolling_max(values, windows)
+    result = {}
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for w in lows:
+            osc = 100 * (values - lows[w]) / (highs[w] - lows[w])
+            osc[np.isinf(osc)] = np.nan
+            result[w] = osc
+    return result
@@ -0,0 +1,318 @@
+# metrics.py
+#
+# Métricas do scan no formato texto do Prometheus, sem dependências externas.
+# Os módulos do pipeline registram contadores e histogramas aqui; o scan grava o
+# resultado em METRICS_FILE ao terminar (para o textfile collector do node_exporter)
+# e, se METRICS_PORT estiver definido, um endpoint HTTP local serve /metrics.
+import bisect
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+METRICS_FILE = os.environ.get(
+    "METRICS_FILE", os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'data_control', 'metrics.prom'))
+)
+METRICS_PORT = int(os.environ.get("METRICS_PORT", "0"))  # 0 = sem endpoint HTTP
+
+# Limites em segundos, de chamadas de indicador (ms) até requisições lentas (s)
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_registry = []
+_registry_lock = threading.Lock()
+
+def _format_labels(labelnames, values, extra=()):
+    pairs = list(zip(labelnames, values)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        with _registry_lock:
+            _registry.append(self)
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name}: labels esperados {self.labelnames}, recebidos {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+            lines += self._render_items(items)
+        return lines
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(self._key(labels), 0.0)
+
+    def totals_by(self, labelname):
+        """Soma das séries agrupada pelos valores de um label."""
+        position = self.labelnames.index(labelname)
+        totals = {}
+        with self._lock:
+            for key, v in self._values.items():
+                totals[key[position]] = totals.get(key[position], 0.0) + v
+        return totals
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._values)
+
+    def delta(self, after, before):
+        return {key: v - before.get(key, 0.0) for key, v in after.items() if v != before.get(key, 0.0)}
+
+    def merge(self, delta):
+        with self._lock:
+            for key, v in delta.items():
+                self._values[key] = self._values.get(key, 0.0) + v
+
+    def _render_items(self, items):
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(v)}" for key, v in items]
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(self._key(labels))
+
+    def _render_items(self, items):
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(v)}" for key, v in items]
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # contagens por balde (não cumulativas; o último é +Inf), soma
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][bisect.bisect_left(self.buckets, value)] += 1
+            state[1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        """Observa a duração do bloco `with`, inclusive quando ele lança exceção."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def totals(self):
+        """(contagem, soma) de todas as séries somadas."""
+        with self._lock:
+            return (sum(sum(state[0]) for state in self._values.values()),
+                    sum(state[1] for state in self._values.values()))
+
+    def snapshot(self):
+        with self._lock:
+            return {key: [list(counts), total] for key, (counts, total) in self._values.items()}
+
+    def delta(self, after, before):
+        empty = [[0] * (len(self.buckets) + 1), 0.0]
+        result = {}
+        for key, (counts, total) in after.items():
+            old_counts, old_total = before.get(key, empty)
+            if counts != old_counts:
+                result[key] = [[c - o for c, o in zip(counts, old_counts)], total - old_total]
+        return result
+
+    def merge(self, delta):
+        with self._lock:
+            for key, (counts, total) in delta.items():
+                state = self._values.setdefault(key, [[0] * (len(self.buckets) + 1), 0.0])
+                state[0] = [c + d for c, d in zip(state[0], counts)]
+                state[1] += total
+
+    def _render_items(self, items):
+        lines = []
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, [("le", _format_value(bound))])
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+def render():
+    """Todas as métricas registradas no formato texto de exposição do Prometheus."""
+    with _registry_lock:
+        metrics = list(_registry)
+    lines = []
+    for metric in metrics:
+        lines += metric.render()
+    return "\n".join(lines) + "\n"
+
+# --- Métricas de outros processos ---
+# Os processos do scan (update_data com SCAN_PROCESSES > 1) têm um registro próprio. Eles
+# devolvem a diferença de contadores e histogramas desde o envio anterior, e o processo
+# principal a soma ao seu registro antes de write_metrics. Gauges são do processo e ficam
+# de fora.
+
+def registry_snapshot():
+    """{nome: valores} de todos os contadores e histogramas registrados."""
+    with _registry_lock:
+        metrics = [metric for metric in _registry if metric.kind != "gauge"]
+    return {metric.name: metric.snapshot() for metric in metrics}
+
+def registry_delta(after, before):
+    """Diferença entre dois registry_snapshot() (só as séries que mudaram)."""
+    with _registry_lock:
+        metrics = {metric.name: metric for metric in _registry if metric.kind != "gauge"}
+    delta = {}
+    for name, values in after.items():
+        changed = metrics[name].delta(values, before.get(name, {}))
+        if changed:
+            delta[name] = changed
+    return delta
+
+def merge_registry(delta):
+    """Soma ao registro deste processo uma diferença gerada por registry_delta."""
+    with _registry_lock:
+        metrics = {metric.name: metric for metric in _registry}
+    for name, values in delta.items():
+        metrics[name].merge(values)
+
+def write_metrics(path=None):
+    """Grava render() em `path` (padrão METRICS_FILE) com troca atômica do arquivo."""
+    path = path or METRICS_FILE
+    temp_path = str(path) + ".tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        f.write(render())
+    os.replace(temp_path, path)
+    return path
+
+_server = None
+
+def start_metrics_server(port=None, host="127.0.0.1"):
+    """Serve GET /metrics em uma thread daemon. Retorna o servidor (ou None se port=0)."""
+    global _server
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    port = METRICS_PORT if port is None else port
+    if not port or _server is not None:
+        return _server
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] not in ("/metrics", "/"):
+                self.send_error(404)
+                return
+            body = render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    _server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=_server.serve_forever, name="metrics-server", daemon=True).start()
+    return _server
+
+# --- Métricas do pipeline ---
+
+API_REQUESTS = Counter(
+    "binance_api_requests_total", "Chamadas REST à Binance por endpoint e resultado", ["endpoint", "outcome"])
+API_LATENCY = Histogram(
+    "binance_api_request_seconds", "Latência de cada tentativa de chamada REST", ["endpoint"])
+API_RETRIES = Counter(
+    "binance_api_retries_total", "Novas tentativas após falha transitória, por endpoint", ["endpoint"])
+API_FAILURES = Counter(
+    "binance_api_failures_total",
+    "Chamadas REST que falharam de vez (erro definitivo ou tentativas esgotadas)", ["endpoint"])
+API_WEIGHT_WAIT = Histogram(
+    "binance_api_weight_wait_seconds", "Espera pelo orçamento de peso antes de cada chamada", ["lane"])
+KLINES_FETCH = Histogram(
+    "klines_fetch_seconds", "Duração de get_futures_klines (todas as páginas)", ["interval"])
+KLINES_FETCHED = Counter(
+    "klines_fetched_total", "Velas recebidas da API", ["interval"])
+CACHE_REQUESTS = Counter(
+    "kline_cache_requests_total",
+    "Leituras de get_klines_with_cache por resultado (hit, incremental, miss, uncached)", ["interval", "result"])
+CACHE_SECONDS = Histogram(
+    "kline_cache_seconds", "Duração de get_klines_with_cache, incluindo buscas na API", ["interval"])
+CACHE_LOAD_SECONDS = Histogram(
+    "kline_cache_load_seconds", "Leitura do arquivo de cache (load_cached_data)", ["interval"])
+CACHE_MEMORY_REQUESTS = Counter(
+    "kline_memory_cache_requests_total",
+    "Leituras da camada em memória do cache por resultado (hit, miss, stale, expired)", ["result"])
+CACHE_MEMORY_BYTES_USED = Gauge(
+    "kline_memory_cache_bytes", "Bytes ocupados pelos DataFrames na camada em memória do cache")
+INDICATOR_SECONDS = Histogram(
+    "apply_technicals_seconds", "Duração de apply_technicals", ["timeframe"])
+JSON_WRITE_SECONDS = Histogram(
+    "json_write_seconds", "Duração de safe_json_write (inclui fsync)")
+SCAN_SYMBOL_SECONDS = Histogram(
+    "scan_symbol_seconds", "Duração do processamento de um símbolo no scan",
+    buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0))
+SCAN_SYMBOL_LAST_SECONDS = Gauge(
+    "scan_symbol_last_seconds", "Duração do símbolo no último scan", ["symbol"])
+SCAN_PAIRS = Counter(
+    "scan_pairs_total", "Pares processados por resultado", ["outcome"])
+SCAN_MEMO = Counter(
+    "scan_timeframe_memo_total",
+    "Timeframes do scan reaproveitados do scan anterior (hit) ou recalculados (miss)", ["result"])
+SCAN_DURATION = Gauge(
+    "scan_last_duration_seconds", "Duração total do último scan")
+SCAN_LAST_END = Gauge(
+    "scan_last_end_timestamp_seconds", "Horário (epoch) do fim do último scan")
+
+# Histogramas cuja soma compõe o resumo por etapa do scan (ver stage_totals)
+STAGE_HISTOGRAMS = {
+    "rest": API_LATENCY,
+    "weight_wait": API_WEIGHT_WAIT,
+    "cache_load": CACHE_LOAD_SECONDS,
+    "klines": CACHE_SECONDS,
+    "indicators": INDICATOR_SECONDS,
+    "json_write": JSON_WRITE_SECONDS,
+}
+
+def stage_totals():
+    """Soma de segundos por etapa até agora (somada entre threads)."""
+    return {stage: histogram.totals()[1] for stage, histogram in STAGE_HISTOGRAMS.items()}
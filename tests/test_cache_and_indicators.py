@@ -0,0 +1,152 @@
+# test_cache_and_indicators.py
+#
+# Testes do cache binário de velas (locks entre processos, registro final incompleto,
+# arquivo de versão mais nova) e da equivalência entre o cálculo completo dos
+# indicadores e os modos incremental e painel do scan, sobre fixtures sintéticas.
+#
+#   python -m pytest -q tests
+import multiprocessing
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'benchmarks')))
+
+from fixtures import FixtureSet, generate_fixtures
+from data_control import cache
+from data_control.update_data import (
+    _analyze_result, _incremental_result, new_indicator_states, panel_timeframe_results
+)
+from indicators_set.panel import build_panel, verify_panel
+
+SYMBOL = "TESTUSDT"
+INTERVAL = "1h"
+HOUR_MS = 3600 * 1000
+START_MS = 1_700_000_000_000 // HOUR_MS * HOUR_MS
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache, "CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(cache, "CACHE_BACKEND", "bin")
+    cache.memory_cache.clear()
+    return str(tmp_path)
+
+@pytest.fixture(scope="module")
+def fixtures(tmp_path_factory):
+    fixture_dir = str(tmp_path_factory.mktemp("fixtures"))
+    generate_fixtures(fixture_dir, n_symbols=6, intervals=[INTERVAL], candles=700, seed=0)
+    return FixtureSet(fixture_dir, [INTERVAL])
+
+def candles(hours):
+    """Velas com todos os preços iguais ao número da hora (fácil de conferir)."""
+    hours = np.asarray(hours, dtype=float)
+    index = pd.DatetimeIndex(pd.to_datetime(START_MS + hours.astype(np.int64) * HOUR_MS, unit="ms"), name="Time")
+    return pd.DataFrame({col: hours for col in cache.KLINE_COLUMNS}, index=index)
+
+# --- Cache ---
+
+def _append_worker(cache_dir, offset, count):
+    cache.CACHE_DIR = cache_dir
+    cache.memory_cache.max_bytes = 0
+    for k in range(count):
+        cache.append_cached_data(SYMBOL, INTERVAL, candles([2 * k + offset]))
+
+def test_two_processes_append_to_one_file(cache_dir):
+    count = 150
+    context = multiprocessing.get_context("spawn")
+    workers = [context.Process(target=_append_worker, args=(cache_dir, offset, count)) for offset in (0, 1)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(timeout=120)
+        assert worker.exitcode == 0
+
+    records = cache.load_cached_records(SYMBOL, INTERVAL)
+    expected = np.arange(2 * count)
+    assert np.array_equal(records["Time"], START_MS + expected * HOUR_MS)
+    assert np.array_equal(records["Close"], expected.astype(float))
+    size = os.path.getsize(cache.get_cache_filename(SYMBOL, INTERVAL))
+    assert size == cache.HEADER_SIZE + 2 * count * cache.KLINE_DTYPE.itemsize
+    assert not [name for name in os.listdir(cache_dir) if name.endswith(".tmp")]
+
+def test_truncated_record_is_ignored_and_dropped_on_append(cache_dir):
+    cache.save_cached_data(SYMBOL, INTERVAL, candles(range(10)))
+    cache_file = cache.get_cache_filename(SYMBOL, INTERVAL)
+    with open(cache_file, "ab") as f:
+        f.write(b"\x01" * (cache.KLINE_DTYPE.itemsize // 2))
+
+    records = cache.load_cached_records(SYMBOL, INTERVAL)
+    assert np.array_equal(records["Close"], np.arange(10.0))
+
+    cache.append_cached_data(SYMBOL, INTERVAL, candles([10]))
+    records = cache.load_cached_records(SYMBOL, INTERVAL)
+    assert np.array_equal(records["Close"], np.arange(11.0))
+    assert os.path.getsize(cache_file) == cache.HEADER_SIZE + 11 * cache.KLINE_DTYPE.itemsize
+
+def test_newer_version_is_skipped_and_not_rewritten(cache_dir):
+    header = np.zeros(1, dtype=cache.HEADER_DTYPE)
+    header["magic"] = cache.CACHE_MAGIC
+    header["version"] = cache.CACHE_VERSION + 1
+    header["record_size"] = cache.KLINE_DTYPE.itemsize
+    content = header.tobytes() + cache._frame_to_records(candles(range(5))).tobytes()
+    cache_file = cache.get_cache_filename(SYMBOL, INTERVAL)
+    with open(cache_file, "wb") as f:
+        f.write(content)
+
+    assert cache.load_cached_data(SYMBOL, INTERVAL).empty
+    assert cache.cache_generation(SYMBOL, INTERVAL) is None
+    cache.save_cached_data(SYMBOL, INTERVAL, candles(range(3)))
+    cache.append_cached_data(SYMBOL, INTERVAL, candles([5, 6]))
+    cache.append_cached_data(SYMBOL, INTERVAL, candles([0]))
+    with open(cache_file, "rb") as f:
+        assert f.read() == content
+
+# --- Indicadores: incremental e painel x cálculo completo ---
+
+def _windows(df, length, steps):
+    """Janelas deslizantes de `length` velas fechadas mais a vela em aberto."""
+    return [df.iloc[k:k + length + 1] for k in range(steps)]
+
+def test_incremental_matches_batch(fixtures):
+    states = new_indicator_states()
+    symbol = fixtures.symbols[0]
+    windows = _windows(fixtures.frame(symbol, INTERVAL), 300, 6)
+
+    # Primeiro scan: o estado começa na mesma vela do frame, resultado idêntico
+    assert _incremental_result(symbol, windows[0], INTERVAL, states) == _analyze_result(windows[0], INTERVAL)
+
+    # Scans seguintes: as EMAs continuam do primeiro scan; mínimo/máximo do histograma
+    # cobrem as mesmas velas, mas com valores de EMAs mais longas
+    for window in windows[1:]:
+        incremental = _incremental_result(symbol, window, INTERVAL, states)
+        batch = _analyze_result(window, INTERVAL)
+        for key, value in batch.items():
+            if key.endswith(("_min", "_max")):
+                continue
+            assert incremental[key] == pytest.approx(value, abs=1e-6), key
+
+def test_incremental_rebuilds_on_rewritten_candle(fixtures):
+    states = new_indicator_states()
+    symbol = fixtures.symbols[1]
+    df = fixtures.frame(symbol, INTERVAL)
+    _incremental_result(symbol, df.iloc[:301], INTERVAL, states)
+
+    rewritten = df.iloc[:302].copy()
+    rewritten.iloc[290, rewritten.columns.get_loc("Close")] *= 1.05
+    assert _incremental_result(symbol, rewritten, INTERVAL, states) == _analyze_result(rewritten, INTERVAL)
+
+def test_panel_matches_batch(fixtures):
+    frames = fixtures.frames(INTERVAL)
+    symbols = fixtures.symbols
+    frames[symbols[1]] = frames[symbols[1]].iloc[150:]  # histórico mais curto
+    frames[symbols[2]] = frames[symbols[2]].drop(frames[symbols[2]].index[100])  # buraco
+    frames[symbols[3]] = frames[symbols[3]].iloc[:-1]  # outra última vela
+
+    assert sorted(build_panel(frames).excluded) == sorted([symbols[2], symbols[3]])
+    assert verify_panel(frames, INTERVAL) == {}
+    results = panel_timeframe_results(frames, INTERVAL, memo={})
+    assert results == {symbol: _analyze_result(df, INTERVAL) for symbol, df in frames.items()}